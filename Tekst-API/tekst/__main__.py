@@ -1,9 +1,14 @@
 import asyncio
-import os
+import contextlib
+import hashlib
+import json
 import shutil
+import signal
+import time
 
+from datetime import UTC, datetime
 from pathlib import Path
-from typing import get_args
+from typing import Any, get_args
 
 import click
 
@@ -18,6 +23,7 @@ from tekst.models.resource import (
     res_exp_fmt_info,
 )
 from tekst.openapi import generate_openapi_json
+from tekst.utils import ensure
 
 
 """
@@ -25,20 +31,21 @@ Command line interface to some utilities of Tekst-API
 """
 
 
-async def _create_indices() -> None:
+async def _create_indices(incremental: bool) -> None:
     from tekst import db, search
 
     await db.init_odm()
-    await search.create_indices_task()
+    await search.create_indices_task(incremental=incremental)
     await search.close()
     await db.close()
 
 
 async def _refresh_precomputed_cache(force: bool) -> None:
-    from tekst import db, resources
+    from tekst import change_tracker, db, resources
 
     await db.init_odm()
     await resources.call_resource_precompute_hooks(force=force)
+    await change_tracker.flush()
     await db.close()
 
 
@@ -51,21 +58,42 @@ async def _cleanup() -> None:
 
 
 async def _maintenance() -> None:
-    from tekst import db, platform, resources, search
+    from tekst import change_tracker, db, platform, resources, search
 
     await db.init_odm()
     await search.create_indices_task()
     await resources.call_resource_precompute_hooks()
     await platform.cleanup_task()
+    await change_tracker.flush()
     await search.close()
     await db.close()
 
 
+async def _worker(concurrency: int) -> None:
+    from tekst import change_tracker, db, executor, search, tasks
+
+    await db.init_odm()
+    # stop gracefully on SIGTERM (e.g. when the container is stopped)
+    worker_task = asyncio.current_task()
+    if worker_task:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, worker_task.cancel
+        )
+    try:
+        await tasks.run_worker(concurrency=concurrency)
+    finally:
+        executor.shutdown()
+        await change_tracker.flush()
+        await search.close()
+        await db.close()
+
+
 async def _export(
     resource_ids: list[PydanticObjectId] | None,
     *,
     formats: list[ResourceExportFormat],
     output_dir_path: Path,
+    jobs: int = 1,
     quiet: bool = False,
     delete: bool = False,
 ) -> None:
@@ -77,7 +105,7 @@ async def _export(
         exit(1)
 
     # prepare system
-    from tekst import db, resources
+    from tekst import change_tracker, db
     from tekst.routers import resources as resources_router
 
     await db.init_odm()
@@ -90,10 +118,7 @@ async def _export(
             if child.is_file():
                 child.unlink()
 
-    # call precompute hooks
-    await resources.call_resource_precompute_hooks()
-
-    # get IDs of resources to export
+    # get resources to export
     target_resources = await ResourceBaseDocument.find(
         Eq(ResourceBaseDocument.public, True),
         In(ResourceBaseDocument.id, resource_ids) if resource_ids else {},
@@ -105,21 +130,34 @@ async def _export(
         if res not in [res.id for res in target_resources]:
             click.echo(f"Resource ID {res} not found or not public", err=True)
 
-    # run exports
     if not target_resources:
         click.echo("No resources to export", err=True)
         exit(1)
-    cfg = get_config()
+
+    # call precompute hooks of the resources to export
+    # (these skip all precomputed data that is still up-to-date)
     for res in target_resources:
+        await res.resource_precompute_hook()
+
+    # run exports, at most `jobs` at the same time
+    cfg = get_config()
+    semaphore = asyncio.Semaphore(jobs)
+    started_at = time.perf_counter()
+
+    async def _export_resource(
+        res: ResourceBaseDocument,
+        fmt: ResourceExportFormat,
+    ) -> dict[str, Any] | None:
         res_id_str = str(res.id)
-        for fmt in formats:
+        async with semaphore:
             if not quiet:
                 click.echo(f"Exporting resource {res_id_str} as {fmt} ...")
+            export_started_at = time.perf_counter()
             try:
                 export_props = await resources_router.export_resource_contents_task(
                     user=None,
                     cfg=cfg,
-                    resource_id=res.id,
+                    resource_id=ensure(res.id),
                     export_format=fmt,
                 )
             except TekstHTTPException as e:
@@ -128,22 +166,57 @@ async def _export(
                         f"Resource {res_id_str} does not support export format {fmt}",
                         err=True,
                     )
-                    continue
+                    return None
                 else:
                     raise
 
             # move exported file to output directory
+            # (which is a simple rename if both are on the same file system)
             source_path = cfg.temp_files_dir / export_props["artifact"]
             target_ext = res_exp_fmt_info[fmt]["extension"]
             target_path = output_dir_path / f"{res_id_str}_{fmt}.{target_ext}"
-            shutil.copy(source_path, target_path)
-            os.remove(source_path)
+            await asyncio.to_thread(shutil.move, source_path, target_path)
+            took = time.perf_counter() - export_started_at
+            checksum = await asyncio.to_thread(_file_checksum, target_path)
             if not quiet:
                 click.echo(f"Exported resource {res_id_str} as {str(target_path)}.")
+            return {
+                "resourceId": res_id_str,
+                "format": fmt,
+                "file": target_path.name,
+                "size": target_path.stat().st_size,
+                "sha256": checksum,
+                "took": round(took, 2),
+            }
+
+    exported_files = await asyncio.gather(
+        *[_export_resource(res, fmt) for res in target_resources for fmt in formats]
+    )
+
+    # write manifest of all exported files
+    manifest_path = output_dir_path / "manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "createdAt": datetime.now(UTC).isoformat(),
+                "took": round(time.perf_counter() - started_at, 2),
+                "files": [f for f in exported_files if f],
+            },
+            indent=2,
+        )
+    )
+    if not quiet:
+        click.echo(f"Wrote export manifest to {str(manifest_path)}.")
 
+    await change_tracker.flush()
     await db.close()
 
 
+def _file_checksum(file_path: Path) -> str:
+    with file_path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
 @click.command()
 def bootstrap():
     """Runs the Tekst initial bootstrap procedure"""
@@ -153,9 +226,15 @@ def bootstrap():
 
 
 @click.command()
-def index():
+@click.option(
+    "--incremental",
+    "-i",
+    is_flag=True,
+    help="Only update index documents affected by content changes, if possible",
+)
+def index(incremental: bool):
     """(Re)creates search indices"""
-    asyncio.run(_create_indices())
+    asyncio.run(_create_indices(incremental=incremental))
 
 
 @click.command()
@@ -184,6 +263,25 @@ def maintenance():
     asyncio.run(_maintenance())
 
 
+@click.command()
+@click.option(
+    "--concurrency",
+    "-c",
+    type=click.IntRange(min=1),
+    default=None,
+    help=(
+        "Maximum number of tasks to run at the same time "
+        "(defaults to the TEKST_TASKS__WORKER_CONCURRENCY setting)"
+    ),
+)
+def worker(concurrency: int | None):
+    """Runs queued background tasks until stopped"""
+    with contextlib.suppress(KeyboardInterrupt, asyncio.CancelledError):
+        asyncio.run(
+            _worker(concurrency=concurrency or get_config().tasks.worker_concurrency)
+        )
+
+
 @click.command()
 @click.option(
     "--yes",
@@ -299,6 +397,14 @@ def schema(
     show_default=True,
     help="Output directory to write to",
 )
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of exports to run at the same time",
+)
 @click.option(
     "--quiet",
     "-q",
@@ -317,6 +423,7 @@ def export(
     resource: list[str] | None,
     format: list[ResourceExportFormat],
     output: str,
+    jobs: int = 1,
     quiet: bool = False,
     delete: bool = False,
 ) -> None:
@@ -329,6 +436,7 @@ def export(
             [PydanticObjectId(res_id) for res_id in resource] if resource else None,
             formats=format,
             output_dir_path=Path(output),
+            jobs=jobs,
             quiet=quiet,
             delete=delete,
         )
@@ -347,6 +455,7 @@ cli.add_command(index)
 cli.add_command(precompute)
 cli.add_command(cleanup)
 cli.add_command(maintenance)
+cli.add_command(worker)
 cli.add_command(migrate)
 cli.add_command(schema)
 cli.add_command(export)
@@ -0,0 +1,87 @@
+import time
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from tekst.counters import counter_get, counter_incr
+from tekst.models.user import UserRead
+
+
+# ID of the counter holding the current version of the cached access data
+_VERSION_COUNTER_ID = "access_cache_version"
+
+# interval in seconds after which the version of the cached data is checked again
+# (to pick up invalidations caused by writes handled by other API workers)
+_VERSION_CHECK_INTERVAL_S = 1.0
+
+# maximum number of cached entries
+_MAX_ENTRIES = 1000
+
+_entries: OrderedDict[Hashable, Any] = OrderedDict()
+_version: int | None = None
+_version_checked_at: float = 0.0
+
+
+def permission_scope(user: UserRead | None) -> str:
+    """
+    Returns the permission scope of the given user.
+    Users of the same scope are allowed to access the same data.
+    """
+    if not user:
+        return "anonymous"
+    if user.is_superuser:
+        return "superuser"
+    return f"user:{user.id}"
+
+
+def clear() -> None:
+    """Clears the cached data of this API worker"""
+    global _version
+    _entries.clear()
+    _version = None
+
+
+async def invalidate() -> None:
+    """
+    Invalidates the cached access data of all API workers. This has to be called
+    after each write operation that could affect which resources users can access.
+    """
+    await counter_incr(_VERSION_COUNTER_ID)
+    clear()
+
+
+async def _check_version() -> None:
+    global _version, _version_checked_at
+    if (
+        _version is not None
+        and time.monotonic() - _version_checked_at < _VERSION_CHECK_INTERVAL_S
+    ):
+        return
+    version = await counter_get(_VERSION_COUNTER_ID)
+    if version != _version:
+        _entries.clear()
+        _version = version
+    _version_checked_at = time.monotonic()
+
+
+async def memoized(
+    key: Hashable,
+    factory: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Returns the cached data for the given key. If there is none (or it is outdated),
+    the data is computed by awaiting the given factory and then cached.
+    """
+    await _check_version()
+    if key in _entries:
+        _entries.move_to_end(key)
+        return _entries[key]
+    version = _version
+    data = await factory()
+    # only cache the data if there was no invalidation while computing it
+    if version == _version:
+        _entries[key] = data
+        while len(_entries) > _MAX_ENTRIES:  # pragma: no cover
+            _entries.popitem(last=False)
+    return data
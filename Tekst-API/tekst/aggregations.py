@@ -0,0 +1,221 @@
+from collections import Counter
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any
+
+from beanie import PydanticObjectId
+from beanie.operators import Eq, In, Set
+from pymongo import UpdateOne
+
+from tekst.logs import log
+from tekst.models.content import ContentBaseDocument
+from tekst.models.precomputed import PrecomputedDataDocument, ValueCountDocument
+from tekst.models.resource import ResourceBaseDocument
+
+
+# type of the precomputed data holding the aggregations of a resource
+_AGGREGATIONS_TYPE = "aggregations"
+
+# type of the precomputed data marking the value counts of a resource as complete
+# (its creation time is the time the value counts were last brought up-to-date)
+_VALUE_COUNTS_TYPE = "value_counts"
+
+
+async def _get_precomp_doc(
+    resource_id: PydanticObjectId,
+    precomputed_type: str,
+) -> PrecomputedDataDocument:
+    return await PrecomputedDataDocument.find_one(
+        Eq(PrecomputedDataDocument.ref_id, resource_id),
+        Eq(PrecomputedDataDocument.precomputed_type, precomputed_type),
+    ) or PrecomputedDataDocument(
+        ref_id=resource_id,
+        precomputed_type=precomputed_type,
+    )
+
+
+async def _recompute_value_counts(
+    resource_id: PydanticObjectId,
+    values_pipeline: list[dict[str, Any]],
+) -> None:
+    await ValueCountDocument.find(
+        Eq(ValueCountDocument.resource_id, resource_id),
+    ).delete()
+    await (
+        ContentBaseDocument.find(
+            Eq(ContentBaseDocument.resource_id, resource_id),
+            Eq(ContentBaseDocument.archived, False),
+            with_children=True,
+        )
+        .aggregate(
+            [
+                *values_pipeline,
+                # count the occurrences of each distinct key/value pair
+                {
+                    "$group": {
+                        "_id": {"key": "$key", "value": "$value"},
+                        "occurrences": {"$sum": 1},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "resource_id": {"$literal": resource_id},
+                        "key": "$_id.key",
+                        "value": "$_id.value",
+                        "occurrences": 1,
+                    }
+                },
+                {"$merge": {"into": ValueCountDocument.get_collection_name()}},
+            ],
+            allowDiskUse=True,
+        )
+        .to_list()
+    )
+
+
+async def _summarize_value_counts(
+    resource_id: PydanticObjectId,
+    max_values_per_key: int,
+) -> list[dict[str, Any]]:
+    return (
+        await ValueCountDocument.find(
+            Eq(ValueCountDocument.resource_id, resource_id),
+        )
+        .aggregate(
+            [
+                # create one document for each key, collecting the most
+                # frequent values and the key occurrence count
+                {
+                    "$group": {
+                        "_id": "$key",
+                        "keyOcc": {"$sum": "$occurrences"},
+                        "distinct": {"$sum": 1},
+                        "values": {
+                            "$topN": {
+                                "n": max_values_per_key,
+                                "sortBy": {"occurrences": -1, "value": 1},
+                                "output": "$value",
+                            }
+                        },
+                    }
+                },
+                # sort docs by key occurrence
+                {"$sort": {"keyOcc": -1, "_id": 1}},
+                # project to final doc format, omitting the values
+                # of keys with more than n distinct values
+                {
+                    "$project": {
+                        "_id": 0,
+                        "key": "$_id",
+                        "values": {
+                            "$cond": {
+                                "if": {"$gt": ["$distinct", max_values_per_key]},
+                                "then": "$$REMOVE",
+                                "else": "$values",
+                            }
+                        },
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+        .to_list()
+    )
+
+
+async def _save_aggregations(
+    resource_id: PydanticObjectId,
+    max_values_per_key: int,
+) -> None:
+    precomp_doc = await _get_precomp_doc(resource_id, _AGGREGATIONS_TYPE)
+    precomp_doc.data = await _summarize_value_counts(resource_id, max_values_per_key)
+    precomp_doc.created_at = datetime.now(UTC)
+    await precomp_doc.save()
+
+
+async def update_aggregations(
+    resource: ResourceBaseDocument,
+    *,
+    values_pipeline: list[dict[str, Any]],
+    max_values_per_key: int,
+    force: bool = False,
+) -> None:
+    """
+    Updates the precomputed aggregations of the given resource: A list of all keys
+    found in its current contents (most frequent first), each with a list of
+    its values (most frequent first). The values are omitted for keys with more than
+    `max_values_per_key` distinct values. The given pipeline stages have to turn the
+    resource's contents into one document with a `key` and a `value` field
+    per occurrence of a value. The occurrence counts of all distinct key/value pairs
+    are kept in the DB, so they can be updated incrementally on content changes
+    (see `update_aggregations_incrementally()`).
+    """
+    if not resource.id:  # pragma: no cover
+        raise RuntimeError("Resource must be saved before aggregations can be created")
+    precomp_doc = await _get_precomp_doc(resource.id, _AGGREGATIONS_TYPE)
+    if precomp_doc.created_at >= resource.contents_changed_at and not force:
+        log.debug(f"Aggregations for resource {str(resource.id)} up-to-date. Skipping.")
+        return
+    counts_doc = await _get_precomp_doc(resource.id, _VALUE_COUNTS_TYPE)
+    await _recompute_value_counts(resource.id, values_pipeline)
+    counts_doc.created_at = datetime.now(UTC)
+    await counts_doc.save()
+    await _save_aggregations(resource.id, max_values_per_key)
+
+
+async def update_aggregations_incrementally(
+    resource_id: PydanticObjectId,
+    *,
+    changed_before: datetime,
+    removed: Iterable[tuple[str, Any]],
+    added: Iterable[tuple[str, Any]],
+    max_values_per_key: int,
+) -> None:
+    """
+    Updates the precomputed aggregations of the given resource by applying the
+    key/value pairs removed from and added to its contents by a single change,
+    without having to process all of its contents again. `changed_before` is the
+    time the resource's contents changed before this change. If the stored value
+    counts weren't up-to-date at that time, nothing is done and the aggregations are
+    left to be recomputed by the next resource precomputation run.
+    """
+    counts_doc = await PrecomputedDataDocument.find_one(
+        Eq(PrecomputedDataDocument.ref_id, resource_id),
+        Eq(PrecomputedDataDocument.precomputed_type, _VALUE_COUNTS_TYPE),
+    )
+    if not counts_doc or counts_doc.created_at < changed_before:
+        return
+    delta = Counter(added)
+    delta.subtract(removed)
+    ops = [
+        UpdateOne(
+            {"resource_id": resource_id, "key": key, "value": value},
+            {"$inc": {"occurrences": count}},
+            upsert=True,
+        )
+        for (key, value), count in delta.items()
+        if count
+    ]
+    if ops:
+        coll = ValueCountDocument.get_pymongo_collection()
+        await coll.bulk_write(ops, ordered=False)
+        await coll.delete_many({"resource_id": resource_id, "occurrences": {"$lte": 0}})
+    await PrecomputedDataDocument.find_one(
+        Eq(PrecomputedDataDocument.id, counts_doc.id),
+    ).update(Set({PrecomputedDataDocument.created_at: datetime.now(UTC)}))
+    await _save_aggregations(resource_id, max_values_per_key)
+
+
+async def delete_aggregations(resource_ids: list[PydanticObjectId]) -> None:
+    """Deletes all aggregations data of the given resources"""
+    await ValueCountDocument.find(
+        In(ValueCountDocument.resource_id, resource_ids),
+    ).delete()
+    await PrecomputedDataDocument.find(
+        In(PrecomputedDataDocument.ref_id, resource_ids),
+        In(
+            PrecomputedDataDocument.precomputed_type,
+            [_AGGREGATIONS_TYPE, _VALUE_COUNTS_TYPE],
+        ),
+    ).delete()
@@ -1,16 +1,18 @@
+import asyncio
 import gc
 import re
 
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from os import getenv
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette_csrf import CSRFMiddleware
 
-from tekst import db, search
+from tekst import change_tracker, db, executor, search, tasks
+from tekst.conditional import NotModifiedError
 from tekst.config import TekstConfig, get_config
 from tekst.db import migrations
 from tekst.errors import TekstErrorModel, TekstHTTPException
@@ -24,9 +26,11 @@ from tekst.state import get_state
 
 _NO_SERVICES = getenv("TEKST_NO_SERVICES", False)
 _cfg: TekstConfig = get_config()  # get (possibly cached) config data
+_task_worker: asyncio.Task[None] | None = None
 
 
 async def startup_routine(app: FastAPI) -> None:
+    global _task_worker
     setup_routes(app, dev_mode=_cfg.dev_mode)
 
     if not _NO_SERVICES:
@@ -42,6 +46,11 @@ async def startup_routine(app: FastAPI) -> None:
             )
         # init ES client
         await search.init_es_client()
+        # run queued background tasks in this API process, if configured
+        if _cfg.tasks.run_in_api:
+            _task_worker = asyncio.create_task(
+                tasks.run_worker(concurrency=_cfg.tasks.worker_concurrency)
+            )
     else:  # pragma: no cover
         state = PlatformState()
 
@@ -61,6 +70,12 @@ async def startup_routine(app: FastAPI) -> None:
 async def shutdown_routine(app: FastAPI) -> None:
     log.info(f"{_cfg.tekst['name']} cleaning up and shutting down...")
     if not _NO_SERVICES:
+        if _task_worker:
+            _task_worker.cancel()
+            with suppress(asyncio.CancelledError):
+                await _task_worker
+        executor.shutdown()
+        await change_tracker.flush()
         await db.close()
         await search.close()
 
@@ -114,6 +129,11 @@ if _cfg.cors.enable:
     )
 
 
+@app.exception_handler(NotModifiedError)
+async def not_modified_handler(request: Request, exc: NotModifiedError):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=exc.headers)
+
+
 @app.exception_handler(StarletteHTTPException)
 async def custom_http_exception_handler(request: Request, exc: Exception):
     # force garbage collection due to issues with custom exception handler
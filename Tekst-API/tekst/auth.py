@@ -43,6 +43,7 @@ from fastapi_users_db_beanie.access_token import (
 )
 from humps import decamelize
 
+from tekst import access_cache
 from tekst.config import TekstConfig, get_config
 from tekst.counters import counter_incr
 from tekst.logs import log
@@ -325,6 +326,9 @@ class UserManager(ObjectIDIDMixin, BaseUserManager[UserDocument, PydanticObjectI
         # delete user messages sent by user
         await UserMessageDocument.find(UserMessageDocument.sender == user.id).delete()
 
+        # resources accessible by users might have changed
+        await access_cache.invalidate()
+
     async def on_after_delete(self, user: UserDocument, request: Request | None = None):
         await counter_incr("deleted_users")
         await send_notification(
@@ -0,0 +1,168 @@
+import asyncio
+
+from collections.abc import Iterable
+from datetime import datetime
+
+from beanie import PydanticObjectId
+from beanie.operators import In, Set
+from pymongo import UpdateOne
+
+from tekst.config import TekstConfig, get_config
+from tekst.logs import log
+from tekst.models.index_journal import IndexJournalEntryDocument
+from tekst.models.resource import ResourceBaseDocument
+from tekst.models.text import TextDocument
+
+
+_cfg: TekstConfig = get_config()
+
+# pending changes of this API worker, mapping resource IDs to the time their contents
+# changed, text IDs to the IDs of the locations whose contents changed
+# (or None if the whole text's index is affected) and counter IDs to the amounts
+# to increment the counters by
+_pending_resources: dict[PydanticObjectId, datetime] = {}
+_pending_texts: dict[PydanticObjectId, set[PydanticObjectId] | None] = {}
+_pending_counters: dict[str, int] = {}
+_flush_task: asyncio.Task[None] | None = None
+
+
+async def resource_contents_changed(
+    resource_id: PydanticObjectId,
+    changed_at: datetime,
+) -> None:
+    """Records that the contents of the given resource changed at the given time"""
+    _add_resource_change(resource_id, changed_at)
+    await _schedule_flush()
+
+
+def contents_changed_at(resource: ResourceBaseDocument) -> datetime:
+    """
+    Returns the time the contents of the given resource last changed,
+    considering changes recorded by this API worker that aren't written, yet
+    """
+    pending_changed_at = _pending_resources.get(resource.id)
+    if pending_changed_at is None or resource.contents_changed_at > pending_changed_at:
+        return resource.contents_changed_at
+    return pending_changed_at
+
+
+async def text_index_ood(
+    text_id: PydanticObjectId,
+    location_ids: list[PydanticObjectId] | None = None,
+) -> None:
+    """
+    Records that the search index of the given text is out-of-date. If `location_ids`
+    is given, only the contents of these locations are considered to be changed.
+    """
+    _add_text_change(text_id, location_ids)
+    await _schedule_flush()
+
+
+async def counter_incr(counter_id: str, amount: int = 1) -> None:
+    """
+    Records that the given counter has to be incremented by the given amount.
+    This is meant for counters that are incremented on (almost) every request.
+    """
+    _add_counter_change(counter_id, amount)
+    await _schedule_flush()
+
+
+def _add_resource_change(
+    resource_id: PydanticObjectId,
+    changed_at: datetime,
+) -> None:
+    pending_changed_at = _pending_resources.get(resource_id)
+    if pending_changed_at is None or changed_at > pending_changed_at:
+        _pending_resources[resource_id] = changed_at
+
+
+def _add_text_change(
+    text_id: PydanticObjectId,
+    location_ids: Iterable[PydanticObjectId] | None,
+) -> None:
+    if location_ids is None:
+        _pending_texts[text_id] = None
+    elif text_id not in _pending_texts:
+        _pending_texts[text_id] = set(location_ids)
+    elif (pending_location_ids := _pending_texts[text_id]) is not None:
+        pending_location_ids.update(location_ids)
+
+
+def _add_counter_change(counter_id: str, amount: int) -> None:
+    _pending_counters[counter_id] = _pending_counters.get(counter_id, 0) + amount
+
+
+async def _schedule_flush() -> None:
+    global _flush_task
+    if _cfg.misc.changes_flush_delay_ms <= 0:
+        await flush()
+    elif _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_delayed())
+
+
+async def _flush_delayed() -> None:
+    while True:
+        await asyncio.sleep(_cfg.misc.changes_flush_delay_ms / 1000)
+        try:
+            await flush()
+            return
+        except Exception as e:  # pragma: no cover
+            log.error(f"Failed to write pending changes (will retry): {e}")
+
+
+async def flush() -> None:
+    """
+    Writes all pending changes recorded by this API worker to the database,
+    each kind of change with as few targeted updates as possible. Changes that
+    couldn't be written are kept pending and the error is raised.
+
+    Note that this only writes the changes recorded by the current process. Changes
+    recorded by other API workers are written by these after the configured delay.
+    """
+    resources = dict(_pending_resources)
+    texts = dict(_pending_texts)
+    counters = dict(_pending_counters)
+    _pending_resources.clear()
+    _pending_texts.clear()
+    _pending_counters.clear()
+    try:
+        if counters:
+            from tekst import counters as db_counters
+
+            for counter_id in list(counters):
+                await db_counters.counter_incr(counter_id, counters.pop(counter_id))
+        if resources:
+            await ResourceBaseDocument.get_pymongo_collection().bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": resource_id},
+                        {"$max": {"contents_changed_at": changed_at}},
+                    )
+                    for resource_id, changed_at in resources.items()
+                ],
+                ordered=False,
+            )
+            resources = {}
+        if texts:
+            from tekst import platform_cache
+
+            # record the changes in the index journal before marking the texts'
+            # indices as out-of-date (indexing relies on this order)
+            for text_id, location_ids in texts.items():
+                await IndexJournalEntryDocument.record(
+                    text_id,
+                    list(location_ids) if location_ids is not None else None,
+                )
+            await TextDocument.find(In(TextDocument.id, list(texts))).update(
+                Set({TextDocument.index_utd: False})
+            )
+            await platform_cache.invalidate()
+    except Exception:
+        # keep the changes that weren't written, so they aren't lost
+        for resource_id, changed_at in resources.items():
+            _add_resource_change(resource_id, changed_at)
+        for text_id, location_ids in texts.items():
+            _add_text_change(text_id, location_ids)
+        for counter_id, amount in counters.items():
+            _add_counter_change(counter_id, amount)
+        raise
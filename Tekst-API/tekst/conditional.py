@@ -0,0 +1,125 @@
+import hashlib
+import json
+
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, Any
+
+from fastapi import Depends, Request, Response
+
+from tekst.config import TekstConfig, get_config
+from tekst.models.resource import ResourceBaseDocument
+
+
+_cfg: TekstConfig = get_config()
+
+
+class NotModifiedError(Exception):
+    """Raised to answer a conditional request with `304 Not Modified`"""
+
+    def __init__(self, headers: dict[str, str]) -> None:
+        super().__init__("Not Modified")
+        self.headers = headers
+
+
+class ConditionalResponse:
+    """
+    Conditional request handling for read-mostly endpoints. Before building their
+    response, endpoints call `check()` with version stamps identifying the state of
+    the data they respond with. If the client's cached response is still up-to-date,
+    the request is answered with `304 Not Modified` right away.
+    """
+
+    def __init__(self, request: Request, response: Response) -> None:
+        self._request = request
+        self._response = response
+        self.headers: dict[str, str] = {}
+
+    def check(
+        self,
+        *stamps: Any,
+        last_modified: datetime | None = None,
+        public: bool = False,
+    ) -> None:
+        """
+        Sets the validator and caching headers derived from the given version stamps,
+        then raises `NotModifiedError` if the client's cached response is still
+        up-to-date. Public responses may be stored by shared caches (e.g. CDNs).
+        """
+        etag = f'"{make_etag(*stamps)}"'
+        self.headers = {
+            "ETag": etag,
+            "Cache-Control": "public, no-cache" if public else "private, no-cache",
+            "Vary": "Authorization, Cookie",
+        }
+        if last_modified:
+            self.headers["Last-Modified"] = format_datetime(
+                last_modified.astimezone(UTC), usegmt=True
+            )
+        self._response.headers.update(self.headers)
+        if self._is_not_modified(etag, last_modified):
+            raise NotModifiedError(self.headers)
+
+    def check_contents(
+        self,
+        resources: list[ResourceBaseDocument],
+        *stamps: Any,
+        public: bool = False,
+    ) -> None:
+        """
+        Same as `check()`, for responses built from the contents of the given
+        resources (and possibly other data identified by the given version stamps).
+        Besides the time their contents changed, the stamps include the resources'
+        settings that affect which contents are returned. There is no `Last-Modified`
+        header, as changes to these settings aren't timestamped.
+        """
+        from tekst import change_tracker
+
+        self.check(
+            *[
+                (
+                    res.id,
+                    change_tracker.contents_changed_at(res),
+                    res.level,
+                    res.patch_for,
+                    res.config.model_dump(mode="json"),
+                )
+                for res in resources
+            ],
+            *stamps,
+            public=public,
+        )
+
+    def _is_not_modified(self, etag: str, last_modified: datetime | None) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.1.3)
+        if_none_match = self._request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or etag in [
+                tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+            ]
+        if_modified_since = self._request.headers.get("if-modified-since")
+        if not if_modified_since or not last_modified:
+            return False
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(
+                if_modified_since
+            )
+        except (TypeError, ValueError):
+            return False
+
+
+def make_etag(*stamps: Any) -> str:
+    """
+    Returns an entity tag (without quotes) for the given version stamps,
+    which have to identify the state of the response data unambiguously
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [_cfg.tekst["version"], *stamps],
+            separators=(",", ":"),
+            default=str,
+        ).encode()
+    ).hexdigest()[:32]
+
+
+ConditionalDep = Annotated[ConditionalResponse, Depends()]
@@ -138,6 +138,12 @@ class ElasticsearchConfig(ConfigSubSection):
     timeout_init_s: int = 240
     timeout_general_s: int = 30
     timeout_search_s: str = "30s"
+    index_concurrency: Annotated[int, Field(ge=1, le=32)] = 2
+    index_bulk_workers: Annotated[int, Field(ge=1, le=32)] = 2
+    index_bulk_max_bytes: Annotated[int, Field(ge=1024)] = 5242880  # 5 MiB
+    search_cache_size: Annotated[int, Field(ge=0)] = 1000
+    search_cache_ttl_s: Annotated[int, Field(ge=1)] = 600
+    search_cache_shared: bool = False
 
     @field_validator("host", mode="before")
     @classmethod
@@ -244,6 +250,9 @@ class EMailConfig(ConfigSubSection):
         FalsyToNone,
     ] = None
     smtp_starttls: bool = True
+    smtp_batch_size: Annotated[int, Field(ge=1)] = 100
+    smtp_rate_limit: Annotated[float, Field(ge=0)] = 10
+    outbox_max_age_hours: Annotated[int, Field(ge=1)] = 24
     from_address: str = "noreply@example-tekst-instance.org"
 
 
@@ -315,12 +324,26 @@ class CORSConfig(ConfigSubSection):
         return v
 
 
+class TasksConfig(ConfigSubSection):
+    """Background tasks config sub section model"""
+
+    run_in_api: bool = True
+    worker_concurrency: Annotated[int, Field(ge=1)] = 2
+    poll_interval_s: Annotated[int, Field(ge=1)] = 2
+    lease_s: Annotated[int, Field(ge=10)] = 60
+    max_attempts: Annotated[int, Field(ge=1)] = 3
+    retry_backoff_s: Annotated[int, Field(ge=0)] = 30
+    process_pool_size: Annotated[int, Field(ge=0, le=64)] = 2
+
+
 class MiscConfig(ConfigSubSection):
     """Misc config sub section model"""
 
     usrmsg_force_delete_after_days: int = 365
     max_resources_per_user: int = 10
     del_exports_after_minutes: int = 5
+    export_cache_max_mb: Annotated[int, Field(ge=0)] = 512
+    changes_flush_delay_ms: Annotated[int, Field(ge=0)] = 1000
 
     @computed_field
     @property
@@ -365,6 +388,7 @@ class TekstConfig(BaseSettings):
     email: EMailConfig = EMailConfig()  # Email-related config
     api_doc: ApiDocConfig = ApiDocConfig()  # API documentation-related config
     cors: CORSConfig = CORSConfig()  # CORS-related config
+    tasks: TasksConfig = TasksConfig()  # background tasks config
     misc: MiscConfig = MiscConfig()  # misc config
 
     @computed_field
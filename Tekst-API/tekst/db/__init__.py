@@ -12,11 +12,14 @@ from tekst.logs import log
 from tekst.models.bookmark import BookmarkDocument
 from tekst.models.content import ContentBaseDocument
 from tekst.models.correction import CorrectionDocument
+from tekst.models.email_outbox import EmailOutboxDocument
+from tekst.models.index_journal import IndexJournalEntryDocument
 from tekst.models.location import LocationDocument
 from tekst.models.message import UserMessageDocument
 from tekst.models.platform import PlatformStateDocument
-from tekst.models.precomputed import PrecomputedDataDocument
+from tekst.models.precomputed import PrecomputedDataDocument, ValueCountDocument
 from tekst.models.resource import ResourceBaseDocument
+from tekst.models.search_cache import SearchCacheEntryDocument
 from tekst.models.segment import ClientSegmentDocument
 from tekst.models.text import TextDocument
 from tekst.models.user import UserDocument
@@ -76,6 +79,10 @@ async def init_odm(db: Database = get_db()) -> None:
         AccessTokenDocument,
         TaskDocument,
         PrecomputedDataDocument,
+        ValueCountDocument,
+        IndexJournalEntryDocument,
+        SearchCacheEntryDocument,
+        EmailOutboxDocument,
     ]
     # add all resource types' resource and content document models
     for lt_class in resource_types_mgr.get_all().values():
@@ -0,0 +1,92 @@
+from datetime import UTC, datetime
+
+from tekst.db import Database
+
+
+async def _materialize_location_paths(db: Database) -> None:
+    # store the IDs of all ancestors and the full label with each location
+    async for text in db.texts.find({}, {"_id": 1, "loc_delim": 1}):
+        await db.locations.aggregate(
+            [
+                {"$match": {"text_id": text["_id"]}},
+                {
+                    "$graphLookup": {
+                        "from": "locations",
+                        "startWith": "$parent_id",
+                        "connectFromField": "parent_id",
+                        "connectToField": "_id",
+                        "as": "path",
+                        "depthField": "depth",
+                        "restrictSearchWithMatch": {"text_id": text["_id"]},
+                    }
+                },
+                {
+                    "$set": {
+                        "path": {
+                            "$sortArray": {"input": "$path", "sortBy": {"depth": -1}}
+                        }
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 1,
+                        "ancestors": "$path._id",
+                        "full_label": {
+                            "$reduce": {
+                                "input": {"$concatArrays": ["$path.label", ["$label"]]},
+                                "initialValue": None,
+                                "in": {
+                                    "$cond": {
+                                        "if": {"$eq": ["$$value", None]},
+                                        "then": "$$this",
+                                        "else": {
+                                            "$concat": [
+                                                "$$value",
+                                                {
+                                                    "$literal": text.get("loc_delim")
+                                                    or ", "
+                                                },
+                                                "$$this",
+                                            ]
+                                        },
+                                    }
+                                },
+                            }
+                        },
+                    }
+                },
+                {
+                    "$merge": {
+                        "into": "locations",
+                        "on": "_id",
+                        "whenMatched": "merge",
+                        "whenNotMatched": "discard",
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+
+
+async def _fail_legacy_tasks(db: Database) -> None:
+    # unfinished tasks queued before tasks were run by claiming workers
+    # can't be run anymore (they lack the task function), so they have failed
+    await db.tasks.update_many(
+        {
+            "func": {"$exists": False},
+            "status": {"$in": ["waiting", "running"]},
+        },
+        {
+            "$set": {
+                "status": "failed",
+                "end_time": datetime.now(UTC),
+                "error": "internalServerError",
+                "error_details": "Task was interrupted by a platform upgrade",
+            }
+        },
+    )
+
+
+async def migration(db: Database) -> None:
+    await _materialize_location_paths(db)
+    await _fail_legacy_tasks(db)
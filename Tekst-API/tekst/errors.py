@@ -34,6 +34,10 @@ class TekstHTTPException(HTTPException):
             headers=headers,
         )
 
+    def __reduce__(self):
+        # allows passing these exceptions between processes (see `tekst.executor`)
+        return (self.__class__, (self.status_code, self.detail, self.headers))
+
 
 def responses(
     errors: list[TekstHTTPException],
@@ -357,3 +361,9 @@ E_400_REQUESTED_TOO_MANY_SEARCH_RESULTS = _error_instance(
     key="requestedTooManySearchResults",
     msg="Maximum number of requested search results exceeded: 10000",
 )
+
+E_400_INVALID_SEARCH_CURSOR = _error_instance(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    key="invalidSearchCursor",
+    msg="The search cursor passed is invalid or has expired",
+)
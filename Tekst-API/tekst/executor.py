@@ -0,0 +1,62 @@
+import asyncio
+import multiprocessing
+
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from tekst.config import TekstConfig, get_config
+
+
+_cfg: TekstConfig = get_config()
+_pool: ProcessPoolExecutor | None = None
+
+
+def _init_process() -> None:  # pragma: no cover
+    # (runs in the pool processes) import the DB module first, so all app modules
+    # are imported in the same order as in the main process (avoids circular imports)
+    import tekst.db  # noqa: F401
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=_cfg.tasks.process_pool_size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+        )
+    return _pool
+
+
+async def run_cpu_bound[**P, R](
+    func: Callable[P, R],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> R:
+    """
+    Runs the given CPU-bound function in a process of the process pool, so it doesn't
+    block the event loop. The function has to be defined at module level and both its
+    arguments and its return value have to be plain (picklable) data. If the process
+    pool is disabled, the function is run in a thread of the default executor.
+    """
+    if _cfg.tasks.process_pool_size < 1:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _get_pool(),
+            partial(func, *args, **kwargs),
+        )
+    except BrokenProcessPool:  # pragma: no cover
+        # a pool process died unexpectedly, so the pool has to be recreated
+        shutdown()
+        raise
+
+
+def shutdown() -> None:
+    """Shuts down the process pool (if it was started)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
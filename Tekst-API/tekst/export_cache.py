@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import shutil
+
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+from tekst.config import TekstConfig, get_config
+
+
+_cfg: TekstConfig = get_config()
+
+# name of the directory (inside the temp files directory) holding the cached exports
+_CACHE_DIR_NAME = "export_cache"
+
+
+def is_enabled() -> bool:
+    return _cfg.misc.export_cache_max_mb > 0
+
+
+def _cache_dir() -> Path:
+    path = _cfg.temp_files_dir / _CACHE_DIR_NAME
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def _link(source_path: Path, target_path: Path) -> None:
+    """
+    Hard-links the source file to the target path, falling back to copying
+    the file if hard links aren't supported by the file system
+    """
+    try:
+        os.link(source_path, target_path)
+    except (FileExistsError, FileNotFoundError):
+        raise
+    except OSError:  # pragma: no cover
+        shutil.copyfile(source_path, target_path)
+
+
+def make_key(**props: Any) -> str:
+    """
+    Returns a cache key for an export, based on the given properties, which have to
+    identify the export data (and the state of all data it is based on) unambiguously
+    """
+    return hashlib.sha256(
+        json.dumps(
+            props,
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+def get(key: str, target_path: Path) -> bool:
+    """
+    Provides the cached export file for the given key at the given path,
+    if there is one. Returns whether there was a cached export file.
+    """
+    cached_path = _cache_dir() / key
+    try:
+        _link(cached_path, target_path)
+    except FileNotFoundError:
+        return False
+    # mark the cached file as recently used
+    with suppress(FileNotFoundError):
+        os.utime(cached_path)
+    return True
+
+
+def put(key: str, file_path: Path) -> None:
+    """
+    Stores the given export file in the cache, then evicts the least
+    recently used cached files until the cache fits into its size quota
+    """
+    with suppress(FileExistsError):
+        _link(file_path, _cache_dir() / key)
+    entries = []
+    for path in _cache_dir().iterdir():
+        with suppress(FileNotFoundError):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+    size = sum(entry[1] for entry in entries)
+    max_size = _cfg.misc.export_cache_max_mb * 1024 * 1024
+    for _, entry_size, path in sorted(entries, key=lambda entry: entry[0]):
+        if size <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        size -= entry_size
@@ -0,0 +1,114 @@
+import json
+
+from collections.abc import Generator
+from typing import Any, TextIO
+
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _BufferedJSONReader:
+    """
+    Reads JSON values from a text file using a buffer that only ever holds
+    the currently parsed value (and what's left of the last chunk read)
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_size: int = 0) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(max(self._chunk_size, min_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self._buf, self._pos)
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace char (or an empty string at EOF)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos : self._pos + 1]
+
+    def skip(self, char: str) -> bool:
+        """Consumes the next non-whitespace char if it is the given one"""
+        if self.peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, char: str) -> None:
+        if not self.skip(char):
+            raise self._error(f"Expecting '{char}'")
+
+    def value(self) -> Any:
+        """Parses and returns the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # the value might just be incomplete, so read more data
+                # (growing the read size to keep re-parsing costs linear)
+                if not self._fill(len(self._buf) - self._pos):
+                    raise
+                continue
+            # a number at the very end of the buffer might be truncated
+            if end == len(self._buf) and self._fill(len(self._buf) - self._pos):
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_array_items(
+    f: TextIO,
+    key: str,
+    other_props: dict[str, Any] | None = None,
+    *,
+    chunk_size: int = 65536,
+) -> Generator[Any]:
+    """
+    Incrementally parses a JSON object from the given text file and yields the items
+    of the array found at the given top-level key one by one, so the whole array never
+    has to be held in memory. All other top-level properties of the object are stored
+    in `other_props` (if passed). Raises a `json.JSONDecodeError` if the file contains
+    invalid JSON and a `TypeError` if the value at the given key is not an array.
+    """
+    reader = _BufferedJSONReader(f, chunk_size)
+    reader.expect("{")
+    if reader.skip("}"):
+        return
+    while True:
+        prop = reader.value()
+        if not isinstance(prop, str):
+            raise json.JSONDecodeError("Expecting property name", str(prop), 0)
+        reader.expect(":")
+        if prop == key:
+            if not reader.skip("["):
+                raise TypeError(f"Value of '{key}' is not an array")
+            if not reader.skip("]"):
+                while True:
+                    yield reader.value()
+                    if not reader.skip(","):
+                        reader.expect("]")
+                        break
+        else:
+            value = reader.value()
+            if other_props is not None:
+                other_props[prop] = value
+        if not reader.skip(","):
+            reader.expect("}")
+            break
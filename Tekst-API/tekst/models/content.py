@@ -1,8 +1,9 @@
+from collections.abc import AsyncGenerator
 from datetime import UTC, datetime
 from typing import Annotated, Literal, NotRequired, TypedDict
 
 from beanie import PydanticObjectId
-from beanie.odm.queries.aggregation import AggregationQuery
+from beanie.operators import In
 from pydantic import (
     AwareDatetime,
     Field,
@@ -175,17 +176,29 @@ class ContentBaseDocument(ContentBase, DocumentBase):
         ]
 
     @classmethod
-    def find_by_id_in_order(
-        cls, content_ids: list[PydanticObjectId]
-    ) -> AggregationQuery["ContentBaseDocument"]:
-        return ContentBaseDocument.find_all(with_children=True).aggregate(
-            [
-                {"$match": {"_id": {"$in": content_ids}}},
-                {"$addFields": {"__order": {"$indexOfArray": [content_ids, "$_id"]}}},
-                {"$sort": {"__order": 1}},
-            ],
-            projection_model=ContentBaseDocument,
-        )
+    async def find_by_id_in_order(
+        cls,
+        content_ids: list[PydanticObjectId],
+        *,
+        batch_size: int = 1000,
+    ) -> AsyncGenerator["ContentBaseDocument"]:
+        """
+        Yields the contents with the given IDs in the order of the given IDs,
+        skipping IDs of contents that don't exist. The contents are fetched in batches
+        and reordered client-side, so only one batch is held in memory at a time.
+        """
+        for i in range(0, len(content_ids), batch_size):
+            batch_ids = content_ids[i : i + batch_size]
+            contents: dict[PydanticObjectId | None, ContentBaseDocument] = {
+                content.id: content
+                for content in await ContentBaseDocument.find(
+                    In(ContentBaseDocument.id, batch_ids),
+                    with_children=True,
+                ).to_list()
+            }
+            for content_id in batch_ids:
+                if content_id in contents:
+                    yield contents[content_id]
 
     async def archive(self) -> "ContentBaseDocument":
         """
@@ -0,0 +1,55 @@
+from datetime import UTC, datetime
+from typing import Annotated
+
+from pydantic import AwareDatetime, Field
+
+from tekst.models.common import DocumentBase, ModelBase
+
+
+class EmailOutboxDocument(ModelBase, DocumentBase):
+    """An email waiting in the outbox to be sent by the background email sender"""
+
+    class Settings(DocumentBase.Settings):
+        name = "email_outbox"
+        indexes = [
+            "claim_id",
+            "sending_until",
+        ]
+
+    to: Annotated[
+        str,
+        Field(description="Recipient address of the email"),
+    ]
+
+    subject: Annotated[
+        str,
+        Field(description="Subject of the email"),
+    ]
+
+    txt: Annotated[
+        str,
+        Field(description="Plain text body of the email"),
+    ]
+
+    html: Annotated[
+        str,
+        Field(description="HTML body of the email"),
+    ]
+
+    created_at: Annotated[
+        AwareDatetime,
+        Field(
+            description="Time the email was put into the outbox",
+            default_factory=lambda: datetime.now(UTC),
+        ),
+    ]
+
+    claim_id: Annotated[
+        str | None,
+        Field(description="ID of the claim of the sender currently sending the email"),
+    ] = None
+
+    sending_until: Annotated[
+        AwareDatetime | None,
+        Field(description="Time the claim of the sender currently sending it expires"),
+    ] = None
@@ -0,0 +1,72 @@
+from datetime import UTC, datetime
+from typing import Annotated
+
+from beanie import PydanticObjectId
+from pydantic import AwareDatetime, Field
+
+from tekst.models.common import DocumentBase, ModelBase
+
+
+# maximum number of location IDs stored in a single journal entry
+_MAX_LOCATION_IDS_PER_ENTRY = 1000
+
+
+class IndexJournalEntryDocument(ModelBase, DocumentBase):
+    """
+    Journal entry recording a change that invalidates (parts of) a text's search index
+    """
+
+    class Settings(DocumentBase.Settings):
+        name = "index_journal"
+        indexes = [
+            "text_id",
+        ]
+
+    text_id: Annotated[
+        PydanticObjectId,
+        Field(description="ID of the text whose index is affected by the change"),
+    ]
+
+    location_ids: Annotated[
+        list[PydanticObjectId] | None,
+        Field(
+            description=(
+                "IDs of the locations whose contents changed "
+                "or None if the whole text's index is affected"
+            ),
+        ),
+    ] = None
+
+    created_at: Annotated[
+        AwareDatetime,
+        Field(
+            description="Time the change was recorded",
+            default_factory=lambda: datetime.now(UTC),
+        ),
+    ]
+
+    @classmethod
+    async def record(
+        cls,
+        text_id: PydanticObjectId,
+        location_ids: list[PydanticObjectId] | None = None,
+    ) -> None:
+        """
+        Records a change for the given text. If `location_ids` is `None`,
+        the change affects the whole text's index.
+        """
+        if location_ids is None:
+            await cls(text_id=text_id).insert()
+            return
+        location_ids = list(set(location_ids))
+        if not location_ids:  # pragma: no cover
+            return
+        await cls.insert_many(
+            [
+                cls(
+                    text_id=text_id,
+                    location_ids=location_ids[i : i + _MAX_LOCATION_IDS_PER_ENTRY],
+                )
+                for i in range(0, len(location_ids), _MAX_LOCATION_IDS_PER_ENTRY)
+            ]
+        )
@@ -1,6 +1,7 @@
 from typing import Annotated
 
 from beanie import PydanticObjectId
+from beanie.operators import In
 from pydantic import (
     BeforeValidator,
     Field,
@@ -65,6 +66,26 @@ class Location(ModelBase):
 
 
 class LocationDocument(Location, DocumentBase):
+    ancestors: Annotated[
+        list[PydanticObjectId],
+        Field(
+            description=(
+                "IDs of all ancestors of this location, "
+                "from the root location down to its parent"
+            ),
+        ),
+    ] = []
+
+    full_label: Annotated[
+        str,
+        Field(
+            description=(
+                "Labels of this location and all its ancestors, "
+                "joined by the text's location delimiter"
+            ),
+        ),
+    ] = ""
+
     class Settings(DocumentBase.Settings):
         name = "locations"
         indexes = [
@@ -74,9 +95,37 @@ class LocationDocument(Location, DocumentBase):
                 "level",
                 "position",
                 "aliases",
-            ]
+            ],
+            [
+                "text_id",
+                "level",
+                "position",
+            ],
+            "ancestors",
         ]
 
+    async def get_path(self) -> list["LocationDocument"]:
+        """
+        Returns the path of this location, from the root location down to this one
+        """
+        if self.level == 0:
+            return [self]
+        if not self.ancestors:
+            # the path isn't materialized (yet), so walk up the parent locations
+            path = [self]
+            while path[0].parent_id and (
+                parent := await LocationDocument.get(path[0].parent_id)
+            ):
+                path.insert(0, parent)
+            return path
+        ancestors = {
+            loc.id: loc
+            for loc in await LocationDocument.find(
+                In(LocationDocument.id, self.ancestors)
+            ).to_list()
+        }
+        return [ancestors[loc_id] for loc_id in self.ancestors] + [self]
+
 
 class LocationCreate(Location, CreateBase):
     pass
@@ -3,6 +3,7 @@ from typing import Annotated, Any
 
 from beanie import PydanticObjectId
 from pydantic import AwareDatetime, Field, StringConstraints
+from pymongo import IndexModel
 
 from tekst.models.common import DocumentBase, ModelBase
 
@@ -39,3 +40,36 @@ class PrecomputedDataDocument(ModelBase, DocumentBase):
         Any | None,
         Field(description="The precomputed data"),
     ] = None
+
+
+class ValueCountDocument(ModelBase, DocumentBase):
+    """
+    Number of occurrences of a distinct key/value pair in the contents of a resource
+    (used to incrementally maintain the resource's aggregations)
+    """
+
+    class Settings(DocumentBase.Settings):
+        name = "value_counts"
+        indexes = [
+            IndexModel(["resource_id", "key", "value"], unique=True),
+        ]
+
+    resource_id: Annotated[
+        PydanticObjectId,
+        Field(description="ID of the resource the counted values occur in"),
+    ]
+
+    key: Annotated[
+        str,
+        Field(description="Key the counted value belongs to"),
+    ]
+
+    value: Annotated[
+        Any,
+        Field(description="The counted value"),
+    ]
+
+    occurrences: Annotated[
+        int,
+        Field(description="Number of occurrences of the value for the key"),
+    ]
@@ -5,7 +5,7 @@ from typing import Annotated, Literal
 
 from beanie import PydanticObjectId
 from beanie.odm.operators.find import BaseFindOperator
-from beanie.operators import And, Eq, In, Or, Set
+from beanie.operators import And, Eq, In, Or
 from pydantic import (
     AwareDatetime,
     Field,
@@ -25,6 +25,7 @@ from tekst.models.common import (
     ModelBase,
     make_update_model,
 )
+from tekst.models.content import ContentBaseDocument
 from tekst.models.location import LocationDocument
 from tekst.models.platform import PlatformStateDocument
 from tekst.models.precomputed import PrecomputedDataDocument
@@ -414,7 +415,12 @@ class ResourceBaseDocument(ResourceBase, DocumentBase):
         Returns DB query criteria to match resources
         that the given user is allowed to read
         """
-        active_texts_ids = await TextDocument.get_active_texts_ids()
+        from tekst import access_cache
+
+        active_texts_ids = await access_cache.memoized(
+            "active_texts_ids",
+            TextDocument.get_active_texts_ids,
+        )
         # compose access condition for different user types
         if not user:
             # not logged in, no user
@@ -489,15 +495,31 @@ class ResourceBaseDocument(ResourceBase, DocumentBase):
             with_children=True,
         ).count()
 
-    async def contents_changed_hook(self) -> None:
+    async def contents_changed_hook(
+        self,
+        *,
+        removed: list[ContentBaseDocument] | None = None,
+        added: list[ContentBaseDocument] | None = None,
+    ) -> None:
         """
         Will be called whenever contents of a given resource are changed.
+        The resource's `contents_changed_at` time is written in bulk with other
+        pending changes after a short delay (see `change_tracker`).
+        If the change is known to only remove and/or add single contents (as opposed
+        to e.g. an import), these contents are passed as `removed` and `added`,
+        so precomputed data can be updated incrementally.
         This may be overridden by concrete resource implementations to do whatever
         is necessary to react to content changes. Overriding implementations MUST
         call `await super().contents_changed_hook()`!
         """
+        from tekst import change_tracker
+
         self.contents_changed_at = datetime.now(UTC)
-        await self.replace()
+        if self.id:
+            await change_tracker.resource_contents_changed(
+                self.id,
+                self.contents_changed_at,
+            )
 
     async def resource_precompute_hook(
         self,
@@ -518,13 +540,22 @@ class ResourceBaseDocument(ResourceBase, DocumentBase):
             raise e
         log_op_end(op_id)
 
-    async def set_index_ood(self):
-        """Set the index_utd flag for this text, considering the given parameters"""
+    async def set_index_ood(
+        self,
+        location_ids: list[PydanticObjectId] | None = None,
+    ) -> None:
+        """
+        Set the index_utd flag for this text, considering the given parameters,
+        and record the change in the index journal. If `location_ids` is given,
+        only the contents of these locations are considered to be changed.
+        The changes of one API worker are written in bulk after a short delay
+        (see `change_tracker`).
+        """
+        from tekst import change_tracker
+
         state: PlatformStateDocument = await get_state()
         if self.public or state.index_unpublished_resources:
-            await TextDocument.find_one(Eq(TextDocument.id, self.text_id)).update(
-                Set({TextDocument.index_utd: False})
-            )
+            await change_tracker.text_index_ood(self.text_id, location_ids)
 
     async def __precompute_coverage_data(
         self,
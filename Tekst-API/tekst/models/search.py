@@ -40,6 +40,15 @@ class SearchResults(ModelBase):
     total_hits: int
     total_hits_relation: Literal["eq", "gte"]
     max_score: float | None
+    cursor: Annotated[
+        str | None,
+        Field(
+            description=(
+                "Cursor to request the next page of results with "
+                "(only for cursor-based pagination, null if there are no more results)"
+            ),
+        ),
+    ] = None
 
     @classmethod
     def __transform_highlights(
@@ -65,6 +74,7 @@ class SearchResults(ModelBase):
         cls,
         results: ObjectApiResponse[Any],
         highlights_generators: dict[str, Any] | None = None,
+        cursor: str | None = None,
     ) -> "SearchResults":
         return cls(
             hits=[
@@ -84,11 +94,29 @@ class SearchResults(ModelBase):
             total_hits=results["hits"]["total"]["value"],
             total_hits_relation=results["hits"]["total"]["relation"],
             max_score=results["hits"]["max_score"],
+            cursor=cursor,
         )
 
 
 type SortingPreset = Literal["relevance", "text_level_position", "text_level_relevance"]
 
+type SearchExportFormat = Literal["json", "ndjson", "csv"]
+
+search_exp_fmt_info = {
+    "json": {
+        "extension": "json",
+        "mimetype": "application/json",
+    },
+    "ndjson": {
+        "extension": "ndjson",
+        "mimetype": "application/x-ndjson",
+    },
+    "csv": {
+        "extension": "csv",
+        "mimetype": "text/csv",
+    },
+}
+
 
 class PaginationSettings(ModelBase):
     page: Annotated[
@@ -109,8 +137,22 @@ class PaginationSettings(ModelBase):
         ),
         SchemaOptionalNonNullable,
     ] = 10
+    cursor: Annotated[
+        str | None,
+        Field(
+            alias="cur",
+            description=(
+                "Cursor for cursor-based pagination (overrides the page number): "
+                "An empty string starts a new cursor-based search, the following "
+                "pages are requested using the cursor returned with the results"
+            ),
+        ),
+        SchemaOptionalNullable,
+    ] = None
 
     def es_from(self) -> int:
+        if self.cursor is not None:
+            return 0
         return (self.page - 1) * self.page_size
 
     def es_size(self) -> int:
@@ -0,0 +1,34 @@
+from typing import Annotated, Any
+
+from pydantic import AwareDatetime, Field
+from pymongo import IndexModel
+
+from tekst.models.common import DocumentBase, ModelBase
+
+
+class SearchCacheEntryDocument(ModelBase, DocumentBase):
+    """
+    Search results cached in the database to be shared between API workers
+    """
+
+    class Settings(DocumentBase.Settings):
+        name = "search_cache"
+        indexes = [
+            IndexModel("key", unique=True),
+            IndexModel("expires_at", expireAfterSeconds=0),
+        ]
+
+    key: Annotated[
+        str,
+        Field(description="Hash identifying the cached search request"),
+    ]
+
+    results: Annotated[
+        dict[str, Any],
+        Field(description="The cached search results"),
+    ]
+
+    expires_at: Annotated[
+        AwareDatetime,
+        Field(description="Time the cached search results expire"),
+    ]
@@ -35,3 +35,5 @@ class SuperuserStats(UserStats):
     forgotten_passwords: int
     reset_passwords: int
     deleted_users: int
+    search_cache_hits: int
+    search_cache_misses: int
@@ -17,13 +17,13 @@ from tekst.models.common import (
     ReadBase,
     make_update_model,
 )
-from tekst.models.location import LocationDocument
 from tekst.types import (
     ColorSerializer,
     LocationLabel,
     LocationLevel,
     SingleLineString,
 )
+from tekst.utils import ensure
 
 
 class TextSubtitleTranslation(TranslationBase):
@@ -241,29 +241,12 @@ class TextDocument(Text, DocumentBase):
         """
         if target_level is None or target_level < 0 or target_level >= len(self.levels):
             raise ValueError(f"Invalid target level ({target_level}) for this text.")
-        loc_delim = self.loc_delim or ", "
-        location_labels = {}
-        for level in range(target_level + 1):
-            location_labels = {
-                str(loc["_id"]): loc_delim.join(
-                    [
-                        lbl
-                        for lbl in [
-                            location_labels.get(str(loc.get("parent_id"))),
-                            loc["label"],
-                        ]
-                        if lbl
-                    ]
-                )
-                for loc in await LocationDocument.find(
-                    LocationDocument.text_id == self.id,
-                    LocationDocument.level == level,
-                )
-                .sort(+LocationDocument.position)
-                .aggregate([{"$project": {"_id": 1, "parent_id": 1, "label": 1}}])
-                .to_list()
-            }
-        return location_labels
+        from tekst import text_structure
+
+        return (await text_structure.get_index(ensure(self.id))).full_labels(
+            target_level,
+            self.loc_delim or ", ",
+        )
 
 
 class TextCreate(Text, CreateBase):
@@ -1,22 +1,26 @@
 import asyncio
 import smtplib
+import time
 
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from functools import lru_cache
 from os.path import exists, realpath
 from pathlib import Path
+from typing import Any
 from urllib.parse import urljoin
+from uuid import uuid4
 
 from beanie import PydanticObjectId
-from beanie.operators import Eq, NotIn
+from beanie.operators import GTE, LT, Eq, In, NotIn, Or, Set
 from humps import decamelize
 
 from tekst import tasks
 from tekst.config import TekstConfig, get_config
 from tekst.counters import counter_incr
 from tekst.logs import log
+from tekst.models.email_outbox import EmailOutboxDocument
 from tekst.models.message import UserMessageDocument
 from tekst.models.notifications import Notification
 from tekst.models.user import (
@@ -29,6 +33,13 @@ from tekst.state import get_state
 _cfg: TekstConfig = get_config()  # get (possibly cached) config data
 _TEMPLATES_DIR = Path(realpath(__file__)).parent / "templates"
 
+# time in seconds allowed for connecting to the SMTP server and for sending each
+# email (on top of the rate limit) when claiming a batch of outbox emails
+_OUTBOX_CONNECT_MARGIN_S = 60
+_OUTBOX_SEND_MARGIN_S = 1
+# timeout in seconds for blocking SMTP operations
+_SMTP_TIMEOUT_S = 30
+
 
 @lru_cache(maxsize=128)
 def _get_notification_templates(
@@ -52,49 +63,170 @@ def _get_notification_templates(
     return templates
 
 
-async def _send_email(*, to: str, subject: str, txt: str, html: str):
-    log.debug(
-        f"Sending mail to {to} via {_cfg.email.smtp_server}:{_cfg.email.smtp_port}..."
+def _outbox_claim_s() -> float:
+    """
+    Returns the time in seconds a sender may take to send a claimed batch of outbox
+    emails before they are considered to be unsent and can be claimed by another
+    sender. This is derived from the batch size and rate limit, plus some margin.
+    """
+    cfg = _cfg.email
+    min_interval_s = 1 / cfg.smtp_rate_limit if cfg.smtp_rate_limit else 0
+    return _OUTBOX_CONNECT_MARGIN_S + cfg.smtp_batch_size * (
+        min_interval_s + _OUTBOX_SEND_MARGIN_S
     )
-    msg = MIMEMultipart("alternative")
-    msg["From"] = _cfg.email.from_address
-    msg["To"] = to
-    msg["Subject"] = subject
-    msg.attach(MIMEText(txt, "plain"))
-    msg.attach(MIMEText(html, "html"))
-
-    try:  # pragma: no cover
-        with smtplib.SMTP(_cfg.email.smtp_server, _cfg.email.smtp_port) as smtp:
-            if _cfg.email.smtp_starttls:
-                log.debug("Initiating StartTLS handshake...")
-                smtp.starttls()
-            else:
-                log.debug(
-                    "Skipping StartTLS handshake, using unencrypted connection..."
-                )
-            if _cfg.email.smtp_user and _cfg.email.smtp_password:
-                log.debug("Logging in to SMTP server...")
-                smtp.login(_cfg.email.smtp_user, _cfg.email.smtp_password)
-            smtp.send_message(msg)
-            log.debug("Email apparently sent successfully.")
-            await counter_incr("emails")
-    except Exception as e:  # pragma: no cover
-        log.error(
-            f"Error sending email via "
-            f"{_cfg.email.smtp_server}:{_cfg.email.smtp_port} "
-            f"(StartTLS: {_cfg.email.smtp_starttls})"
+
+
+def _smtp_send(
+    emails: list[EmailOutboxDocument],
+    results: list[bool],
+) -> None:
+    """
+    Sends the given emails via a single SMTP connection, appending whether each email
+    was accepted by the SMTP server to the given results list. Sending is throttled
+    to the configured rate limit. This blocks, so it has to be run in a thread.
+    """
+    cfg = _cfg.email
+    min_interval_s = 1 / cfg.smtp_rate_limit if cfg.smtp_rate_limit else 0
+    log.debug(f"Sending {len(emails)} mail(s) via {cfg.smtp_server}:{cfg.smtp_port}...")
+    with smtplib.SMTP(cfg.smtp_server, cfg.smtp_port, timeout=_SMTP_TIMEOUT_S) as smtp:
+        if cfg.smtp_starttls:
+            log.debug("Initiating StartTLS handshake...")
+            smtp.starttls()
+        else:
+            log.debug("Skipping StartTLS handshake, using unencrypted connection...")
+        if cfg.smtp_user and cfg.smtp_password:
+            log.debug("Logging in to SMTP server...")
+            smtp.login(cfg.smtp_user, cfg.smtp_password)
+        for email in emails:
+            started = time.monotonic()
+            try:
+                msg = MIMEMultipart("alternative")
+                msg["From"] = cfg.from_address
+                msg["To"] = email.to
+                msg["Subject"] = email.subject
+                msg.attach(MIMEText(email.txt, "plain"))
+                msg.attach(MIMEText(email.html, "html"))
+                smtp.send_message(msg)
+                results.append(True)
+            except (
+                smtplib.SMTPRecipientsRefused,
+                smtplib.SMTPSenderRefused,
+                smtplib.SMTPDataError,
+            ) as e:
+                log.error(f"SMTP server rejected email to {email.to}: {e}")
+                results.append(False)
+            wait_s = min_interval_s - (time.monotonic() - started)
+            if wait_s > 0:
+                time.sleep(wait_s)
+
+
+async def _claim_outbox_emails() -> list[EmailOutboxDocument]:
+    """
+    Claims the next batch of emails in the outbox that are not currently
+    being sent by another sender and haven't expired yet
+    """
+    now = datetime.now(UTC)
+    claimable = Or(
+        Eq(EmailOutboxDocument.sending_until, None),
+        LT(EmailOutboxDocument.sending_until, now),
+    )
+    # emails that have been in the outbox for too long are not sent anymore
+    # (they are deleted by the platform cleanup)
+    not_expired = GTE(
+        EmailOutboxDocument.created_at,
+        now - timedelta(hours=_cfg.email.outbox_max_age_hours),
+    )
+    candidate_ids = [
+        email.id
+        for email in await EmailOutboxDocument.find(claimable, not_expired)
+        .sort(+EmailOutboxDocument.id)  # ty:ignore[unsupported-operator]
+        .limit(_cfg.email.smtp_batch_size)
+        .to_list()
+    ]
+    if not candidate_ids:
+        return []
+    claim_id = str(uuid4())
+    await EmailOutboxDocument.find(
+        In(EmailOutboxDocument.id, candidate_ids),
+        claimable,
+    ).update(
+        Set(
+            {
+                EmailOutboxDocument.claim_id: claim_id,
+                EmailOutboxDocument.sending_until: now
+                + timedelta(seconds=_outbox_claim_s()),
+            }
         )
-        log.error(e)
-        # re-raise exception only in dev mode
-        if _cfg.dev_mode:  # pragma: no cover
+    )
+    return (
+        await EmailOutboxDocument.find(Eq(EmailOutboxDocument.claim_id, claim_id))
+        .sort(+EmailOutboxDocument.id)  # ty:ignore[unsupported-operator]
+        .to_list()
+    )
+
+
+async def _send_outbox_emails() -> dict[str, Any]:
+    """
+    Sends all emails in the outbox, in batches sent via one SMTP connection each.
+    If the SMTP server can't be reached, the unsent emails are released and the
+    error is raised, so the task running this is retried later.
+    """
+    sent = 0
+    rejected = 0
+    while emails := await _claim_outbox_emails():
+        results: list[bool] = []
+        try:
+            await asyncio.to_thread(_smtp_send, emails, results)
+        except Exception as e:
+            log.error(
+                f"Error sending emails via "
+                f"{_cfg.email.smtp_server}:{_cfg.email.smtp_port} "
+                f"(StartTLS: {_cfg.email.smtp_starttls}): {e}"
+            )
             raise e
+        finally:
+            # remove processed emails from the outbox, release the others
+            processed, unprocessed = emails[: len(results)], emails[len(results) :]
+            if processed:
+                await EmailOutboxDocument.find(
+                    In(EmailOutboxDocument.id, [email.id for email in processed])
+                ).delete()
+            if unprocessed:
+                await EmailOutboxDocument.find(
+                    In(EmailOutboxDocument.id, [email.id for email in unprocessed])
+                ).update(
+                    Set(
+                        {
+                            EmailOutboxDocument.claim_id: None,
+                            EmailOutboxDocument.sending_until: None,
+                        }
+                    )
+                )
+            if any(results):
+                await counter_incr("emails", results.count(True))
+            sent += results.count(True)
+            rejected += results.count(False)
+    return {"sent": sent, "rejected": rejected}
 
 
-async def send_notification(
+async def _queue_emails(emails: list[EmailOutboxDocument]) -> None:
+    """
+    Puts the given emails into the outbox and makes sure there is a task
+    waiting to send them
+    """
+    await EmailOutboxDocument.insert_many(emails)
+    if not await tasks.TaskDocument.find(
+        Eq(tasks.TaskDocument.task_type, tasks.TaskType.EMAIL_OUTBOX),
+        Eq(tasks.TaskDocument.status, "waiting"),
+    ).exists():
+        await tasks.create_task(_send_outbox_emails, tasks.TaskType.EMAIL_OUTBOX)
+
+
+async def _render_notification(
     to_user: UserRead,
     template_id: Notification,
     **kwargs,
-):
+) -> dict[str, str]:
     if not to_user or not template_id:  # pragma: no cover
         raise ValueError("Missing user or template ID.")
     templates = _get_notification_templates(template_id, to_user.locale or "enUS")
@@ -116,24 +248,56 @@ async def send_notification(
             )
             .strip()
         )
-    # send
-    if template_id.name.startswith("EMAIL_"):
-        # send as email
-        await _send_email(
-            to=to_user.email,
-            subject=msg_parts.get("subject", ""),
-            txt=msg_parts.get("txt", ""),
-            html=msg_parts.get("html", ""),
+    return msg_parts
+
+
+async def _send_notifications(
+    to_users: list[UserRead],
+    template_id: Notification,
+    **kwargs,
+) -> None:
+    """Sends the given notification to all the given users at once"""
+    msgs = [
+        (to_user, await _render_notification(to_user, template_id, **kwargs))
+        for to_user in to_users
+    ]
+    if template_id.name.startswith("EMAIL_") and msgs:
+        # send as email (via the outbox)
+        await _queue_emails(
+            [
+                EmailOutboxDocument(
+                    to=to_user.email,
+                    subject=msg_parts.get("subject", ""),
+                    txt=msg_parts.get("txt", ""),
+                    html=msg_parts.get("html", ""),
+                )
+                for to_user, msg_parts in msgs
+            ]
         )
-    elif template_id.name.startswith("USRMSG_"):
+    elif template_id.name.startswith("USRMSG_") and msgs:
         # send as user message
-        msg = f"{msg_parts.get('subject', '')}\n\n{msg_parts.get('txt', '')}"
-        await UserMessageDocument(
-            recipient=to_user.id,
-            content=msg,
-            created_at=datetime.now(UTC),
-        ).create()
-        await counter_incr("messages_total")
+        now = datetime.now(UTC)
+        await UserMessageDocument.insert_many(
+            [
+                UserMessageDocument(
+                    recipient=to_user.id,
+                    content=(
+                        f"{msg_parts.get('subject', '')}\n\n{msg_parts.get('txt', '')}"
+                    ),
+                    created_at=now,
+                )
+                for to_user, msg_parts in msgs
+            ]
+        )
+        await counter_incr("messages_total", len(msgs))
+
+
+async def send_notification(
+    to_user: UserRead,
+    template_id: Notification,
+    **kwargs,
+):
+    await _send_notifications([to_user], template_id, **kwargs)
 
 
 async def _broadcast_user_notification(
@@ -146,16 +310,15 @@ async def _broadcast_user_notification(
             f"({template_id.name} is not a user message template!)."
         )
         return
-    for user in await UserDocument.find(
-        Eq(UserDocument.user_notification_triggers, template_id.value),
-        Eq(UserDocument.is_active, True),
-        Eq(UserDocument.is_verified, True),
-    ).to_list():
-        await send_notification(
-            to_user=user,
-            template_id=template_id,
-            **kwargs,
-        )
+    await _send_notifications(
+        await UserDocument.find(
+            Eq(UserDocument.user_notification_triggers, template_id.value),
+            Eq(UserDocument.is_active, True),
+            Eq(UserDocument.is_verified, True),
+        ).to_list(),
+        template_id,
+        **kwargs,
+    )
 
 
 async def broadcast_user_notification(
@@ -177,17 +340,15 @@ async def _broadcast_admin_notification(
     exclude_users: list[PydanticObjectId] = [],
     **kwargs,
 ) -> None:
-    for admin in await UserDocument.find(
-        Eq(UserDocument.is_superuser, True),
-        Eq(UserDocument.admin_notification_triggers, template_id.value),
-        NotIn(UserDocument.id, exclude_users),
-    ).to_list():
-        await send_notification(
-            to_user=admin,
-            template_id=template_id,
-            **kwargs,
-        )
-        await asyncio.sleep(1)
+    await _send_notifications(
+        await UserDocument.find(
+            Eq(UserDocument.is_superuser, True),
+            Eq(UserDocument.admin_notification_triggers, template_id.value),
+            NotIn(UserDocument.id, exclude_users),
+        ).to_list(),
+        template_id,
+        **kwargs,
+    )
 
 
 async def broadcast_admin_notification(
@@ -1,19 +1,21 @@
 from datetime import UTC, datetime, timedelta
 from os.path import realpath
 from pathlib import Path
+from typing import Any
 
 from beanie.odm.operators.find import BaseFindOperator
 from beanie.operators import GTE, LT, Eq, In, Or
 from bson import json_util
 from deepdiff.diff import DeepDiff
 
-from tekst import db, search
+from tekst import db, executor, search, text_structure
 from tekst.auth import AccessTokenDocument, create_initial_superuser
 from tekst.config import TekstConfig, get_config
 from tekst.db import migrations
 from tekst.logs import log, log_op_end, log_op_start
 from tekst.models.common import PydanticObjectId
 from tekst.models.content import ContentBaseDocument
+from tekst.models.email_outbox import EmailOutboxDocument
 from tekst.models.message import UserMessageDocument
 from tekst.models.platform import PlatformStateDocument
 from tekst.models.segment import (
@@ -26,6 +28,10 @@ from tekst.resources import call_resource_precompute_hooks
 from tekst.state import get_state, update_state
 
 
+# number of contents whose archived versions are compared at once during cleanup
+_CLEANUP_BATCH_SIZE = 500
+
+
 async def _insert_demo_data(cfg: TekstConfig = get_config()) -> bool:
     log.info("Inserting sample data...")
     database = db.get_db()
@@ -67,6 +73,8 @@ async def _insert_demo_data(cfg: TekstConfig = get_config()) -> bool:
                 log.error(f"Failed to insert data into collection: {collection}")
                 raise RuntimeError("Failed to insert sample data.")
 
+    # materialize paths of the inserted locations
+    await text_structure.init_location_paths()
     return True
 
 
@@ -126,6 +134,15 @@ async def cleanup_task(cfg: TekstConfig = get_config()) -> dict[str, float]:
         ),
     ).delete()
 
+    # delete expired emails that couldn't be sent in time
+    log.info("Cleanup: Deleting expired outbox emails...")
+    await EmailOutboxDocument.find(
+        LT(
+            EmailOutboxDocument.created_at,
+            datetime.now(UTC) - timedelta(hours=cfg.email.outbox_max_age_hours),
+        ),
+    ).delete()
+
     # delete adjacent content archive duplicates (keep oldest instance)
     log.info("Cleanup: Deleting adjacent content archive duplicates...")
     exclude_from_comparison = {
@@ -137,6 +154,8 @@ async def cleanup_task(cfg: TekstConfig = get_config()) -> dict[str, float]:
         "created_at",
         "archived",
     }
+    # versions of the contents are compared in batches by the executor
+    versions_groups: list[list[tuple[PydanticObjectId | None, dict[str, Any]]]] = []
     async for content in ContentBaseDocument.find(
         Eq(ContentBaseDocument.archived, False),
         with_children=True,
@@ -154,33 +173,61 @@ async def cleanup_task(cfg: TekstConfig = get_config()) -> dict[str, float]:
             )
             .to_list()
         )
-        to_delete = []
-        curr_v = None
-        for v in archived_versions:
-            if curr_v is None:
-                curr_v = v
-                continue
-            if not DeepDiff(
-                curr_v.model_dump(
-                    exclude=exclude_from_comparison,
-                    exclude_computed_fields=True,
-                ),
-                v.model_dump(
-                    exclude=exclude_from_comparison,
-                    exclude_computed_fields=True,
-                ),
-            ):
-                to_delete.append(v)
-            else:
-                curr_v = v
-        await ContentBaseDocument.find(
-            In(ContentBaseDocument.id, [v.id for v in to_delete]),
-            with_children=True,
-        ).delete()
+        if len(archived_versions) < 2:
+            continue
+        versions_groups.append(
+            [
+                (
+                    v.id,
+                    v.model_dump(
+                        exclude=exclude_from_comparison,
+                        exclude_computed_fields=True,
+                    ),
+                )
+                for v in archived_versions
+            ]
+        )
+        if len(versions_groups) >= _CLEANUP_BATCH_SIZE:  # pragma: no cover
+            await _delete_redundant_versions(versions_groups)
+            versions_groups = []
+    await _delete_redundant_versions(versions_groups)
 
     return {"took": round(log_op_end(op_id), 2)}
 
 
+async def _delete_redundant_versions(
+    versions_groups: list[list[tuple[PydanticObjectId | None, dict[str, Any]]]],
+) -> None:
+    if not versions_groups:
+        return
+    await ContentBaseDocument.find(
+        In(
+            ContentBaseDocument.id,
+            await executor.run_cpu_bound(_find_redundant_versions, versions_groups),
+        ),
+        with_children=True,
+    ).delete()
+
+
+def _find_redundant_versions(
+    versions_groups: list[list[tuple[PydanticObjectId | None, dict[str, Any]]]],
+) -> list[PydanticObjectId | None]:
+    """
+    Returns the IDs of all archived content versions that don't differ from the
+    respective previous version. Each group has to contain the IDs and data of
+    all archived versions of a content, oldest first.
+    """
+    redundant = []
+    for versions in versions_groups:
+        curr_v = None
+        for v_id, v_data in versions:
+            if curr_v is not None and not DeepDiff(curr_v, v_data):
+                redundant.append(v_id)
+            else:
+                curr_v = v_data
+    return redundant
+
+
 async def _get_segment_restriction_queries(
     user: UserRead | None = None,
 ) -> tuple[BaseFindOperator] | tuple[dict]:
@@ -0,0 +1,84 @@
+import hashlib
+import time
+
+from collections.abc import Awaitable, Callable
+
+from tekst.counters import counter_get, counter_incr
+from tekst.models.user import UserRead
+
+
+# ID of the counter holding the current version of the cached platform data
+_VERSION_COUNTER_ID = "platform_cache_version"
+
+# interval in seconds after which the version of the cached data is checked again
+# (to pick up invalidations caused by writes handled by other API workers)
+_VERSION_CHECK_INTERVAL_S = 1.0
+
+# serialized platform data and its hash, by user class
+_entries: dict[str, tuple[bytes, str]] = {}
+_version: int | None = None
+_version_checked_at: float = 0.0
+
+
+def user_class(user: UserRead | None) -> str:
+    """
+    Returns the class of the given user.
+    Users of the same class get to see the same platform data.
+    """
+    if not user:
+        return "anonymous"
+    if user.is_superuser:
+        return "superuser"
+    return "user"
+
+
+def clear() -> None:
+    """Clears the cached platform data of this API worker"""
+    global _version
+    _entries.clear()
+    _version = None
+
+
+async def invalidate() -> None:
+    """
+    Invalidates the cached platform data of all API workers. This has to be called
+    after each write operation that affects the platform state, texts or segments.
+    """
+    await counter_incr(_VERSION_COUNTER_ID)
+    clear()
+
+
+async def _check_version() -> None:
+    global _version, _version_checked_at
+    if (
+        _version is not None
+        and time.monotonic() - _version_checked_at < _VERSION_CHECK_INTERVAL_S
+    ):
+        return
+    version = await counter_get(_VERSION_COUNTER_ID)
+    if version != _version:
+        _entries.clear()
+        _version = version
+    _version_checked_at = time.monotonic()
+
+
+async def get_serialized(
+    user: UserRead | None,
+    serialize: Callable[[], Awaitable[bytes]],
+) -> tuple[bytes, str]:
+    """
+    Returns the serialized platform data for the class of the given user and its
+    hash. If it isn't cached (or is outdated), the platform data is serialized
+    by awaiting the given function and then cached.
+    """
+    await _check_version()
+    key = user_class(user)
+    if key in _entries:
+        return _entries[key]
+    version = _version
+    data = await serialize()
+    entry = (data, hashlib.sha256(data).hexdigest())
+    # only cache the data if there was no invalidation while serializing it
+    if version == _version:
+        _entries[key] = entry
+    return entry
@@ -25,7 +25,7 @@ from tekst.models.resource_configs import (
 )
 from tekst.models.search import ResourceSearchQuery
 from tekst.models.text import TextDocument
-from tekst.resources import ResourceTypeBase
+from tekst.resources import ResourceTypeBase, open_export_file
 from tekst.types import (
     ExcludeFromModelVariants,
     FalsyToNone,
@@ -100,7 +100,7 @@ class ApiCall(ResourceTypeBase):
         # construct labels of all locations on the resource's level
         full_loc_labels = await text.full_location_labels(resource.level)
         sort_num = 0
-        with open(file_path, "w", newline="") as csvfile:
+        with open_export_file(file_path) as csvfile:
             csv_writer = csv.writer(
                 csvfile,
                 dialect="excel",
@@ -16,7 +16,7 @@ from tekst.models.resource import (
 )
 from tekst.models.resource_configs import ResourceConfigBase
 from tekst.models.text import TextDocument
-from tekst.resources import ResourceTypeBase
+from tekst.resources import ResourceTypeBase, open_export_file
 from tekst.types import (
     FalsyToNone,
     HttpUrl,
@@ -128,7 +128,7 @@ class Audio(ResourceTypeBase):
         # construct labels of all locations on the resource's level
         full_loc_labels = await text.full_location_labels(resource.level)
         sort_num = 0
-        with open(file_path, "w", newline="") as csvfile:
+        with open_export_file(file_path) as csvfile:
             csv_writer = csv.writer(
                 csvfile,
                 dialect="excel",
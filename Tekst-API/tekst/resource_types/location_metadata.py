@@ -1,14 +1,17 @@
 import csv
 
-from datetime import UTC, datetime
+from collections.abc import Iterator
 from pathlib import Path
 from typing import TYPE_CHECKING, Annotated, Any, Literal
 
 from beanie import PydanticObjectId
-from beanie.operators import Eq
 from pydantic import BeforeValidator, Field, StringConstraints
 
-from tekst.logs import log, log_op_end, log_op_start
+from tekst.aggregations import (
+    update_aggregations,
+    update_aggregations_incrementally,
+)
+from tekst.logs import log_op_end, log_op_start
 from tekst.models.common import CreateBase, ModelBase, ReadBase, make_update_model
 from tekst.models.content import ContentBase, ContentBaseDocument
 from tekst.models.precomputed import PrecomputedDataDocument
@@ -24,7 +27,7 @@ from tekst.models.resource_configs import (
     ResourceConfigBase,
 )
 from tekst.models.text import TextDocument
-from tekst.resources import ResourceTypeBase
+from tekst.resources import ResourceTypeBase, open_export_file
 from tekst.types import (
     ExcludeFromModelVariants,
     SchemaOptionalNonNullable,
@@ -194,7 +197,7 @@ class LocationMetadata(ResourceTypeBase):
         # construct labels of all locations on the resource's level
         full_loc_labels = await text.full_location_labels(resource.level)
         sort_num = 0
-        with open(file_path, "w", newline="") as csvfile:
+        with open_export_file(file_path) as csvfile:
             csv_writer = csv.writer(
                 csvfile,
                 dialect="excel",
@@ -327,130 +330,58 @@ class LocationMetadataResourceRead(
 LocationMetadataResourceUpdate = make_update_model(LocationMetadataResource)
 
 
+# pipeline stages turning contents into one document per metadata value
+_AGGREGATION_VALUES_PIPELINE = [
+    {"$project": {"entries": 1}},
+    {"$unwind": {"path": "$entries"}},
+    {"$unwind": {"path": "$entries.value"}},
+    {"$project": {"key": "$entries.key", "value": "$entries.value"}},
+]
+# omit values of metadata keys with more than n distinct values
+_AGGREGATION_MAX_VALUES_PER_KEY = 250
+
+
 class LocationMetadataResourceDocument(
     LocationMetadataResource,
     ResourceBaseDocument,
 ):
     async def _update_aggregations(self, *, force: bool = False) -> None:
-        max_values_per_key = 250
-        # get precomputed resource aggregations data, if present
-        precomp_doc = await PrecomputedDataDocument.find_one(
-            PrecomputedDataDocument.ref_id == self.id,
-            PrecomputedDataDocument.precomputed_type == "aggregations",
+        await update_aggregations(
+            self,
+            values_pipeline=_AGGREGATION_VALUES_PIPELINE,
+            max_values_per_key=_AGGREGATION_MAX_VALUES_PER_KEY,
+            force=force,
         )
-        if precomp_doc:
-            if precomp_doc.created_at >= self.contents_changed_at and not force:
-                log.debug(
-                    f"Aggregations for resource {str(self.id)} up-to-date. Skipping."
-                )
-                return
-        else:
-            if not self.id:  # pragma: no cover
-                raise RuntimeError(
-                    "Resource must be saved before aggregations can be created"
-                )
-            # create new aggregations document
-            precomp_doc = PrecomputedDataDocument(
-                ref_id=self.id,
-                precomputed_type="aggregations",
-            )
 
-        # aggregate distinct location metadata keys and values
-        precomp_doc.data = (
-            await ContentBaseDocument.find(
-                ContentBaseDocument.resource_id == self.id,
-                Eq(ContentBaseDocument.archived, False),
-                with_children=True,
-            )
-            .aggregate(
-                [
-                    {"$project": {"entries": 1}},
-                    {"$unwind": {"path": "$entries"}},
-                    {"$unwind": {"path": "$entries.value"}},
-                    # create one document for each metadata key,
-                    # collecting all values and the key occurrence count
-                    {
-                        "$group": {
-                            "_id": "$entries.key",
-                            "values": {"$push": "$entries.value"},
-                            "keyOcc": {"$sum": 1},
-                        }
-                    },
-                    # count per-key value occurrences on "values" field
-                    {
-                        "$set": {
-                            "values": {
-                                "$map": {
-                                    "input": {"$setUnion": "$values"},
-                                    "as": "v",
-                                    "in": {
-                                        "value": "$$v",
-                                        "count": {
-                                            "$size": {
-                                                "$filter": {
-                                                    "input": "$values",
-                                                    "cond": {"$eq": ["$$this", "$$v"]},
-                                                }
-                                            }
-                                        },
-                                    },
-                                }
-                            }
-                        }
-                    },
-                    # remove values array if it contains more than n items
-                    {
-                        "$set": {
-                            "values": {
-                                "$cond": {
-                                    "if": {
-                                        "$gt": [
-                                            {"$size": "$values"},
-                                            max_values_per_key,
-                                        ]
-                                    },
-                                    "then": "$$REMOVE",
-                                    "else": "$values",
-                                }
-                            }
-                        }
-                    },
-                    # sort values array by count
-                    {
-                        "$set": {
-                            "values": {
-                                "$sortArray": {
-                                    "input": "$values",
-                                    "sortBy": {"count": -1},
-                                }
-                            }
-                        }
-                    },
-                    # sort docs by key occurrence
-                    {"$sort": {"keyOcc": -1}},
-                    # project to final doc format,
-                    # with values array only containing the values
-                    {
-                        "$project": {
-                            "_id": 0,
-                            "key": "$_id",
-                            "values": {
-                                "$map": {
-                                    "input": "$values",
-                                    "as": "v",
-                                    "in": "$$v.value",
-                                }
-                            },
-                        }
-                    },
-                ]
+    @staticmethod
+    def _aggregation_values(
+        contents: list[ContentBaseDocument] | None,
+    ) -> Iterator[tuple[str, Any]]:
+        for content in contents or []:
+            if isinstance(content, LocationMetadataContentDocument):
+                for entry in content.entries:
+                    for value in entry.value:
+                        yield entry.key, value
+
+    async def contents_changed_hook(
+        self,
+        *,
+        removed: list[ContentBaseDocument] | None = None,
+        added: list[ContentBaseDocument] | None = None,
+    ) -> None:
+        from tekst import change_tracker
+
+        # consider changes that haven't been written to the database, yet
+        changed_before = change_tracker.contents_changed_at(self)
+        await super().contents_changed_hook(removed=removed, added=added)
+        if self.id and (removed or added):
+            await update_aggregations_incrementally(
+                self.id,
+                changed_before=changed_before,
+                removed=self._aggregation_values(removed),
+                added=self._aggregation_values(added),
+                max_values_per_key=_AGGREGATION_MAX_VALUES_PER_KEY,
             )
-            .to_list()
-        )
-
-        # update aggregations in DB
-        precomp_doc.created_at = datetime.now(UTC)
-        await precomp_doc.save()
 
     async def resource_precompute_hook(
         self,
@@ -2,8 +2,7 @@ import csv
 import random
 import string
 
-from collections.abc import Callable
-from datetime import UTC, datetime
+from collections.abc import Callable, Iterator
 from pathlib import Path
 from typing import TYPE_CHECKING, Annotated, Any, Literal
 from uuid import uuid4
@@ -12,7 +11,11 @@ from beanie import PydanticObjectId
 from beanie.operators import Eq
 from pydantic import BeforeValidator, Field, StringConstraints
 
-from tekst.logs import log, log_op_end, log_op_start
+from tekst.aggregations import (
+    update_aggregations,
+    update_aggregations_incrementally,
+)
+from tekst.logs import log_op_end, log_op_start
 from tekst.models.common import CreateBase, ModelBase, ReadBase, make_update_model
 from tekst.models.content import ContentBase, ContentBaseDocument
 from tekst.models.precomputed import PrecomputedDataDocument
@@ -28,7 +31,7 @@ from tekst.models.resource_configs import (
 )
 from tekst.models.text import TextDocument
 from tekst.resource_types.plain_text import LineLabellingConfig
-from tekst.resources import ResourceTypeBase
+from tekst.resources import ResourceTypeBase, open_export_file
 from tekst.types import (
     FalsyToNone,
     MultiLineString,
@@ -289,7 +292,7 @@ class TextAnnotation(ResourceTypeBase):
         # construct labels of all locations on the resource's level
         full_loc_labels = await text.full_location_labels(resource.level)
         sort_num = 0
-        with open(file_path, "w", newline="") as csvfile:
+        with open_export_file(file_path) as csvfile:
             csv_writer = csv.writer(
                 csvfile,
                 dialect="excel",
@@ -414,139 +417,60 @@ class TextAnnotationResourceRead(
 TextAnnotationResourceUpdate = make_update_model(TextAnnotationResource)
 
 
+# pipeline stages turning contents into one document per annotation value
+_AGGREGATION_VALUES_PIPELINE = [
+    {"$project": {"anno": "$tokens.annotations"}},
+    {"$unwind": {"path": "$anno"}},
+    {"$unwind": {"path": "$anno"}},
+    {"$unwind": {"path": "$anno.value"}},
+    {"$project": {"key": "$anno.key", "value": "$anno.value"}},
+]
+# omit values of annotations with more than n distinct values
+_AGGREGATION_MAX_VALUES_PER_KEY = 250
+
+
 class TextAnnotationResourceDocument(
     TextAnnotationResource,
     ResourceBaseDocument,
 ):
-    async def _update_aggregations(
+    async def _update_aggregations(self, *, force: bool = False) -> None:
+        await update_aggregations(
+            self,
+            values_pipeline=_AGGREGATION_VALUES_PIPELINE,
+            max_values_per_key=_AGGREGATION_MAX_VALUES_PER_KEY,
+            force=force,
+        )
+
+    @staticmethod
+    def _aggregation_values(
+        contents: list[ContentBaseDocument] | None,
+    ) -> Iterator[tuple[str, Any]]:
+        for content in contents or []:
+            if isinstance(content, TextAnnotationContentDocument):
+                for token in content.tokens:
+                    for anno in token.annotations:
+                        for value in anno.value:
+                            yield anno.key, value
+
+    async def contents_changed_hook(
         self,
         *,
-        force: bool = False,
+        removed: list[ContentBaseDocument] | None = None,
+        added: list[ContentBaseDocument] | None = None,
     ) -> None:
-        if not isinstance(self, ResourceBaseDocument):  # pragma: no cover
-            raise RuntimeError("_update_aggregations can only be called on a document")
-
-        # omit annotations with more than n distinct values
-        distinct_v_thresh = 250
-        # get precomputed resource aggregations data, if present
-        precomp_doc = await PrecomputedDataDocument.find_one(
-            PrecomputedDataDocument.ref_id == self.id,
-            PrecomputedDataDocument.precomputed_type == "aggregations",
-        )
-        if precomp_doc:
-            if precomp_doc.created_at > self.contents_changed_at and not force:
-                log.debug(
-                    f"Aggregations for resource {str(self.id)} up-to-date. Skipping."
-                )
-                return
-        else:
-            if not self.id:  # pragma: no cover
-                raise RuntimeError(
-                    "Resource must be saved before aggregations can be created"
-                )
-            # create new aggregations document
-            precomp_doc = PrecomputedDataDocument(
-                ref_id=self.id,
-                precomputed_type="aggregations",
-            )
-
-        # group annotations
-        precomp_doc.data = (
-            await ContentBaseDocument.find(
-                Eq(ContentBaseDocument.resource_id, self.id),
-                Eq(ContentBaseDocument.archived, False),
-                with_children=True,
-            )
-            .aggregate(
-                [
-                    {"$project": {"anno": "$tokens.annotations"}},
-                    {"$unwind": {"path": "$anno"}},
-                    {"$unwind": {"path": "$anno"}},
-                    {"$unwind": {"path": "$anno.value"}},
-                    # create one document for each annotation key,
-                    # collecting all values and the key occurrence count
-                    {
-                        "$group": {
-                            "_id": "$anno.key",
-                            "values": {"$push": "$anno.value"},
-                            "keyOcc": {"$sum": 1},
-                        }
-                    },
-                    # count per-key value occurrences on "values" field
-                    {
-                        "$set": {
-                            "values": {
-                                "$map": {
-                                    "input": {"$setUnion": "$values"},
-                                    "as": "v",
-                                    "in": {
-                                        "value": "$$v",
-                                        "count": {
-                                            "$size": {
-                                                "$filter": {
-                                                    "input": "$values",
-                                                    "cond": {"$eq": ["$$this", "$$v"]},
-                                                }
-                                            }
-                                        },
-                                    },
-                                }
-                            }
-                        }
-                    },
-                    # remove values array if it contains more than n items
-                    {
-                        "$set": {
-                            "values": {
-                                "$cond": {
-                                    "if": {
-                                        "$gt": [
-                                            {"$size": "$values"},
-                                            distinct_v_thresh,
-                                        ]
-                                    },
-                                    "then": "$$REMOVE",
-                                    "else": "$values",
-                                }
-                            }
-                        }
-                    },
-                    # sort values array by count
-                    {
-                        "$set": {
-                            "values": {
-                                "$sortArray": {
-                                    "input": "$values",
-                                    "sortBy": {"count": -1},
-                                }
-                            }
-                        }
-                    },
-                    # sort docs by key occurrence
-                    {"$sort": {"keyOcc": -1}},
-                    # project to final doc format,
-                    # with values array only containing the values
-                    {
-                        "$project": {
-                            "_id": 0,
-                            "key": "$_id",
-                            "values": {
-                                "$map": {
-                                    "input": "$values",
-                                    "as": "v",
-                                    "in": "$$v.value",
-                                }
-                            },
-                        }
-                    },
-                ]
+        from tekst import change_tracker
+
+        # consider changes that haven't been written to the database, yet
+        changed_before = change_tracker.contents_changed_at(self)
+        await super().contents_changed_hook(removed=removed, added=added)
+        if self.id and (removed or added):
+            await update_aggregations_incrementally(
+                self.id,
+                changed_before=changed_before,
+                removed=self._aggregation_values(removed),
+                added=self._aggregation_values(added),
+                max_values_per_key=_AGGREGATION_MAX_VALUES_PER_KEY,
             )
-            .to_list()
-        )
-
-        # update aggregations in DB
-        precomp_doc.created_at = datetime.now(UTC)
-        await precomp_doc.save()
 
     async def _ensure_token_ids(self):
         """Checks if all tokens have a token_id annotation, and if not, adds one"""
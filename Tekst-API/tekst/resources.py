@@ -1,12 +1,14 @@
+import asyncio
+import gzip
 import importlib
 import inspect
 import json
 import pkgutil
 
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, AsyncIterable, Callable
 from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, TextIO
 
 import jsonref
 
@@ -35,6 +37,9 @@ if TYPE_CHECKING:
     from tekst.models.search import ResourceSearchQuery
 
 
+# number of contents serialized and written to JSON export files at once
+_EXPORT_CHUNK_SIZE = 200
+
 # resource base model fields to exclude from export/import
 RES_EXCLUDE_EXP_IMP = {
     "text_id",
@@ -97,6 +102,62 @@ async def call_resource_precompute_hooks(
     return {"took": round(log_op_end(op_id), 2)}
 
 
+def open_export_file(file_path: Path) -> TextIO:
+    """
+    Opens the given export file for writing text. If the file name ends with `.gz`,
+    the data written is compressed using gzip on the fly.
+    """
+    if file_path.suffix == ".gz":
+        return gzip.open(file_path, "wt", newline="", encoding="utf-8")
+    return file_path.open("w", newline="", encoding="utf-8")
+
+
+def _json_dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _write_json_items(f: TextIO, items: list[Any], continued: bool) -> None:
+    if items:
+        f.write((", " if continued else "") + ", ".join(_json_dumps(i) for i in items))
+
+
+async def _write_json_export(
+    file_path: Path,
+    root: dict[str, Any],
+    contents: AsyncIterable[dict[str, Any]],
+) -> None:
+    """
+    Writes the given root object to the given export file as JSON, with the given
+    contents as the value of its `contents` property. The contents are serialized
+    and written in chunks as they come in, so they never have to be held in memory.
+    Serialization, compression and writing happen in a thread, so they don't block
+    the event loop.
+    """
+    f = await asyncio.to_thread(open_export_file, file_path)
+    try:
+        await asyncio.to_thread(
+            f.write,
+            "{"
+            + "".join(
+                f"{_json_dumps(key)}: {_json_dumps(value)}, "
+                for key, value in root.items()
+            )
+            + '"contents": [',
+        )
+        chunk: list[dict[str, Any]] = []
+        continued = False
+        async for content in contents:
+            chunk.append(content)
+            if len(chunk) >= _EXPORT_CHUNK_SIZE:
+                await asyncio.to_thread(_write_json_items, f, chunk, continued)
+                chunk = []
+                continued = True
+        await asyncio.to_thread(_write_json_items, f, chunk, continued)
+        await asyncio.to_thread(f.write, "]}")
+    finally:
+        await asyncio.to_thread(f.close)
+
+
 class ResourceTypeBase:
     """Abstract base class for defining a resource type"""
 
@@ -231,21 +292,6 @@ class ResourceTypeBase:
         Exports the given contents of the given resource as JSON, compatible for
         re-import in Tekst.
         """
-        contents: list[dict] = []
-        for c_id in content_ids:
-            content = ensure(await ContentBaseDocument.get(c_id, with_children=True))
-            c_dict = camelize(
-                content.model_dump(
-                    mode="json",
-                    by_alias=True,
-                    exclude_unset=True,
-                    exclude_none=True,
-                    exclude=cls._EXCLUDE_FROM_CONTENT_EXPORT_DATA,
-                )
-            )
-            contents.append(c_dict)
-        del content_ids
-
         # serialize resource data and use as root object
         data = camelize(
             resource.model_dump(
@@ -256,15 +302,12 @@ class ResourceTypeBase:
                 exclude=RES_EXCLUDE_EXP_IMP,
             )
         )
-        data.update(contents=contents)
-        # write to file
-        with open(file_path, "w") as fp:
-            json.dump(
-                data,
-                fp=fp,
-                ensure_ascii=False,
-                default=str,
-            )
+        # write to file, along with the contents
+        await _write_json_export(
+            file_path,
+            data,
+            cls._iter_export_contents(content_ids),
+        )
 
     @classmethod
     async def export_universal_json(
@@ -314,11 +357,26 @@ class ResourceTypeBase:
         }
         res["meta"] = {meta["key"]: meta["value"] for meta in res["meta"]}
 
-        # construct content objects
-        contents: list[dict] = []
-        for c_id in content_ids:
-            content = ensure(await ContentBaseDocument.get(c_id, with_children=True))
-            c_dict = camelize(
+        # construct labels of all locations on the resource's level
+        full_loc_labels = await text.full_location_labels(resource.level)
+
+        async def _contents() -> AsyncGenerator[dict[str, Any]]:
+            async for content in cls._iter_export_contents(content_ids):
+                content["location"] = full_loc_labels.get(
+                    str(content.pop("locationId"))
+                )
+                yield content
+
+        await _write_json_export(file_path, res, _contents())
+
+    @classmethod
+    async def _iter_export_contents(
+        cls,
+        content_ids: list[PydanticObjectId],
+    ) -> AsyncGenerator[dict[str, Any]]:
+        """Yields the export data of the given contents, in the given order"""
+        async for content in ContentBaseDocument.find_by_id_in_order(content_ids):
+            yield camelize(
                 content.model_dump(
                     mode="json",
                     by_alias=True,
@@ -327,23 +385,6 @@ class ResourceTypeBase:
                     exclude=cls._EXCLUDE_FROM_CONTENT_EXPORT_DATA,
                 )
             )
-            contents.append(c_dict)
-        del content_ids
-
-        # construct labels of all locations on the resource's level
-        full_loc_labels = await text.full_location_labels(resource.level)
-        for content in contents:
-            content["location"] = full_loc_labels.get(str(content["locationId"]))
-            del content["locationId"]
-        res["contents"] = contents
-
-        with open(file_path, "w") as fp:
-            json.dump(
-                res,
-                fp=fp,
-                ensure_ascii=False,
-                default=str,
-            )
 
     @classmethod
     def resource_model[T: ResourceBase](cls) -> type[T]:
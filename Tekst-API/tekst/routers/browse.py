@@ -5,11 +5,12 @@ from beanie import PydanticObjectId
 from beanie.operators import LTE, Eq, In, NotIn
 from fastapi import APIRouter, Path, Query, status
 
-from tekst import errors
+from tekst import errors, text_structure
 from tekst.auth import (
     OptionalUserDep,
     UserDep,
 )
+from tekst.conditional import ConditionalDep
 from tekst.models.bookmark import BookmarkCreate, BookmarkDocument, BookmarkRead
 from tekst.models.browse import LocationData
 from tekst.models.content import ContentBaseDocument, MissingContent
@@ -20,7 +21,6 @@ from tekst.models.resource import (
 from tekst.models.resource_unions import AnyContentReadOrMissing
 from tekst.models.text import TextDocument
 from tekst.search import search_nearest_content_location
-from tekst.utils import ensure
 
 
 router = APIRouter(
@@ -29,6 +29,30 @@ router = APIRouter(
 )
 
 
+async def _with_originals(
+    resources: list[ResourceBaseDocument],
+) -> list[ResourceBaseDocument]:
+    """
+    Returns the given resources plus the original resources of the resource patches
+    among them, as the contents of these are used in place of missing patch contents
+    """
+    resource_ids = {res.id for res in resources}
+    original_ids = {
+        res.patch_for
+        for res in resources
+        if res.patch_for and res.patch_for not in resource_ids
+    }
+    if not original_ids:
+        return resources
+    return (
+        resources
+        + await ResourceBaseDocument.find(
+            In(ResourceBaseDocument.id, list(original_ids)),
+            with_children=True,
+        ).to_list()
+    )
+
+
 async def _get_content_context(
     resource: ResourceBaseDocument,
     parent_location_id: PydanticObjectId | None,
@@ -38,16 +62,10 @@ async def _get_content_context(
     of the given parent location, sorted by reference location position.
     """
     # find IDs of all locations that are children of the requested parent
-    location_ids = [
-        location.id
-        for location in await LocationDocument.find(
-            LocationDocument.text_id == resource.text_id,
-            LocationDocument.level == resource.level,
-            LocationDocument.parent_id == parent_location_id,
-        )
-        .sort(+LocationDocument.position)
-        .to_list()
-    ]
+    location_ids = (await text_structure.get_index(resource.text_id)).child_ids(
+        parent_location_id,
+        resource.level,
+    )
 
     # find direct contents of the requested resource for the requested locations
     content_docs_by_loc = {
@@ -106,6 +124,7 @@ async def _get_content_context(
 )
 async def get_location_data(
     user: OptionalUserDep,
+    conditional: ConditionalDep,
     location_id: Annotated[
         PydanticObjectId | None,
         Query(
@@ -186,21 +205,20 @@ async def get_location_data(
         text_doc = await TextDocument.get(text_id)
         if text_doc:
             lvl = level if level is not None else text_doc.default_level
-            location_doc = await LocationDocument.find_one(
-                LocationDocument.text_id == text_id,
-                LocationDocument.level == lvl,
-                LocationDocument.position == position or 0,
+            target_location_id = (await text_structure.get_index(text_id)).location_id(
+                lvl,
+                position or 0,
             )
-    if not location_doc:
+            if target_location_id:
+                location_doc = await LocationDocument.get(target_location_id)
+    if not location_doc or not location_doc.id:  # second check is for type checker
         raise errors.E_404_LOCATION_NOT_FOUND
 
-    # construct path up to root location
-    location_path = [location_doc]
-    parent_id = location_doc.parent_id
-    while parent_id:
-        parent = ensure(await LocationDocument.get(parent_id))
-        location_path.insert(0, parent)
-        parent_id = parent.parent_id
+    # get location path up to root location and adjacent locations
+    location_path = await location_doc.get_path()
+    prev_loc_id, next_loc_id = (
+        await text_structure.get_index(location_doc.text_id)
+    ).adjacent_ids(location_doc.id)
     location_ids = (
         [location.id for location in location_path]
         if not only_head_contents
@@ -214,6 +232,13 @@ async def get_location_data(
         with_children=True,
     ).to_list()
 
+    # answer conditional requests before querying any contents
+    conditional.check_contents(
+        await _with_originals(target_resources),
+        await text_structure.get_version(location_doc.text_id),
+        public=user is None,
+    )
+
     # collect contents for target resources belonging to locations present in
     # the location path (resource.level <= location_doc.level)
     if archive_ts is None:
@@ -273,41 +298,12 @@ async def get_location_data(
     ]:
         contents[res.id] = await _get_content_context(res, location_doc.id)
 
-    # find IDs of previous and next location on same level
-    prev_loc = (
-        await LocationDocument.find_one(
-            LocationDocument.text_id == location_doc.text_id,
-            LocationDocument.level == location_doc.level,
-            LocationDocument.position == location_doc.position - 1,
-        )
-    ) or (
-        await LocationDocument.find(
-            LocationDocument.text_id == location_doc.text_id,
-            LocationDocument.level == location_doc.level,
-        )
-        .sort(-LocationDocument.position)
-        .first_or_none()
-    )
-    next_loc = (
-        await LocationDocument.find_one(
-            LocationDocument.text_id == location_doc.text_id,
-            LocationDocument.level == location_doc.level,
-            LocationDocument.position == location_doc.position + 1,
-        )
-    ) or (
-        await LocationDocument.find_one(
-            LocationDocument.text_id == location_doc.text_id,
-            LocationDocument.level == location_doc.level,
-            LocationDocument.position == 0,
-        )
-    )
-
     # return location path, adjacent locations' IDs
     # and requested contents as combined LocationData
     return LocationData(
         location_path=location_path,
-        previous_loc_id=prev_loc.id if prev_loc else None,
-        next_loc_id=next_loc.id if next_loc else None,
+        previous_loc_id=prev_loc_id,
+        next_loc_id=next_loc_id,
         contents=contents,
     )
 
@@ -324,6 +320,7 @@ async def get_location_data(
 )
 async def get_content_context(
     user: OptionalUserDep,
+    conditional: ConditionalDep,
     resource_id: Annotated[
         PydanticObjectId,
         Query(
@@ -345,6 +342,11 @@ async def get_content_context(
     with the given ID.
     """
     resource = await ResourceBaseDocument.get_safe(resource_id, user)
+    conditional.check_contents(
+        await _with_originals([resource]),
+        await text_structure.get_version(resource.text_id),
+        public=user is None,
+    )
     return await _get_content_context(resource, parent_location_id)
 
 
@@ -463,12 +465,7 @@ async def create_bookmark(user: UserDep, bookmark: BookmarkCreate) -> BookmarkDo
         raise errors.E_404_TEXT_NOT_FOUND  # pragma: no cover
 
     # construct full label
-    location_labels = [location_doc.label]
-    parent_location_id = location_doc.parent_id
-    while parent_location_id:
-        parent_location = ensure(await LocationDocument.get(parent_location_id))
-        location_labels.insert(0, parent_location.label)
-        parent_location_id = parent_location.parent_id
+    location_labels = [loc.label for loc in await location_doc.get_path()]
 
     return await BookmarkDocument(
         user_id=user.id,
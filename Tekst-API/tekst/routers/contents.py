@@ -7,8 +7,8 @@ from fastapi import APIRouter, BackgroundTasks, Path, Query, status
 
 from tekst import errors
 from tekst.auth import OptionalUserDep, UserDep
+from tekst.conditional import ConditionalDep
 from tekst.config import TekstConfig, get_config
-from tekst.models.common import DocumentBase
 from tekst.models.content import (
     ContentArchiveSignature,
     ContentBase,
@@ -72,20 +72,21 @@ async def create_content(
     if content.resource_type != resource.resource_type:
         raise errors.E_400_CONTENT_TYPE_MISMATCH
 
-    # call the resource's hook for changed contents
-    await resource.contents_changed_hook()
     # mark the text's index as out-of-date
-    await resource.set_index_ood()
+    await resource.set_index_ood([content.location_id])
 
-    # create the content document and return it
+    # create the content document
     content_doc: ContentBase = (
         resource_types_mgr.get(content.resource_type)
         .content_model()
         .document_model()
         .model_from(content)
     )
-    assert isinstance(content_doc, DocumentBase)  # for type checker
-    return await content_doc.create()
+    assert isinstance(content_doc, ContentBaseDocument)  # for type checker
+    await content_doc.create()
+    # call the resource's hook for changed contents
+    await resource.contents_changed_hook(added=[content_doc])
+    return content_doc
 
 
 @router.get(
@@ -141,15 +142,17 @@ async def get_archived_contents(
     ),
 )
 async def get_content(
-    content_id: Annotated[PydanticObjectId, Path(alias="id")], user: OptionalUserDep
+    content_id: Annotated[PydanticObjectId, Path(alias="id")],
+    user: OptionalUserDep,
+    conditional: ConditionalDep,
 ) -> AnyContentDocument:
     """A generic route for retrieving a content by ID from the database"""
     content_doc = await ContentBaseDocument.get(content_id, with_children=True)
-    # check if the resource this content belongs to is readable by user
-    if not content_doc or not (
-        await ResourceBaseDocument.get_safe(content_doc.resource_id, user)
-    ):
+    if not content_doc:
         raise errors.E_404_CONTENT_NOT_FOUND
+    # check if the resource this content belongs to is readable by user
+    resource_doc = await ResourceBaseDocument.get_safe(content_doc.resource_id, user)
+    conditional.check_contents([resource_doc], public=user is None)
     return content_doc
 
 
@@ -183,20 +186,29 @@ async def update_content(
     if not resource:
         raise errors.E_403_FORBIDDEN
 
-    # call the resource's hook for changed contents
-    await resource.contents_changed_hook()
     # mark the text's index as out-of-date
-    await resource.set_index_ood()
+    await resource.set_index_ood([content_doc.location_id])
+
+    # keep the state of the content before the update
+    old_content_doc = content_doc.model_copy(deep=True)
 
     # handle content archival if this belongs to a public, non-patch resource
     if resource.public and not resource.patch_for:
         # archive existing content, obtain an unsaved copy
         content_copy = await content_doc.archive()
         # apply updates to the copy and insert it
-        return await content_copy.apply_updates(updates, insert=True)
+        updated_doc = await content_copy.apply_updates(updates, insert=True)
     else:
         # don't archive existing content, just update the existing object
-        return await content_doc.apply_updates(updates, update_created_at=True)
+        updated_doc = await content_doc.apply_updates(updates, update_created_at=True)
+    assert isinstance(updated_doc, ContentBaseDocument)  # for type checker
+
+    # call the resource's hook for changed contents
+    await resource.contents_changed_hook(
+        removed=[old_content_doc],
+        added=[updated_doc],
+    )
+    return updated_doc
 
 
 @router.delete(
@@ -228,9 +240,12 @@ async def delete_content(
 
     if not content_doc.archived:
         # call the resource's hook for changed contents
-        background_tasks.add_task(resource.contents_changed_hook)
+        background_tasks.add_task(
+            resource.contents_changed_hook,
+            removed=[content_doc],
+        )
         # mark the text's index as out-of-date
-        background_tasks.add_task(resource.set_index_ood)
+        background_tasks.add_task(resource.set_index_ood, [content_doc.location_id])
 
     # delete archived contents
     if delete_archive:
@@ -282,12 +297,12 @@ async def archive_content(
             {"detail": "Content archival not possible for resource patches"},
         )
 
-    # call the resource's hook for changed contents
-    await resource.contents_changed_hook()
     # mark the text's index as out-of-date
-    await resource.set_index_ood()
+    await resource.set_index_ood([content_doc.location_id])
     # all fine, archive the content
     await content_doc.archive()
+    # call the resource's hook for changed contents
+    await resource.contents_changed_hook(removed=[content_doc])
     return content_doc
 
 
@@ -322,14 +337,16 @@ async def restore_archived_content(
         content_id,
         with_children=True,
     )
-    if (
-        not archived_content_doc
-        or not await ResourceBaseDocument.find_one(
+    resource = (
+        await ResourceBaseDocument.find_one(
             ResourceBaseDocument.id == archived_content_doc.resource_id,
             await ResourceBaseDocument.query_criteria_write(user),
             with_children=True,
-        ).exists()
-    ):
+        )
+        if archived_content_doc
+        else None
+    )
+    if not archived_content_doc or not resource:
         raise errors.E_404_CONTENT_NOT_FOUND
 
     # check if content is archived at all
@@ -343,21 +360,29 @@ async def restore_archived_content(
         )
 
     # archive any current content for the same resource/location
-    await ContentBaseDocument.find(
+    current_contents_query = ContentBaseDocument.find(
         Eq(ContentBaseDocument.resource_id, archived_content_doc.resource_id),
         Eq(ContentBaseDocument.location_id, archived_content_doc.location_id),
         Eq(ContentBaseDocument.archived, False),
         with_children=True,
-    ).set({ContentBaseDocument.archived: True})
+    )
+    current_contents = await current_contents_query.to_list()
+    await current_contents_query.set({ContentBaseDocument.archived: True})
 
     # restore formerly archived content as current content
-    return await archived_content_doc.model_copy(
+    restored_content_doc = await archived_content_doc.model_copy(
         update={
             "id": None,
             "created_at": datetime.now(UTC),
             "archived": False,
         }
     ).save()
+    # call the resource's hook for changed contents
+    await resource.contents_changed_hook(
+        removed=current_contents,
+        added=[restored_content_doc],
+    )
+    return restored_content_doc
 
 
 @router.get(
@@ -367,6 +392,7 @@ async def restore_archived_content(
 )
 async def find_contents(
     user: OptionalUserDep,
+    conditional: ConditionalDep,
     resource_ids: Annotated[
         list[PydanticObjectId],
         Query(
@@ -414,6 +440,7 @@ async def find_contents(
         await ResourceBaseDocument.query_criteria_read(user),
         with_children=True,
     ).to_list()
+    conditional.check_contents(readable_resources, public=user is None)
 
     # get contents matching the given criteria
     return (
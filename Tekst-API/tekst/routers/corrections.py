@@ -56,12 +56,7 @@ async def create_correction(
         raise errors.E_400_INVALID_REQUEST_DATA
 
     # construct full label
-    location_labels = [location_doc.label]
-    parent_location_id = location_doc.parent_id
-    while parent_location_id:
-        parent_location = ensure(await LocationDocument.get(parent_location_id))
-        location_labels.insert(0, parent_location.label)
-        parent_location_id = parent_location.parent_id
+    location_labels = [loc.label for loc in await location_doc.get_path()]
 
     # create correction
     correction_doc = await CorrectionDocument(
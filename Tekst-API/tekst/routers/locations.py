@@ -5,8 +5,9 @@ from beanie.operators import And, Eq, In, NotIn
 from fastapi import APIRouter, Path, Query, status
 from pydantic import Field, StringConstraints
 
-from tekst import errors
+from tekst import errors, text_structure
 from tekst.auth import SuperuserDep
+from tekst.conditional import ConditionalDep, ConditionalResponse
 from tekst.models.content import ContentBaseDocument
 from tekst.models.location import (
     DeleteLocationResult,
@@ -122,7 +123,26 @@ async def create_location(
         LocationDocument.position >= location.position,
     ).inc({LocationDocument.position: 1})
     # all fine, create location
-    return await LocationDocument.model_from(location).create()
+    location_doc = await LocationDocument.model_from(location).create()
+    await text_structure.update_location_paths(
+        location.text_id,
+        location_ids=[ensure(location_doc.id)],
+    )
+    await text_structure.structure_changed(location.text_id)
+    location_doc = ensure(await LocationDocument.get(location_doc.id))
+    return location_doc
+
+
+async def _check_structure_version(
+    conditional: ConditionalResponse,
+    text_id: PydanticObjectId,
+) -> None:
+    """Answers conditional requests for data derived from the given text's structure"""
+    conditional.check(
+        text_id,
+        await text_structure.get_version(text_id),
+        public=True,
+    )
 
 
 @router.get(
@@ -131,6 +151,7 @@ async def create_location(
     status_code=status.HTTP_200_OK,
 )
 async def find_locations(
+    conditional: ConditionalDep,
     location_id: Annotated[
         PydanticObjectId | None,
         Query(
@@ -208,7 +229,6 @@ async def find_locations(
         loc_doc: LocationDocument | None = await LocationDocument.get(location_id)
         if not loc_doc:
             return []
-        text_doc: TextDocument | None = await TextDocument.get(loc_doc.text_id)
         locations: list[LocationDocument] = [loc_doc]
 
     # ...same for a given parent ID...
@@ -220,7 +240,6 @@ async def find_locations(
         )
         if not locations:
             return []
-        text_doc: TextDocument | None = await TextDocument.get(locations[0].text_id)
 
     # ...in any other case, we'll have to puzzle a bit...
     else:
@@ -248,28 +267,18 @@ async def find_locations(
             await LocationDocument.find(query).limit(limit).to_list()
         )
 
+    if locations:
+        await _check_structure_version(conditional, locations[0].text_id)
+
+    # transform location documents into LocationRead instances
+    locations_read = [LocationRead.model_from(loc) for loc in locations]
+
     # add the full combined label to each location
     if add_full_labels:
-        # transform location documents into LocationRead instances
-        # so we can add the additional full_label fields
-        locations: list[LocationRead] = [
-            LocationRead.model_from(loc) for loc in locations
-        ]
-        for location in locations:
-            full_label = location.label
-            parent = await LocationDocument.get(location.parent_id)
-            while parent:
-                full_label = (
-                    f"{parent.label}{text_doc.loc_delim if text_doc else ''}"
-                    f"{full_label}"
-                )
-                parent = await LocationDocument.get(parent.parent_id)
-            location.full = full_label  # ty:ignore[unresolved-attribute]
+        for location_read, location in zip(locations_read, locations):
+            location_read.full = location.full_label  # ty:ignore[unresolved-attribute]
 
-    return [
-        LocationRead.model_from(loc) if not isinstance(loc, LocationRead) else loc
-        for loc in locations
-    ]
+    return locations_read
 
 
 @router.get(
@@ -294,6 +303,7 @@ async def get_path_options_by_head_id(
         Literal["root", "head"],
         Path(description="Wheter to handle the given location as path root or head"),
     ],
+    conditional: ConditionalDep,
 ) -> list[list[LocationDocument]]:
     """
     Returns the options for selecting text locations derived from the location path of
@@ -303,22 +313,27 @@ async def get_path_options_by_head_id(
     location_doc = await LocationDocument.get(location_id)
     if not location_doc:
         raise errors.E_404_LOCATION_NOT_FOUND
+    await _check_structure_version(conditional, location_doc.text_id)
 
-    options = []
+    options: list[list[LocationDocument]] = []
 
     if by == "head":
         # construct options for this path up to root location
-        while location_doc:
-            siblings = (
-                await LocationDocument.find(
-                    LocationDocument.text_id == location_doc.text_id,
-                    LocationDocument.parent_id == location_doc.parent_id,
-                )
-                .sort(+LocationDocument.position)
-                .to_list()
+        # (the siblings of each location on the path, including itself)
+        parent_ids = [None, *location_doc.ancestors]
+        siblings_by_parent: dict[PydanticObjectId | None, list[LocationDocument]] = {
+            parent_id: [] for parent_id in parent_ids
+        }
+        for sibling in (
+            await LocationDocument.find(
+                LocationDocument.text_id == location_doc.text_id,
+                In(LocationDocument.parent_id, parent_ids),
             )
-            options.insert(0, siblings)
-            location_doc = await LocationDocument.get(location_doc.parent_id)
+            .sort(+LocationDocument.position)
+            .to_list()
+        ):
+            siblings_by_parent[sibling.parent_id].append(sibling)
+        options = [siblings_by_parent[parent_id] for parent_id in parent_ids]
 
     elif by == "root":
         # construct options for this path up to max_level
@@ -351,6 +366,7 @@ async def get_path_options_by_head_id(
     ),
 )
 async def get_first_and_last_locations_paths(
+    conditional: ConditionalDep,
     text_id: Annotated[
         PydanticObjectId,
         Query(
@@ -369,39 +385,23 @@ async def get_first_and_last_locations_paths(
     # check if text exists
     if not await TextDocument.find_one(TextDocument.id == text_id).exists():
         raise errors.E_404_TEXT_NOT_FOUND
+    await _check_structure_version(conditional, text_id)
 
     # get first and last locations on the given level
-    from_location = (
-        await LocationDocument.find(
-            LocationDocument.text_id == text_id,
-            LocationDocument.level == level,
-        )
-        .sort(+LocationDocument.position)
-        .first_or_none()
-    )
-    to_location = (
-        await LocationDocument.find(
-            LocationDocument.text_id == text_id,
-            LocationDocument.level == level,
-        )
-        .sort(-LocationDocument.position)
-        .first_or_none()
-    )
-
-    # check if we found both
-    if not from_location or not to_location:
+    index = await text_structure.get_index(text_id)
+    first_and_last_ids = index.first_and_last_ids(level)
+    if not first_and_last_ids:
         raise errors.E_404_LOCATION_NOT_FOUND
 
     # find full location path for both first and last location
-    from_to = [from_location, to_location]
-    from_to_path = []
-    for location in from_to:
-        path = [location]
-        while path[0].parent_id:
-            path.insert(0, await LocationDocument.get(path[0].parent_id))
-        from_to_path.append(path)
-
-    return from_to_path
+    paths_ids = [index.path_ids(loc_id) for loc_id in first_and_last_ids]
+    locations = {
+        loc.id: loc
+        for loc in await LocationDocument.find(
+            In(LocationDocument.id, [loc_id for ids in paths_ids for loc_id in ids])
+        ).to_list()
+    }
+    return [[locations[loc_id] for loc_id in path_ids] for path_ids in paths_ids]
 
 
 @router.get(
@@ -465,10 +465,12 @@ async def get_location(
         PydanticObjectId,
         Path(alias="id"),
     ],
+    conditional: ConditionalDep,
 ) -> LocationDocument:
     location_doc = await LocationDocument.get(location_id)
     if not location_doc:
         raise errors.E_404_LOCATION_NOT_FOUND
+    await _check_structure_version(conditional, location_doc.text_id)
     return location_doc
 
 
@@ -495,7 +497,13 @@ async def update_location(
     location_doc = await LocationDocument.get(location_id)
     if not location_doc:
         raise errors.E_404_LOCATION_NOT_FOUND
-    return await location_doc.apply_updates(updates)
+    location_doc = await location_doc.apply_updates(updates)
+    await text_structure.update_location_paths(
+        location_doc.text_id,
+        location_ids=[location_id],
+    )
+    await text_structure.structure_changed(location_doc.text_id)
+    return ensure(await LocationDocument.get(location_id))
 
 
 @router.delete(
@@ -568,6 +576,7 @@ async def delete_location(
             await LocationDocument.find(In(LocationDocument.id, target_ids)).delete()
         ).deleted_count
         to_delete.pop(0)
+    await text_structure.structure_changed(text_id)
 
     # call hooks for changed content for all resources of this locations text
     for res in await ResourceBaseDocument.find(
@@ -660,4 +669,9 @@ async def move_location(
             distance = await LocationDocument.find(
                 In(LocationDocument.parent_id, [n.id for n in to_shift]),
             ).count()
+    await text_structure.update_location_paths(
+        location.text_id,
+        location_ids=[location_id],
+    )
+    await text_structure.structure_changed(location.text_id)
     return ensure(await LocationDocument.get(location_id))  # for type checker
@@ -4,13 +4,14 @@ from typing import Annotated, Union
 
 from beanie import PydanticObjectId
 from beanie.operators import GTE, Eq, NotIn
-from fastapi import APIRouter, BackgroundTasks, Header, Path, Query, status
+from fastapi import APIRouter, BackgroundTasks, Header, Path, Query, Response, status
 from fastapi.responses import FileResponse
 from humps import camelize
 from starlette.background import BackgroundTask
 
-from tekst import errors, platform, tasks
+from tekst import access_cache, change_tracker, errors, platform, platform_cache, tasks
 from tekst.auth import AccessTokenDocument, OptionalUserDep, SuperuserDep, UserDep
+from tekst.conditional import ConditionalDep
 from tekst.config import ConfigDep
 from tekst.counters import counter_get, counter_incr
 from tekst.models.bookmark import BookmarkDocument
@@ -34,7 +35,7 @@ from tekst.models.segment import (
 )
 from tekst.models.stats import SuperuserStats, UserStats
 from tekst.models.text import TextDocument
-from tekst.models.user import UserDocument
+from tekst.models.user import UserDocument, UserRead
 from tekst.notifications import send_test_email
 from tekst.routers.texts import get_all_texts
 from tekst.state import get_state, update_state
@@ -78,11 +79,29 @@ async def get_platform_data(
 async def get_client_init_data(
     ou: OptionalUserDep,
     cfg: ConfigDep,
-) -> ClientInitData:
+    conditional: ConditionalDep,
+) -> Response:
     """Returns data the client needs to initialize"""
-    return ClientInitData(
-        platform=await get_platform_data(ou, cfg),
-        user=ou,
+
+    # the platform data is serialized only once per user class
+    async def _serialize_platform_data() -> bytes:
+        return (
+            PlatformData.model_validate(await get_platform_data(ou, cfg))
+            .model_dump_json(by_alias=True)
+            .encode()
+        )
+
+    platform_data, platform_hash = await platform_cache.get_serialized(
+        ou, _serialize_platform_data
+    )
+    user_data = UserRead.model_validate(ou).model_dump_json(by_alias=True) if ou else ""
+    conditional.check(platform_hash, user_data, public=not ou)
+    return Response(
+        content=b'{"platform":'
+        + platform_data
+        + f',"user":{user_data or "null"}}}'.encode(),
+        media_type="application/json",
+        headers=conditional.headers,
     )
 
 
@@ -113,7 +132,9 @@ async def update_platform_state(
             }
         )
     # apply updates
-    return await update_state(**updates.model_dump(exclude_unset=True))
+    state = await update_state(**updates.model_dump(exclude_unset=True))
+    await access_cache.invalidate()
+    return state
 
 
 @router.get(
@@ -157,7 +178,9 @@ async def create_segment(
         ClientSegmentDocument.locale == segment.locale,
     ).exists():
         raise errors.E_409_SEGMENT_KEY_LOCALE_CONFLICT
-    return await ClientSegmentDocument.model_from(segment).create()
+    segment_doc = await ClientSegmentDocument.model_from(segment).create()
+    await platform_cache.invalidate()
+    return segment_doc
 
 
 @router.patch(
@@ -180,7 +203,9 @@ async def update_segment(
     segment_doc = await ClientSegmentDocument.get(segment_id)
     if not segment_doc:
         raise errors.E_404_SEGMENT_NOT_FOUND
-    return await segment_doc.apply_updates(updates)
+    segment_doc = await segment_doc.apply_updates(updates)
+    await platform_cache.invalidate()
+    return segment_doc
 
 
 @router.delete(
@@ -209,6 +234,7 @@ async def delete_segment(
         not delete_result.acknowledged or not delete_result.deleted_count
     ):  # pragma: no cover
         raise errors.E_500_INTERNAL_SERVER_ERROR
+    await platform_cache.invalidate()
 
 
 @router.get(
@@ -416,6 +442,8 @@ async def get_stats(
     if not user.is_superuser:
         return stats
     # collect stats available for superusers only
+    # (write pending counter changes of this API worker first)
+    await change_tracker.flush()
     stats = SuperuserStats(
         **stats.model_dump(),
         archived_contents=await ContentBaseDocument.find(
@@ -437,5 +465,7 @@ async def get_stats(
         forgotten_passwords=await counter_get("forgotten_passwords"),
         reset_passwords=await counter_get("reset_passwords"),
         deleted_users=await counter_get("deleted_users"),
+        search_cache_hits=await counter_get("search_cache_hits"),
+        search_cache_misses=await counter_get("search_cache_misses"),
     )
     return stats
@@ -1,5 +1,8 @@
+import asyncio
+import hashlib
 import json
 
+from collections.abc import Container
 from pathlib import Path as PathObj
 from tempfile import NamedTemporaryFile
 from typing import Annotated, Any, get_args
@@ -20,10 +23,22 @@ from fastapi import (
 from fastapi.responses import FileResponse
 from starlette.background import BackgroundTask
 
-from tekst import errors, notifications, tasks
+from tekst import (
+    access_cache,
+    aggregations,
+    change_tracker,
+    errors,
+    executor,
+    export_cache,
+    notifications,
+    tasks,
+    text_structure,
+)
 from tekst.auth import OptionalUserDep, SuperuserDep, UserDep
+from tekst.conditional import ConditionalDep, ConditionalResponse
 from tekst.config import ConfigDep, TekstConfig
 from tekst.i18n import pick_translation
+from tekst.json_stream import iter_json_array_items
 from tekst.logs import log
 from tekst.models.common import DocumentBase
 from tekst.models.content import ContentBase, ContentBaseDocument
@@ -55,80 +70,137 @@ from tekst.types import ResourceTypeName
 from tekst.utils import client_hash, ensure
 
 
-async def prepare_resource_read(
-    resource_doc: ResourceBaseDocument,
+async def prepare_resource_reads(
+    resource_docs: list[ResourceBaseDocument],
     for_user: UserRead | None = None,
-) -> AnyResourceRead:
+) -> list[AnyResourceRead]:
     """
-    A helper function that returns a fully prepared resource read instance for clients,
-    masked according to the requesting user's permissions.
+    A helper function that returns fully prepared resource read instances for clients,
+    masked according to the requesting user's permissions. The data of all users
+    referenced by the resources and their corrections counts are fetched in bulk.
     """
-    # convert resource document to resource type's read model instance
-    resource: AnyResourceRead = (
-        resource_types_mgr.get(resource_doc.resource_type)
-        .resource_model()
-        .read_model()(
-            **resource_doc.model_dump(exclude=resource_doc.restricted_fields(for_user))
+    resources: list[AnyResourceRead] = []
+    for resource_doc in resource_docs:
+        # convert resource document to resource type's read model instance
+        resource: AnyResourceRead = (
+            resource_types_mgr.get(resource_doc.resource_type)
+            .resource_model()
+            .read_model()(
+                **resource_doc.model_dump(
+                    exclude=resource_doc.restricted_fields(for_user)
+                )
+            )
         )
-    )
-    assert isinstance(resource, get_args(AnyResourceRead)[0])  # for type checker
+        assert isinstance(resource, get_args(AnyResourceRead)[0])  # for type checker
+
+        # include writable flag
+        resource.writable = bool(
+            for_user
+            and (
+                for_user.is_superuser
+                or (
+                    (
+                        for_user.id in resource.owner_ids
+                        or for_user.id in resource_doc.shared_write
+                    )
+                    and not resource.proposed
+                )
+            )
+        )
+        resources.append(resource)
 
-    # include writable flag
-    resource.writable = bool(
-        for_user
+    # corrections counts are included if user is owner of the resource
+    # or, if resource has no owner(s), user is superuser
+    with_corrections = {
+        resource.id
+        for resource in resources
+        if for_user
         and (
             for_user.is_superuser
-            or (
-                (
-                    for_user.id in resource.owner_ids
-                    or for_user.id in resource_doc.shared_write
-                )
-                and not resource.proposed
-            )
+            or for_user.id in resource.owner_ids
+            or for_user.id in resource.shared_write
         )
-    )
+    }
+    # shared-with user data is included if user is owner or superuser
+    with_shares = {
+        resource.id
+        for resource in resources
+        if for_user and (for_user.is_superuser or for_user.id in resource.owner_ids)
+    }
 
-    # include owner(s) user data in each resource model (if owner IDs are set)
-    if resource.owner_ids:
-        resource.owners = [
-            UserReadPublic.model_from(owner)
-            for owner in await UserDocument.find(
-                In(UserDocument.id, resource.owner_ids)
+    # fetch data of all referenced users at once
+    user_ids = set()
+    for resource in resources:
+        user_ids.update(resource.owner_ids)
+        if resource.id in with_shares:
+            user_ids.update(resource.shared_read)
+            user_ids.update(resource.shared_write)
+    users = (
+        {
+            user.id: UserReadPublic.model_from(user)
+            for user in await UserDocument.find(
+                In(UserDocument.id, list(user_ids))
             ).to_list()
-        ]
+        }
+        if user_ids
+        else {}
+    )
 
-    # include corrections count if user is owner of the resource
-    # or, if resource has no owner(s), user is superuser
-    if for_user and (
-        for_user.is_superuser
-        or for_user.id in resource.owner_ids
-        or for_user.id in resource.shared_write
-    ):
-        resource.corrections = await CorrectionDocument.find(
-            CorrectionDocument.resource_id == resource.id
-        ).count()
+    # count corrections for all relevant resources at once
+    corrections_counts = (
+        {
+            count["_id"]: count["corrections"]
+            for count in await CorrectionDocument.find(
+                In(CorrectionDocument.resource_id, list(with_corrections))
+            )
+            .aggregate(
+                [{"$group": {"_id": "$resource_id", "corrections": {"$sum": 1}}}]
+            )
+            .to_list()
+        }
+        if with_corrections
+        else {}
+    )
 
-    # include shared-with user data in each resource model (if any)
-    if for_user and (for_user.is_superuser or for_user.id in resource.owner_ids):
-        if resource.shared_read:
-            resource.shared_read_users = [
-                UserReadPublic.model_from(u)
-                for u in await UserDocument.find(
-                    In(UserDocument.id, resource.shared_read)
-                ).to_list()
-            ]
-        if resource.shared_write:
-            resource.shared_write_users = [
-                UserReadPublic.model_from(u)
-                for u in await UserDocument.find(
-                    In(UserDocument.id, resource.shared_write)
-                ).to_list()
+    for resource in resources:
+        # include owner(s) user data in each resource model (if owner IDs are set)
+        if resource.owner_ids:
+            resource.owners = [
+                users[user_id] for user_id in resource.owner_ids if user_id in users
             ]
-    else:
-        resource.shared_read = []
-        resource.shared_write = []
+        # include corrections count
+        if resource.id in with_corrections:
+            resource.corrections = corrections_counts.get(resource.id, 0)
+        # include shared-with user data in each resource model (if any)
+        if resource.id in with_shares:
+            if resource.shared_read:
+                resource.shared_read_users = [
+                    users[user_id]
+                    for user_id in resource.shared_read
+                    if user_id in users
+                ]
+            if resource.shared_write:
+                resource.shared_write_users = [
+                    users[user_id]
+                    for user_id in resource.shared_write
+                    if user_id in users
+                ]
+        else:
+            resource.shared_read = []
+            resource.shared_write = []
 
-    return resource
+    return resources
+
+
+async def prepare_resource_read(
+    resource_doc: ResourceBaseDocument,
+    for_user: UserRead | None = None,
+) -> AnyResourceRead:
+    """
+    A helper function that returns a fully prepared resource read instance for clients,
+    masked according to the requesting user's permissions.
+    """
+    return (await prepare_resource_reads([resource_doc], for_user))[0]
 
 
 router = APIRouter(
@@ -136,6 +208,12 @@ router = APIRouter(
     tags=["resources"],
 )
 
+# number of contents to write at once when importing resource contents
+_IMPORT_BATCH_SIZE = 1000
+
+# size of the chunks to read when spooling uploaded import files to disk
+_IMPORT_SPOOL_CHUNK_SIZE = 1024 * 1024
+
 
 @router.get(
     "/precompute",
@@ -207,6 +285,7 @@ async def create_resource(
     )
     resource_doc.owner_ids = [user.id]  # force correct owner ID
     await resource_doc.create()  # create resource in DB
+    await access_cache.invalidate()
 
     return await prepare_resource_read(resource_doc, user)
 
@@ -262,6 +341,7 @@ async def create_resource_patch(
             "shared_write": [],
         }
     ).create()
+    await access_cache.invalidate()
 
     return await prepare_resource_read(patch_doc, user)
 
@@ -338,6 +418,7 @@ async def update_resource(
 
     # update document
     await resource_doc.apply_updates(updates)
+    await access_cache.invalidate()
 
     return await prepare_resource_read(resource_doc, user)
 
@@ -399,10 +480,7 @@ async def find_resources(
     )
 
     # return processed results, enrich with user-specific access flags etc.
-    return [
-        await prepare_resource_read(resource_doc, user)
-        for resource_doc in resource_docs
-    ]
+    return await prepare_resource_reads(resource_docs, user)
 
 
 @router.get(
@@ -468,6 +546,9 @@ async def delete_resource(
         CorrectionDocument.resource_id == resource_id,
     ).delete()
 
+    # delete aggregations data of the resource
+    await aggregations.delete_aggregations([resource_id])
+
     # mark the text's index as out-of-date
     await resource_doc.set_index_ood()
 
@@ -476,6 +557,7 @@ async def delete_resource(
         ResourceBaseDocument.id == resource_id,
         with_children=True,
     ).delete()
+    await access_cache.invalidate()
 
 
 @router.patch(
@@ -525,6 +607,7 @@ async def update_resource_owners(
             ],
         }
     )
+    await access_cache.invalidate()
 
     # notify newly added owners
     for u in await UserDocument.find(
@@ -601,6 +684,7 @@ async def propose_resource(
             ResourceBaseDocument.shared_write: [],
         }
     )
+    await access_cache.invalidate()
     # notify users about the new proposal
     await notifications.broadcast_user_notification(
         notifications.Notification.USRMSG_RESOURCE_PROPOSED,
@@ -639,6 +723,7 @@ async def unpropose_resource(
             ResourceBaseDocument.supporters: None,
         }
     )
+    await access_cache.invalidate()
     return await prepare_resource_read(resource_doc, user)
 
 
@@ -748,6 +833,7 @@ async def publish_resource(
             ResourceBaseDocument.shared_write: [],
         }
     )
+    await access_cache.invalidate()
 
     # mark the text's index as out-of-date
     await resource_doc.set_index_ood()
@@ -787,6 +873,7 @@ async def unpublish_resource(
             ResourceBaseDocument.proposed: False,
         }
     )
+    await access_cache.invalidate()
     await resource_doc.set_index_ood()
     return await prepare_resource_read(resource_doc, user)
 
@@ -869,7 +956,105 @@ async def download_resource_template(
 
 async def _import_resource_task(
     resource_id: PydanticObjectId,
-    file_bytes: bytes,
+    file_path: PathObj,
+    file_hash: str,
+    user: UserRead,
+) -> dict[str, Any]:
+    try:
+        return await _import_resource(
+            resource_id=resource_id,
+            file_path=file_path,
+            file_hash=file_hash,
+            user=user,
+        )
+    finally:
+        # delete the spooled upload file
+        file_path.unlink(missing_ok=True)
+
+
+def _validate_import_content(
+    import_content: Any,
+    *,
+    resource_id: PydanticObjectId,
+    resource_type: str,
+    valid_location_ids: Container[PydanticObjectId],
+    existing: Container[PydanticObjectId],
+) -> tuple[PydanticObjectId, ContentBase]:
+    """
+    Validates a single content from the import data and returns the ID of its
+    location and the content as an update model instance (if there already is
+    a content for this location) or a create model instance
+    """
+    if not isinstance(import_content, dict):
+        raise errors.E_422_UPLOAD_INVALID_DATA
+    # check if location ID is valid and the location exists
+    loc_id = import_content.pop("locationId", None)
+    if not loc_id or not PydanticObjectId.is_valid(loc_id):
+        raise errors.E_400_IMPORT_ID_NON_EXISTENT
+    loc_id = PydanticObjectId(loc_id)
+    if loc_id not in valid_location_ids:
+        raise errors.E_400_IMPORT_ID_NON_EXISTENT
+    # validate content against model
+    content_model = resource_types_mgr.get(resource_type).content_model()
+    try:
+        if loc_id in existing:
+            # this is an update to an existing content document
+            return loc_id, content_model.update_model()(
+                resource_type=resource_type,
+                **import_content,
+            )
+        # this is a new content document
+        return loc_id, content_model.create_model()(
+            resource_id=resource_id,
+            location_id=loc_id,
+            resource_type=resource_type,
+            **import_content,
+        )
+    except Exception as e:
+        raise errors.update_values(
+            exc=errors.E_422_UPLOAD_INVALID_DATA,
+            values={"errors": str(e)},
+        )
+
+
+def _validate_import_file(
+    file_path: PathObj,
+    *,
+    resource_id: PydanticObjectId,
+    resource_type: str,
+    valid_location_ids: set[PydanticObjectId],
+    existing_location_ids: set[PydanticObjectId],
+) -> dict[str, Any]:
+    """
+    Parses and validates all contents in the given import file (this is CPU-bound,
+    so it is meant to be run via the executor). Returns all other top-level
+    properties of the import data.
+    """
+    import_data: dict[str, Any] = {}
+    try:
+        with file_path.open("r", encoding="utf-8") as f:
+            for import_content in iter_json_array_items(f, "contents", import_data):
+                _validate_import_content(
+                    import_content,
+                    resource_id=resource_id,
+                    resource_type=resource_type,
+                    valid_location_ids=valid_location_ids,
+                    existing=existing_location_ids,
+                )
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise errors.update_values(
+            exc=errors.E_400_UPLOAD_INVALID_JSON,
+            values={"errors": str(e)},
+        )
+    except TypeError:
+        raise errors.E_422_UPLOAD_INVALID_DATA
+    return import_data
+
+
+async def _import_resource(
+    resource_id: PydanticObjectId,
+    file_path: PathObj,
+    file_hash: str,
     user: UserRead,
 ) -> dict[str, Any]:
     # check if resource exists
@@ -887,103 +1072,92 @@ async def _import_resource_task(
     if not resource_doc:
         raise errors.E_403_FORBIDDEN
 
-    # parse data and validate import file format
-    try:
-        import_data = json.loads(file_bytes)
-    except Exception as e:
-        raise errors.update_values(
-            exc=errors.E_400_UPLOAD_INVALID_JSON,
-            values={"errors": str(e)},
-        )
-    finally:
-        del file_bytes
-
-    # normalize resource ID key to allow following the import template as well as
-    # re-importing a Tekst-JSON-exported resource
-    import_data["_id"] = (
-        import_data.pop("resourceId", None)
-        or import_data.pop("resource_id", None)
-        or import_data.pop("id", None)
-        or import_data.pop("_id", None)
-    )
-
-    # check if resource_id matches ID in import_data
-    if str(resource_id) != str(import_data.get("_id")):
-        raise errors.E_400_IMPORT_ID_MISMATCH  # pragma: no cover
-
-    # check if "contents" is a list
-    if not isinstance(import_data.get("contents", []), list):
-        raise errors.E_422_UPLOAD_INVALID_DATA
-
-    # get content models
+    # get content document model
     content_model = resource_types_mgr.get(resource_doc.resource_type).content_model()
     content_doc_model: type[ContentBase] = content_model.document_model()
     assert issubclass(content_doc_model, DocumentBase)  # for type checker
-    content_create_model: type[ContentBase] = content_model.create_model()
-    content_update_model: type[ContentBase] = content_model.update_model()
 
-    # prepare lists to collect contents to update and insert separately,
-    # as they are handled differently
-    updates: list[tuple] = []  # (existing_content_doc, import_content: dict)
-    inserts: list[ContentBaseDocument] = []
+    # collect IDs of locations with changed contents to record them in the
+    # index journal (or `None` if the import invalidates the whole index)
+    changed_location_ids: list[PydanticObjectId] | None = []
+    # whether anything has been written (so the contents might have changed)
+    written = False
+
+    # check if there is a checkpoint of a previous, failed import
+    checkpoint = await PrecomputedDataDocument.find_one(
+        PrecomputedDataDocument.ref_id == resource_id,
+        PrecomputedDataDocument.precomputed_type == "import_checkpoint",
+    ) or PrecomputedDataDocument(
+        ref_id=resource_id,
+        precomputed_type="import_checkpoint",
+    )
+    # if the previous import failed while writing a batch of contents,
+    # undo the writes of this batch, so it can be written again
+    if checkpoint.data and (failed_batch := checkpoint.data.pop("batch", None)):
+        await ContentBaseDocument.find(
+            In(ContentBaseDocument.id, failed_batch["inserted_ids"]),
+            with_children=True,
+        ).delete()
+        await ContentBaseDocument.find(
+            In(ContentBaseDocument.id, failed_batch["replaced_ids"]),
+            with_children=True,
+        ).set({ContentBaseDocument.archived: False})
+        await checkpoint.save()
+        changed_location_ids.extend(failed_batch["location_ids"])
+        written = True
+    skip_count = 0
+    if checkpoint.data and checkpoint.data.get("file_hash") == file_hash:
+        skip_count = int(checkpoint.data.get("processed", 0))
+    processed_count = skip_count
+
+    inserted_count = 0
+    updated_count = 0
+
+    # prefetch the IDs of all locations contents of this resource may refer to
+    # and the IDs of the locations that already have contents of this resource
+    valid_location_ids: set[PydanticObjectId] = {
+        loc["_id"]
+        for loc in await LocationDocument.find(
+            Eq(LocationDocument.text_id, resource_doc.text_id),
+            Eq(LocationDocument.level, resource_doc.level),
+        )
+        .aggregate([{"$project": {"_id": 1}}])
+        .to_list()
+    }
+    existing_location_ids: set[PydanticObjectId] = {
+        cnt["location_id"]
+        for cnt in await ContentBaseDocument.find(
+            Eq(ContentBaseDocument.resource_id, resource_doc.id),
+            Eq(ContentBaseDocument.archived, False),
+            with_children=True,
+        )
+        .aggregate([{"$project": {"_id": 0, "location_id": 1}}])
+        .to_list()
+    }
 
     try:
-        # check import data
-        while import_data.get("contents"):
-            import_content = import_data["contents"].pop()
-
-            # check if location ID is valid
-            if not import_content.get("locationId") or not PydanticObjectId.is_valid(
-                import_content["locationId"]
-            ):
-                raise errors.E_400_IMPORT_ID_NON_EXISTENT
-            loc_id = PydanticObjectId(import_content["locationId"])
-            # remove location ID from content data
-            # to pass update model validation
-            del import_content["locationId"]
-
-            # check if location exists
-            if not await LocationDocument.find_one(
-                LocationDocument.id == loc_id
-            ).exists():
-                raise errors.E_400_IMPORT_ID_NON_EXISTENT
-
-            # fetch possible existing content
-            existing_content_doc = await ContentBaseDocument.find_one(
-                Eq(ContentBaseDocument.resource_id, resource_doc.id),
-                Eq(ContentBaseDocument.location_id, loc_id),
-                Eq(ContentBaseDocument.archived, False),
-                with_children=True,
-            )
+        # first pass: validate the complete import data before writing anything
+        import_data = await executor.run_cpu_bound(
+            _validate_import_file,
+            file_path,
+            resource_id=resource_id,
+            resource_type=resource_doc.resource_type,
+            valid_location_ids=valid_location_ids,
+            existing_location_ids=existing_location_ids,
+        )
 
-            # create updates and inserts "todo" lists
-            # and validate contents against model
-            try:
-                if existing_content_doc:
-                    # this is an update to an existing content document
-                    content_updates = content_update_model(
-                        resource_type=existing_content_doc.resource_type,
-                        **import_content,
-                    )
-                    updates.append((existing_content_doc, content_updates.model_dump()))
-                else:
-                    # this is a new content document
-                    inserts.append(
-                        content_doc_model.model_from(
-                            content_create_model(
-                                resource_id=resource_doc.id,
-                                location_id=loc_id,
-                                resource_type=resource_doc.resource_type,
-                                **import_content,
-                            )
-                        )
-                    )
-            except Exception as e:
-                print(e)
-                raise errors.update_values(
-                    exc=errors.E_422_UPLOAD_INVALID_DATA,
-                    values={"errors": str(e)},
-                )
+        # normalize resource ID key to allow following the import template as well as
+        # re-importing a Tekst-JSON-exported resource
+        import_data["_id"] = (
+            import_data.pop("resourceId", None)
+            or import_data.pop("resource_id", None)
+            or import_data.pop("id", None)
+            or import_data.pop("_id", None)
+        )
+
+        # check if resource_id matches ID in import_data
+        if str(resource_id) != str(import_data.get("_id")):
+            raise errors.E_400_IMPORT_ID_MISMATCH  # pragma: no cover
 
         # create resource update model instance and make sure to exclude
         # fields that are not allowed to be updated on resource import
@@ -1001,59 +1175,127 @@ async def _import_resource_task(
         )
         del import_data
 
-        # process inserts
-        if inserts:
-            inserted_count = len(
-                (await content_doc_model.insert_many(inserts)).inserted_ids
-            )
-        else:
-            inserted_count = 0
-        del inserts
-
-        # process updates
-        updated_count = len(updates)
-        updates_stack = []
-        while updates:
-            existing_content_doc, content_updates = updates.pop()
-            loc_id = existing_content_doc.location_id
-            if resource_doc.public and not resource_doc.patch_for:
-                # archive the existing content doc if the resource
-                # is public (and not a resource patch)
-                await existing_content_doc.archive()
-            else:
-                # otherwise, delete it
-                await existing_content_doc.delete()  # pragma: no cover
-            updates_stack.append(
-                content_doc_model(
-                    resource_id=resource_doc.id,
-                    location_id=loc_id,
-                    **content_updates,
+        # check if the resource updates invalidate the whole index of the text
+        if resource_doc.cfg_updates_invalidate_index(res_updates):
+            changed_location_ids = None  # pragma: no cover
+
+        async def _write_batch(batch: list[Any]) -> None:
+            nonlocal inserted_count, updated_count, processed_count, written
+            # fetch existing contents for the locations of this batch
+            # (the contents have already been validated in the first pass)
+            existing_contents = {
+                cnt.location_id: cnt
+                for cnt in await ContentBaseDocument.find(
+                    Eq(ContentBaseDocument.resource_id, resource_doc.id),
+                    In(
+                        ContentBaseDocument.location_id,
+                        [PydanticObjectId(c["locationId"]) for c in batch],
+                    ),
+                    Eq(ContentBaseDocument.archived, False),
+                    with_children=True,
+                ).to_list()
+            }
+            new_docs = []
+            replaced_ids = []
+            location_ids = []
+            for import_content in batch:
+                loc_id, content = _validate_import_content(
+                    import_content,
+                    resource_id=resource_id,
+                    resource_type=resource_doc.resource_type,
+                    valid_location_ids=valid_location_ids,
+                    existing=existing_contents,
                 )
+                if loc_id in existing_contents:
+                    replaced_ids.append(existing_contents[loc_id].id)
+                    new_docs.append(
+                        content_doc_model(
+                            resource_id=resource_doc.id,
+                            location_id=loc_id,
+                            **content.model_dump(),
+                        )
+                    )
+                    updated_count += 1
+                else:
+                    new_docs.append(content_doc_model.model_from(content))
+                    inserted_count += 1
+                location_ids.append(loc_id)
+                if changed_location_ids is not None:
+                    changed_location_ids.append(loc_id)
+            for new_doc in new_docs:
+                new_doc.id = PydanticObjectId()
+            # record the writes of this batch in the checkpoint before writing,
+            # so they can be undone if the import fails in the middle of them
+            checkpoint.data = {
+                "file_hash": file_hash,
+                "processed": processed_count,
+                "batch": {
+                    "inserted_ids": [new_doc.id for new_doc in new_docs],
+                    "replaced_ids": replaced_ids,
+                    "location_ids": location_ids,
+                },
+            }
+            await checkpoint.save()
+            written = True
+            # archive the existing content docs, then insert the new ones
+            replaced = ContentBaseDocument.find(
+                In(ContentBaseDocument.id, replaced_ids),
+                with_children=True,
+            )
+            if replaced_ids:
+                await replaced.set({ContentBaseDocument.archived: True})
+            await content_doc_model.insert_many(new_docs)
+            # only keep the archived content docs if the resource
+            # is public (and not a resource patch), otherwise delete them
+            if replaced_ids and (not resource_doc.public or resource_doc.patch_for):
+                await replaced.delete()  # pragma: no cover
+            # save checkpoint and report progress
+            processed_count += len(batch)
+            checkpoint.data = {"file_hash": file_hash, "processed": processed_count}
+            await checkpoint.save()
+            await tasks.update_progress(
+                tasks.TaskType.RESOURCE_IMPORT,
+                {"processed": processed_count},
+                target_id=resource_id,
             )
-            if len(updates_stack) > 500:  # pragma: no cover
-                await content_doc_model.insert_many(updates_stack)
-                updates_stack = []
-
-        if len(updates_stack):
-            await content_doc_model.insert_many(updates_stack)
 
-        del updates
-        del updates_stack
+        # second pass: write contents in batches
+        # (skipping contents already written by a previous import of the same file)
+        with file_path.open("r", encoding="utf-8") as f:
+            batch = []
+            for i, import_content in enumerate(iter_json_array_items(f, "contents")):
+                if i < skip_count:
+                    continue  # pragma: no cover
+                batch.append(import_content)
+                if len(batch) >= _IMPORT_BATCH_SIZE:  # pragma: no cover
+                    await _write_batch(batch)
+                    batch = []
+            if batch:
+                await _write_batch(batch)
 
         # write resource props and config import data
         # (will be skipped if anything went wrong with content import)
         await resource_doc.apply_updates(res_updates)
+        written = True
+        await access_cache.invalidate()
+        # the import is complete, so the checkpoint isn't needed anymore
+        if checkpoint.id:
+            await checkpoint.delete()
     except Exception as e:
         raise e
     finally:
-        # call the resource's hook for changed contents
-        await resource_doc.contents_changed_hook()
-        # mark the text's index as out-of-date
-        await resource_doc.set_index_ood()
+        # only if anything has been written (the import data might
+        # have been rejected before writing anything)...
+        if written:
+            # call the resource's hook for changed contents
+            await resource_doc.contents_changed_hook()
+            # mark the text's index as out-of-date
+            await resource_doc.set_index_ood(changed_location_ids)
 
     return {
         "created": inserted_count,
         "updated": updated_count,
+        "skipped": skip_count,
     }
 
 
@@ -1081,52 +1323,53 @@ async def import_resource(
             media_type="application/json",
         ),
     ],
+    cfg: ConfigDep,
 ) -> tasks.TaskDocument:
     # test upload file MIME type
     if file.content_type and file.content_type.lower() != "application/json":
         raise errors.E_400_UPLOAD_INVALID_MIME_TYPE_NOT_JSON
 
-    file_bytes = await file.read()
-    await file.close()
-    return await tasks.create_task(
-        _import_resource_task,
-        tasks.TaskType.RESOURCE_IMPORT,
-        target_id=resource_id,
-        user_id=user.id,
-        task_kwargs={
-            "resource_id": resource_id,
-            "file_bytes": file_bytes,
-            "user": user,
-        },
-    )
+    # spool upload to a temp file chunk by chunk, hashing its contents
+    # (so a failed import of the same file can be resumed)
+    # (writing happens in a thread, so it doesn't block the event loop)
+    file_path: PathObj = cfg.temp_files_dir / str(uuid4())
+    file_hash = hashlib.sha256()
+    try:
+        f = await asyncio.to_thread(lambda: file_path.open("wb"))
+        try:
+            while chunk := await file.read(_IMPORT_SPOOL_CHUNK_SIZE):
+                file_hash.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        await file.close()
+
+        return await tasks.create_task(
+            _import_resource_task,
+            tasks.TaskType.RESOURCE_IMPORT,
+            target_id=resource_id,
+            user_id=user.id,
+            task_kwargs={
+                "resource_id": resource_id,
+                "file_path": file_path,
+                "file_hash": file_hash.hexdigest(),
+                "user": user,
+            },
+        )
+    except BaseException:
+        # delete the spooled upload file if the import task couldn't be created
+        # (this includes the request being cancelled while spooling the upload)
+        file_path.unlink(missing_ok=True)
+        raise
 
 
-async def export_resource_contents_task(
-    user: OptionalUserDep,
-    cfg: TekstConfig,
-    resource_id: PydanticObjectId,
+async def _create_resource_export(
+    resource: ResourceBaseDocument,
     export_format: ResourceExportFormat,
-    location_from_id: PydanticObjectId | None = None,
-    location_to_id: PydanticObjectId | None = None,
-) -> dict[str, Any]:
-    resource = await ResourceBaseDocument.get_safe(resource_id, user)
-    # check if location range is valid
-    loc_from: LocationDocument | None = (
-        await LocationDocument.get(location_from_id) if location_from_id else None
-    )
-    loc_to: LocationDocument | None = (
-        await LocationDocument.get(location_to_id) if location_to_id else None
-    )
-    if (
-        (loc_from and loc_from.text_id != resource.text_id)
-        or (loc_to and loc_to.text_id != resource.text_id)
-        or (loc_from and loc_from.level != resource.level)
-        or (loc_to and loc_to.level != resource.level)
-        or (loc_from and loc_to and loc_from.position > loc_to.position)
-    ):
-        raise errors.E_400_LOCATION_RANGE_INVALID
-
-    text = ensure(await TextDocument.get(resource.text_id))
+    loc_from: LocationDocument | None,
+    loc_to: LocationDocument | None,
+    tempfile_path: PathObj,
+) -> None:
     target_res_type = resource_types_mgr.get(resource.resource_type)
 
     # get the IDs of all resource contents in the given location range,
@@ -1149,7 +1392,7 @@ async def export_resource_contents_task(
                         "foreignField": "location_id",
                         "let": {
                             "location_id": "$_id",
-                            "resource_id": resource_id,
+                            "resource_id": resource.id,
                         },
                         "pipeline": [
                             {
@@ -1180,10 +1423,6 @@ async def export_resource_contents_task(
     )
     content_ids: list[PydanticObjectId] = [c["_id"] for c in content_ids]
 
-    # construct temp file name and path
-    tempfile_name = str(uuid4())
-    tempfile_path: PathObj = cfg.temp_files_dir / tempfile_name
-
     # create export data
     if export_format == "tekst-json":
         await target_res_type.export_tekst_json(
@@ -1208,13 +1447,77 @@ async def export_resource_contents_task(
         except ValueError:  # pragma: no cover
             raise errors.E_400_UNSUPPORTED_EXPORT_FORMAT
 
+
+async def export_resource_contents_task(
+    user: OptionalUserDep,
+    cfg: TekstConfig,
+    resource_id: PydanticObjectId,
+    export_format: ResourceExportFormat,
+    location_from_id: PydanticObjectId | None = None,
+    location_to_id: PydanticObjectId | None = None,
+    compress: bool = False,
+) -> dict[str, Any]:
+    # write content changes pending in this process, so the cache key reflects them
+    # (changes recorded by other API workers might not be written yet, so an export
+    # requested right after an edit might miss it until these have been written)
+    await change_tracker.flush()
+    resource = await ResourceBaseDocument.get_safe(resource_id, user)
+    # check if location range is valid
+    loc_from: LocationDocument | None = (
+        await LocationDocument.get(location_from_id) if location_from_id else None
+    )
+    loc_to: LocationDocument | None = (
+        await LocationDocument.get(location_to_id) if location_to_id else None
+    )
+    if (
+        (loc_from and loc_from.text_id != resource.text_id)
+        or (loc_to and loc_to.text_id != resource.text_id)
+        or (loc_from and loc_from.level != resource.level)
+        or (loc_to and loc_to.level != resource.level)
+        or (loc_from and loc_to and loc_from.position > loc_to.position)
+    ):
+        raise errors.E_400_LOCATION_RANGE_INVALID
+
+    text = ensure(await TextDocument.get(resource.text_id))
+
+    # construct temp file name and path
+    # (export data is compressed on the fly if the file name ends with ".gz")
+    tempfile_name = f"{uuid4()}.gz" if compress else str(uuid4())
+    tempfile_path: PathObj = cfg.temp_files_dir / tempfile_name
+
+    # use the cached export file for the exact same export data, if there is one,
+    # otherwise create the export data (and cache it for subsequent exports)
+    cache_key = (
+        export_cache.make_key(
+            resource=resource.model_dump(mode="json"),
+            text=text.model_dump(mode="json", exclude={"index_utd"}),
+            structure_version=await text_structure.get_version(resource.text_id),
+            export_format=export_format,
+            location_from_id=location_from_id,
+            location_to_id=location_to_id,
+            compress=compress,
+        )
+        if export_cache.is_enabled()
+        else None
+    )
+    if not cache_key or not export_cache.get(cache_key, tempfile_path):
+        await _create_resource_export(
+            resource,
+            export_format,
+            loc_from,
+            loc_to,
+            tempfile_path,
+        )
+        if cache_key:
+            export_cache.put(cache_key, tempfile_path)
+
     fmt = res_exp_fmt_info[export_format]
     filename = f"{text.slug}_{resource.id}_export.{fmt['extension']}"
 
     return {
-        "filename": filename,
+        "filename": f"{filename}.gz" if compress else filename,
         "artifact": tempfile_name,
-        "mimetype": fmt["mimetype"],
+        "mimetype": "application/gzip" if compress else fmt["mimetype"],
     }
 
 
@@ -1260,6 +1563,13 @@ async def export_resource_contents(
             description="ID of the location to end the export's location range at",
         ),
     ] = None,
+    compress: Annotated[
+        bool,
+        Query(
+            alias="gzip",
+            description="Whether to compress the export file using gzip",
+        ),
+    ] = False,
 ) -> tasks.TaskDocument:
     # allow export format "tekst-json" only for logged-in users
     if not user and export_format == "tekst-json":
@@ -1279,10 +1589,38 @@ async def export_resource_contents(
             "export_format": export_format,
             "location_from_id": location_from_id,
             "location_to_id": location_to_id,
+            "compress": compress,
         },
     )
 
 
+async def _get_precomputed_data(
+    resource_doc: ResourceBaseDocument,
+    precomputed_type: str,
+    user: UserRead | None,
+    conditional: ConditionalResponse,
+) -> Any | None:
+    """
+    Returns the precomputed data of the given type for the given resource. Conditional
+    requests are answered based on the data's creation time, before loading the data.
+    """
+    query = {"ref_id": resource_doc.id, "precomputed_type": precomputed_type}
+    precomp_stamp = await PrecomputedDataDocument.get_pymongo_collection().find_one(
+        query,
+        {"created_at": 1},
+    )
+    if not precomp_stamp:
+        return None
+    conditional.check(
+        precomp_stamp["_id"],
+        precomp_stamp["created_at"],
+        last_modified=precomp_stamp["created_at"],
+        public=user is None,
+    )
+    precomp_doc = await PrecomputedDataDocument.find_one(query)
+    return precomp_doc.data if precomp_doc else None
+
+
 @router.get(
     "/{id}/aggregations",
     status_code=status.HTTP_200_OK,
@@ -1295,21 +1633,17 @@ async def export_resource_contents(
 )
 async def get_aggregations(
     user: OptionalUserDep,
+    conditional: ConditionalDep,
     resource_id: Annotated[
         PydanticObjectId,
         Path(alias="id"),
     ],
 ) -> list[Any]:
     resource_doc = await ResourceBaseDocument.get_safe(resource_id, user)
-    # find requested precomputed data
-    precomp_doc = await PrecomputedDataDocument.find_one(
-        PrecomputedDataDocument.ref_id == resource_doc.id,
-        PrecomputedDataDocument.precomputed_type == "aggregations",
+    return (
+        await _get_precomputed_data(resource_doc, "aggregations", user, conditional)
+        or []
     )
-    if precomp_doc and precomp_doc.data:
-        return precomp_doc.data
-    else:
-        return []
 
 
 @router.get(
@@ -1329,14 +1663,10 @@ async def get_resource_coverage_data(
         Path(alias="id"),
     ],
     user: OptionalUserDep,
+    conditional: ConditionalDep,
 ) -> dict:
     resource_doc = await ResourceBaseDocument.get_safe(resource_id, user)
-    # find requested precomputed data
-    precomp_doc = await PrecomputedDataDocument.find_one(
-        PrecomputedDataDocument.ref_id == resource_doc.id,
-        PrecomputedDataDocument.precomputed_type == "coverage",
-    )
-    if precomp_doc and precomp_doc.data:
-        return precomp_doc.data
-    else:
+    data = await _get_precomputed_data(resource_doc, "coverage", user, conditional)
+    if not data:
         raise errors.E_404_NOT_FOUND
+    return data
@@ -1,11 +1,13 @@
+import csv
+import gzip
 import json
 import re
 
 from pathlib import Path as PathObj
-from typing import Annotated, Any, Union
+from typing import Annotated, Any, TextIO, Union
 from uuid import uuid4
 
-from fastapi import APIRouter, BackgroundTasks, Body, Request, status
+from fastapi import APIRouter, BackgroundTasks, Body, Query, Request, status
 
 from tekst import errors, search, tasks
 from tekst.auth import OptionalUserDep, SuperuserDep
@@ -17,7 +19,9 @@ from tekst.models.search import (
     AdvancedSearchRequestBody,
     IndexInfo,
     QuickSearchRequestBody,
+    SearchExportFormat,
     SearchResults,
+    search_exp_fmt_info,
 )
 from tekst.models.text import TextDocument
 from tekst.models.user import UserRead
@@ -30,6 +34,9 @@ router = APIRouter(
     tags=["search"],
 )
 
+# number of search hits to request at once when exporting search results
+_SEARCH_EXPORT_PAGE_SIZE = 1000
+
 
 @router.post(
     "",
@@ -38,6 +45,7 @@ router = APIRouter(
     responses=errors.responses(
         [
             errors.E_400_REQUESTED_TOO_MANY_SEARCH_RESULTS,
+            errors.E_400_INVALID_SEARCH_CURSOR,
         ]
     ),
 )
@@ -75,8 +83,9 @@ async def handle_search(
 async def create_search_index(
     su: SuperuserDep,
     force: bool = False,
+    incremental: bool = False,
 ) -> tasks.TaskDocument:
-    return await search.create_indices(user=su, force=force)
+    return await search.create_indices(user=su, force=force, incremental=incremental)
 
 
 @router.get(
@@ -98,80 +107,130 @@ async def _export_search_results_task(
     user: UserRead | None,
     cfg: TekstConfig,
     req_body: QuickSearchRequestBody | AdvancedSearchRequestBody,
+    export_format: SearchExportFormat = "json",
+    compress: bool = False,
 ) -> dict[str, Any]:
-    # setup pagination for chunked search requests
-    req_body.settings_general.pagination.page = 1
-    req_body.settings_general.pagination.page_size = 50
-
     # prepare data needed for export data transformation
     locale = user.locale or "enUS" if user else "enUS"
     texts_by_ids: dict[str, TextDocument] = {
         str(txt.id): txt for txt in await TextDocument.find_all().to_list()
     }
-    resources_by_ids: dict[str, ResourceBaseDocument] = {
-        str(res.id): res
+    resource_titles_by_ids: dict[str, str] = {
+        str(res.id): pick_translation(res.title, locale)
         for res in await ResourceBaseDocument.find_all(with_children=True).to_list()
     }
 
-    # perform search, transform data into target export data format
-    hits = []
-    while (results := await search.search(user, req_body)).hits:
-        # transform hits into actual search results export data
-        for hit in results.hits:
-            text = texts_by_ids.get(str(hit.text_id))
-            if not text:  # pragma: no cover # should not happen
-                continue
-            hits.append(
-                {
-                    "location": hit.full_label,
-                    "text": text.title,
-                    "level": hit.level,
-                    "levelLabel": pick_translation(text.levels[hit.level], locale),
-                    "position": hit.position,
-                    "score": hit.score,
-                    "highlights": {
-                        pick_translation(
-                            resources_by_ids.get(hl_res_id).title,  # ty:ignore[unresolved-attribute]
-                            locale,
-                        ): hl
-                        for hl_res_id, hl in hit.highlight.items()
-                        if hl
-                    },
-                }
-            )
-
-        # break early if we already got all hits to avoid running into 10000 hits limit
-        # that's enforced by the search routine
-        if len(hits) >= results.total_hits:
-            break
-        # there's more, so advance pagination for the next search iteration
-        req_body.settings_general.pagination.page += 1  # pragma: no cover
-
     # construct temp file name and path
     search_id = str(uuid4())
     tempfile_name = search_id
     tempfile_path: PathObj = cfg.temp_files_dir / tempfile_name
 
-    # write temp file
-    with tempfile_path.open("w") as f:
-        json.dump(hits, f)
+    # perform search, transform data into target export data format and
+    # write it to the temp file page by page, so memory usage stays bounded
+    try:
+        with (
+            gzip.open(tempfile_path, "wt", newline="", encoding="utf-8")
+            if compress
+            else tempfile_path.open("w", newline="", encoding="utf-8")
+        ) as f:
+            writer = _SearchExportWriter(f, export_format)
+            async for results in search.search_pages(
+                user,
+                req_body,
+                page_size=_SEARCH_EXPORT_PAGE_SIZE,
+            ):
+                # transform hits into actual search results export data
+                for hit in results.hits:
+                    text = texts_by_ids.get(str(hit.text_id))
+                    if not text:  # pragma: no cover # should not happen
+                        continue
+                    writer.write(
+                        {
+                            "location": hit.full_label,
+                            "text": text.title,
+                            "level": hit.level,
+                            "levelLabel": pick_translation(
+                                text.levels[hit.level], locale
+                            ),
+                            "position": hit.position,
+                            "score": hit.score,
+                            "highlights": {
+                                resource_titles_by_ids.get(hl_res_id, hl_res_id): hl
+                                for hl_res_id, hl in hit.highlight.items()
+                                if hl
+                            },
+                        }
+                    )
+            writer.close()
+    except Exception as e:  # pragma: no cover
+        tempfile_path.unlink(missing_ok=True)
+        raise e
 
     # prepare download file info
-    fmt = {
-        "extension": "json",
-        "mimetype": "application/json",
-    }
+    fmt = search_exp_fmt_info[export_format]
     settings = await get_state()
     pf_title_safe = re.sub(r"[^a-zA-Z0-9]", "_", settings.platform_name).lower()
     filename = f"{pf_title_safe}_search_{search_id}.{fmt['extension']}"
 
     return {
-        "filename": filename,
+        "filename": f"{filename}.gz" if compress else filename,
         "artifact": tempfile_name,
-        "mimetype": fmt["mimetype"],
+        "mimetype": "application/gzip" if compress else fmt["mimetype"],
     }
 
 
+class _SearchExportWriter:
+    """Writes search results export data to a file, one hit at a time"""
+
+    _CSV_COLUMNS = [
+        "location",
+        "text",
+        "level",
+        "levelLabel",
+        "position",
+        "score",
+        "highlights",
+    ]
+
+    def __init__(self, f: TextIO, export_format: SearchExportFormat):
+        self._f = f
+        self._format = export_format
+        self._count = 0
+        if export_format == "csv":
+            self._csv_writer = csv.writer(
+                f,
+                dialect="excel",
+                quoting=csv.QUOTE_MINIMAL,
+            )
+            self._csv_writer.writerow(self._CSV_COLUMNS)
+        elif export_format == "json":
+            f.write("[")
+
+    def write(self, hit: dict[str, Any]) -> None:
+        if self._format == "csv":
+            self._csv_writer.writerow(
+                [
+                    *[hit[col] for col in self._CSV_COLUMNS[:-1]],
+                    "\n".join(
+                        f"{res_title}: {' ... '.join(hl)}"
+                        for res_title, hl in hit["highlights"].items()
+                    ),
+                ]
+            )
+        elif self._format == "ndjson":
+            self._f.write(json.dumps(hit))
+            self._f.write("\n")
+        else:
+            if self._count:
+                self._f.write(",")
+            self._f.write(json.dumps(hit))
+        self._count += 1
+
+    def close(self) -> None:
+        if self._format == "json":
+            self._f.write("]")
+
+
 @router.post(
     "/export",
     status_code=status.HTTP_202_ACCEPTED,
@@ -188,6 +247,20 @@ async def export_search_results(
     ],
     request: Request,
     cfg: ConfigDep,
+    export_format: Annotated[
+        SearchExportFormat,
+        Query(
+            alias="format",
+            description="Export format",
+        ),
+    ] = "json",
+    compress: Annotated[
+        bool,
+        Query(
+            alias="gzip",
+            description="Whether to compress the export file using gzip",
+        ),
+    ] = False,
 ) -> tasks.TaskDocument:
     return await tasks.create_task(
         _export_search_results_task,
@@ -200,5 +273,7 @@ async def export_search_results(
             "user": user,
             "cfg": cfg,
             "req_body": body,
+            "export_format": export_format,
+            "compress": compress,
         },
     )
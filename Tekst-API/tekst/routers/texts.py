@@ -19,11 +19,20 @@ from fastapi.responses import FileResponse
 from pydantic import TypeAdapter, ValidationError
 from starlette.background import BackgroundTask
 
-from tekst import errors, tasks
+from tekst import (
+    access_cache,
+    aggregations,
+    errors,
+    executor,
+    platform_cache,
+    tasks,
+    text_structure,
+)
 from tekst.auth import OptionalUserDep, SuperuserDep
 from tekst.i18n import Translations
 from tekst.logs import log
 from tekst.models.content import ContentBaseDocument
+from tekst.models.index_journal import IndexJournalEntryDocument
 from tekst.models.location import LocationDocument
 from tekst.models.resource import ResourceBaseDocument
 from tekst.models.text import (
@@ -36,7 +45,7 @@ from tekst.models.text import (
     TextUpdate,
 )
 from tekst.state import get_state
-from tekst.utils import get_temp_dir
+from tekst.utils import ensure, get_temp_dir
 
 
 router = APIRouter(
@@ -78,7 +87,10 @@ async def create_text(su: SuperuserDep, text: TextCreate) -> TextRead:
     ).exists():
         raise errors.E_409_TEXT_SAME_TITLE_OR_SLUG
     text.default_level = len(text.levels) - 1
-    return await TextDocument.model_from(text).create()
+    text_doc = await TextDocument.model_from(text).create()
+    await access_cache.invalidate()
+    await platform_cache.invalidate()
+    return text_doc
 
 
 @router.get(
@@ -267,6 +279,8 @@ async def import_text_structure(
                 c["parent_id"] = inserted_ids[i]
             children += children_temp
         locations = children
+    await text_structure.update_location_paths(text_id)
+    await text_structure.structure_changed(text_id)
 
 
 async def _update_text_structure_task(
@@ -323,10 +337,19 @@ async def _update_text_structure_task(
 
     # save modified documents
     await LocationDocument.replace_many(updated_docs)
-    # mark the text's index as out-of-date
+    # record the change in the index journal and mark the text's index as out-of-date
+    if last_text_id:
+        await IndexJournalEntryDocument.record(last_text_id)
     await TextDocument.find_one(Eq(TextDocument.id, last_text_id)).update(
         Set({TextDocument.index_utd: False})
     )
+    await platform_cache.invalidate()
+    if last_text_id:
+        await text_structure.update_location_paths(
+            last_text_id,
+            location_ids=[ensure(doc.id) for doc in updated_docs],
+        )
+        await text_structure.structure_changed(last_text_id)
 
 
 @router.patch(
@@ -367,7 +390,7 @@ async def update_text_structure(
 
     # validate JSON
     try:
-        location_updates = json.loads(await file.read())
+        location_updates = await executor.run_cpu_bound(json.loads, await file.read())
     except Exception as _:
         raise errors.E_400_UPLOAD_INVALID_JSON
     # check if we got a list (at least)
@@ -431,6 +454,7 @@ async def insert_level(
     if text_doc.default_level >= index:
         text_doc.default_level += 1
     await text_doc.save()
+    await platform_cache.invalidate()
 
     # update all existing resources with level >= index
     await ResourceBaseDocument.find(
@@ -497,6 +521,8 @@ async def insert_level(
                 LocationDocument.parent_id == parent_level_location.id,
             ).set({LocationDocument.parent_id: dummy_location.id})
 
+    await text_structure.update_location_paths(text_id)
+    await text_structure.structure_changed(text_id)
     return text_doc
 
 
@@ -567,11 +593,18 @@ async def delete_level(
                 target_child.parent_id = target_level_location.parent_id
                 await target_child.save()
 
-    # delete all existing resources with level == index
-    await ResourceBaseDocument.find(
+    # delete all existing resources with level == index (and their aggregations data)
+    level_resources = await ResourceBaseDocument.find(
         ResourceBaseDocument.text_id == text_id,
         ResourceBaseDocument.level == level,
         with_children=True,
+    ).to_list()
+    await aggregations.delete_aggregations(
+        [resource.id for resource in level_resources]
+    )
+    await ResourceBaseDocument.find(
+        In(ResourceBaseDocument.id, [resource.id for resource in level_resources]),
+        with_children=True,
     ).delete()
 
     # update all existing resources with level > index
@@ -590,6 +623,8 @@ async def delete_level(
     await LocationDocument.find(
         LocationDocument.text_id == text_id, LocationDocument.level >= level
     ).inc({ResourceBaseDocument.level: -1})
+    await text_structure.update_location_paths(text_id)
+    await text_structure.structure_changed(text_id)
 
     # update text itself
     text_doc.levels.pop(level)
@@ -608,7 +643,10 @@ async def delete_level(
 
     # mark the text's index as out-of-date
     text_doc.index_utd = False
-    return await text_doc.replace()
+    await IndexJournalEntryDocument.record(text_id)
+    await text_doc.replace()
+    await platform_cache.invalidate()
+    return text_doc
 
 
 @router.delete(
@@ -659,8 +697,18 @@ async def delete_text(
         LocationDocument.text_id == text_id,
     ).delete_many()
 
+    # delete index journal entries for the target text
+    await IndexJournalEntryDocument.find(
+        IndexJournalEntryDocument.text_id == text_id,
+    ).delete_many()
+
+    # delete aggregations data of all resources associated with target text
+    await aggregations.delete_aggregations([resource.id for resource in resources])
+
     # delete text itself
     await text.delete()
+    await access_cache.invalidate()
+    await platform_cache.invalidate()
 
     # check if deleted text was default text, correct if necessary
     pf_state_doc = await get_state()
@@ -714,4 +762,11 @@ async def update_text(
     text = await TextDocument.get(text_id)
     if not text:
         raise errors.E_404_TEXT_NOT_FOUND
-    return await text.apply_updates(updates)
+    loc_delim_before = text.loc_delim
+    text = await text.apply_updates(updates)
+    if text.loc_delim != loc_delim_before:
+        await text_structure.update_location_paths(text_id)
+        await text_structure.structure_changed(text_id)
+    await access_cache.invalidate()
+    await platform_cache.invalidate()
+    return text
@@ -1,18 +1,25 @@
 import asyncio
+import base64
+import binascii
+import json
+import time
 
+from collections.abc import AsyncGenerator, Callable
 from datetime import UTC, datetime
 from typing import Any, Literal
 from uuid import uuid4
 
 from beanie import PydanticObjectId
-from beanie.operators import Eq, In
+from beanie.operators import Eq, In, Set
 from elastic_transport import ObjectApiResponse
-from elasticsearch import AsyncElasticsearch
+from elasticsearch import ApiError, AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
 
-from tekst import tasks
+from tekst import access_cache, change_tracker, errors, executor, platform_cache, tasks
 from tekst.config import TekstConfig, get_config
 from tekst.logs import log, log_op_end, log_op_start
 from tekst.models.content import ContentBaseDocument
+from tekst.models.index_journal import IndexJournalEntryDocument
 from tekst.models.location import LocationDocument
 from tekst.models.resource import ResourceBaseDocument
 from tekst.models.search import (
@@ -28,6 +35,7 @@ from tekst.models.search import (
 from tekst.models.text import TextDocument
 from tekst.models.user import UserRead
 from tekst.resources import resource_types_mgr
+from tekst.search import cache as search_cache
 from tekst.search.templates import (
     IDX_ALIAS,
     IDX_NAME_PATTERN,
@@ -52,6 +60,12 @@ from tekst.utils import ensure
 _cfg: TekstConfig = get_config()
 _es: AsyncElasticsearch | None = None
 
+# number of locations to process at once when populating an index
+_POPULATE_INDEX_LOCATIONS_BATCH_SIZE = 1000
+
+# time to keep a point in time used for cursor-based pagination alive between requests
+_PIT_KEEP_ALIVE = "2m"
+
 
 async def _wait_for_es() -> bool | None:
     global _es
@@ -125,85 +139,70 @@ async def create_indices_task(
     cfg: TekstConfig = _cfg,
     *,
     force: bool = False,
-) -> dict[str, float]:
+    incremental: bool = False,
+) -> dict[str, Any]:
     op_id = log_op_start(
-        f"Create search indices (forced: {force})",
+        f"Create search indices (forced: {force}, incremental: {incremental})",
         level="INFO",
     )
     await _wait_for_es()
     await _setup_index_templates()
+    # write pending changes marking texts' indices as out-of-date
+    await change_tracker.flush()
 
     # get existing search indices
     es: AsyncElasticsearch = await _get_es_client()
     old_idxs = [idx for idx in await es.indices.get(index=IDX_NAME_PATTERN_ANY)]
     utd_idxs = []  # list of indices that are still up to date
 
-    for text in await TextDocument.find_all().to_list():
-        # get names of existing indices for this text
-        old_txt_idxs = [idx for idx in old_idxs if str(text.id) in idx]
-
-        # check if indexing is necessary and if not, remember the index that's still
-        # in use for this text, then continue with the next text
-        if old_txt_idxs and text.index_utd:
-            # indexing is NOT necessary
-            if force:
-                log.debug(f"Index for '{text.title}' is up to date, forcing re-index.")
-            else:
-                log.debug(f"Indexing is not necessary for text '{text.title}'.")
-                utd_idxs.extend(old_txt_idxs)
-                continue
-
-        # collect special mappings and analysis settings for each target resource
-        mappings = {}
-        analysis = {}
-        for resource in await _get_resources(
-            text_ids=[text.id],
-            check_read_access=False,
-        ):
-            if (
-                resource.config.general.searchable_quick
-                or resource.config.general.searchable_adv
-            ):
-                # add resource type-specific mappings
-                add_mappings(
-                    for_resource=resource,
-                    to_mappings=mappings,
-                )
-                # add resource-specific analysis settings
-                add_analysis_settings(
-                    for_resource=resource,
-                    to_analysis=analysis,
-                )
-
-        # create index (index template will be applied!)
-        new_idx_name = f"{IDX_NAME_PREFIX}{text.slug}_{text.id}_{str(uuid4().hex)}"
-        await es.indices.create(
-            index=new_idx_name,
-            aliases={IDX_ALIAS: {}},
-            mappings={"properties": {"resources": {"properties": mappings}}},
-            settings={"index": {"analysis": analysis}},
-        )
-
-        # populate newly created index
-        populate_op_id = log_op_start(
-            f"Index resources for text '{text.title}'",
-            level="INFO",
-        )
-        try:
-            await _populate_index(new_idx_name, text)
-        except Exception as e:  # pragma: no cover
-            log_op_end(populate_op_id, failed=True, failed_msg=str(e))
-            await es.indices.delete(index=new_idx_name)  # delete broken index
-            raise e
-
-        utd_idxs.append(new_idx_name)  # mark created index as "up to date"
-        text.index_utd = True
-        await text.replace()
-        log_op_end(populate_op_id)
+    # prepare per-text progress data to report in the task result
+    texts = await TextDocument.find_all().to_list()
+    progress: dict[str, dict[str, Any]] = {
+        str(text.id): {"text": text.slug, "status": "waiting"} for text in texts
+    }
+    semaphore = asyncio.Semaphore(cfg.es.index_concurrency)
+
+    async def _index_text_limited(text: TextDocument) -> None:
+        text_progress = progress[str(text.id)]
+        async with semaphore:
+            text_progress["status"] = "running"
+            await tasks.update_progress(
+                tasks.TaskType.INDICES_CREATE_UPDATE,
+                {"texts": progress},
+            )
+            t0 = time.perf_counter()
+            mode, txt_utd_idxs = await _index_text(
+                text,
+                [idx for idx in old_idxs if str(text.id) in idx],
+                force=force,
+                incremental=incremental,
+            )
+            utd_idxs.extend(txt_utd_idxs)
+            text_progress["status"] = "done"
+            text_progress["mode"] = mode
+            text_progress["took"] = round(time.perf_counter() - t0, 2)
+            await tasks.update_progress(
+                tasks.TaskType.INDICES_CREATE_UPDATE,
+                {"texts": progress},
+            )
 
-    # delete indices that are no longer in use
-    to_delete = [idx for idx in old_idxs if idx not in utd_idxs]
-    if to_delete:
+    # create/update the indices of multiple texts concurrently
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for text in texts:
+                tg.create_task(_index_text_limited(text))
+    except ExceptionGroup as eg:  # pragma: no cover
+        raise eg.exceptions[0]
+
+    # delete indices that are no longer in use (the old indices
+    # of re-indexed texts have already been deleted at this point)
+    text_ids = [str(text.id) for text in texts]
+    to_delete = [
+        idx
+        for idx in old_idxs
+        if idx not in utd_idxs and not any(txt_id in idx for txt_id in text_ids)
+    ]
+    if to_delete:  # pragma: no cover
         await es.indices.delete(index=to_delete)
 
     # perform initial bogus search on all existing indices (to initialize index stats)
@@ -218,50 +217,374 @@ async def create_indices_task(
     # update last global indexing time
     await update_state(indices_updated_at=datetime.now(UTC))
 
-    return {"took": round(log_op_end(op_id), 2)}
+    # invalidate search results cached for the previous indices
+    await search_cache.bump_index_generation()
+
+    return {
+        "took": round(log_op_end(op_id), 2),
+        "texts": progress,
+    }
+
+
+async def _index_text(
+    text: TextDocument,
+    old_txt_idxs: list[str],
+    *,
+    force: bool = False,
+    incremental: bool = False,
+) -> tuple[Literal["skipped", "incremental", "full"], list[str]]:
+    """
+    Creates/updates the search index for the given text, if necessary.
+    Returns the indexing mode that was used and the names of the
+    text's indices that are in use (up to date) afterwards.
+    """
+    es: AsyncElasticsearch = await _get_es_client()
+
+    # get changes recorded in the index journal for this text
+    journal = await IndexJournalEntryDocument.find(
+        IndexJournalEntryDocument.text_id == text.id
+    ).to_list()
+
+    # check if indexing is necessary and if not, return the index that's still
+    # in use for this text
+    if old_txt_idxs and text.index_utd and not journal:
+        # indexing is NOT necessary
+        if force:
+            log.debug(f"Index for '{text.title}' is up to date, forcing re-index.")
+        else:
+            log.debug(f"Indexing is not necessary for text '{text.title}'.")
+            return "skipped", old_txt_idxs
+
+    # in incremental mode, only update the index documents of the locations
+    # affected by the recorded content changes (if all recorded changes
+    # are content changes and there is exactly one existing index to update)
+    if (
+        incremental
+        and not force
+        and len(old_txt_idxs) == 1
+        and journal
+        and all(entry.location_ids for entry in journal)
+    ):
+        update_op_id = log_op_start(
+            f"Update index for text '{text.title}' incrementally",
+            level="INFO",
+        )
+        try:
+            await _update_index(
+                old_txt_idxs[0],
+                text,
+                location_ids={
+                    loc_id for entry in journal for loc_id in entry.location_ids
+                },
+            )
+        except Exception as e:  # pragma: no cover
+            log_op_end(update_op_id, failed=True, failed_msg=str(e))
+            raise e
+        await _set_index_utd(text, journal)
+        log_op_end(update_op_id)
+        return "incremental", old_txt_idxs
+
+    # collect special mappings and analysis settings for each target resource
+    mappings = {}
+    analysis = {}
+    for resource in await _get_resources(
+        text_ids=[ensure(text.id)],
+        check_read_access=False,
+    ):
+        if (
+            resource.config.general.searchable_quick
+            or resource.config.general.searchable_adv
+        ):
+            # add resource type-specific mappings
+            add_mappings(
+                for_resource=resource,
+                to_mappings=mappings,
+            )
+            # add resource-specific analysis settings
+            add_analysis_settings(
+                for_resource=resource,
+                to_analysis=analysis,
+            )
+
+    # create index (index template will be applied!) – the new index is not added
+    # to the search alias before it is fully populated, so searches won't hit it yet
+    new_idx_name = f"{IDX_NAME_PREFIX}{text.slug}_{text.id}_{str(uuid4().hex)}"
+    await es.indices.create(
+        index=new_idx_name,
+        mappings={"properties": {"resources": {"properties": mappings}}},
+        settings={
+            "index": {
+                "analysis": analysis,
+                # disable refreshes and replicas while bulk loading
+                "refresh_interval": "-1",
+                "number_of_replicas": 0,
+            }
+        },
+    )
+
+    # populate newly created index
+    populate_op_id = log_op_start(
+        f"Index resources for text '{text.title}'",
+        level="INFO",
+    )
+    try:
+        await _populate_index(new_idx_name, text)
+        await _finalize_index(new_idx_name)
+    except Exception as e:  # pragma: no cover
+        log_op_end(populate_op_id, failed=True, failed_msg=str(e))
+        await es.indices.delete(index=new_idx_name)  # delete broken index
+        raise e
+
+    # atomically add the new index to the search alias and remove the text's old
+    # indices, so searches either hit the old or the new index, never both
+    await es.indices.update_aliases(
+        actions=[
+            {"add": {"index": new_idx_name, "alias": IDX_ALIAS}},
+            *[{"remove_index": {"index": idx}} for idx in old_txt_idxs],
+        ]
+    )
+
+    await _set_index_utd(text, journal)
+    log_op_end(populate_op_id)
+    return "full", [new_idx_name]
+
+
+async def _set_index_utd(
+    text: TextDocument,
+    journal: list[IndexJournalEntryDocument],
+) -> None:
+    """
+    Deletes the given (processed) index journal entries and marks the index of the
+    given text as up to date, unless there were changes recorded in the meantime
+    """
+    if journal:
+        await IndexJournalEntryDocument.find(
+            In(IndexJournalEntryDocument.id, [entry.id for entry in journal])
+        ).delete_many()
+    # changes are always recorded in the journal before the text's index is marked
+    # as out-of-date, so there is no way to miss changes made during indexing here
+    if await IndexJournalEntryDocument.find(
+        IndexJournalEntryDocument.text_id == text.id
+    ).exists():
+        return
+    await TextDocument.find_one(Eq(TextDocument.id, text.id)).update(
+        Set({TextDocument.index_utd: True})
+    )
+    await platform_cache.invalidate()
+
+
+async def _update_index(
+    index_name: str,
+    text: TextDocument,
+    location_ids: set[PydanticObjectId],
+) -> None:
+    """
+    Updates the index documents of the given locations and all their descendants
+    (which contain inherited copies of the given locations' contents)
+    in the given existing index
+    """
+    traverse_ids, affected_ids = await _get_affected_locations(location_ids)
+    log.debug(
+        f"Updating {len(affected_ids)} index documents "
+        f"of text '{text.title}' in index {index_name}..."
+    )
+    await _populate_index(
+        index_name,
+        text,
+        traverse_ids=traverse_ids,
+        affected_ids=affected_ids,
+    )
+    es: AsyncElasticsearch = await _get_es_client()
+    await es.indices.refresh(index=index_name)
+
+
+async def _get_affected_locations(
+    location_ids: set[PydanticObjectId],
+) -> tuple[dict[int, set[PydanticObjectId]], set[PydanticObjectId]]:
+    """
+    Returns a tuple of
+
+    - the IDs of all locations that have to be traversed to re-create the index
+      documents of the affected locations (these and all their ancestors),
+      mapped by structure level
+    - the IDs of the locations affected by content changes of the given locations
+      (the given locations themselves and all their descendants)
+    """
+    projection = [{"$project": {"_id": 1, "parent_id": 1, "level": 1}}]
+    traverse_ids: dict[int, set[PydanticObjectId]] = {}
+    affected_ids: set[PydanticObjectId] = set()
+
+    # collect changed locations and their descendants, level by level
+    changed_locs = (
+        await LocationDocument.find(In(LocationDocument.id, list(location_ids)))
+        .aggregate(projection)
+        .to_list()
+    )
+    locs = changed_locs
+    while locs:
+        for loc in locs:
+            affected_ids.add(loc["_id"])
+            traverse_ids.setdefault(loc["level"], set()).add(loc["_id"])
+        locs = (
+            await LocationDocument.find(
+                In(LocationDocument.parent_id, [loc["_id"] for loc in locs])
+            )
+            .aggregate(projection)
+            .to_list()
+        )
+
+    # collect ancestors of changed locations, level by level
+    parent_ids = {loc["parent_id"] for loc in changed_locs if loc.get("parent_id")}
+    while parent_ids:
+        parent_locs = (
+            await LocationDocument.find(In(LocationDocument.id, list(parent_ids)))
+            .aggregate(projection)
+            .to_list()
+        )
+        parent_ids = set()
+        for loc in parent_locs:
+            traverse_ids.setdefault(loc["level"], set()).add(loc["_id"])
+            if loc.get("parent_id"):
+                parent_ids.add(loc["parent_id"])
+
+    return traverse_ids, affected_ids
+
+
+async def _finalize_index(index_name: str) -> None:
+    """
+    Restores the regular settings of an index that were disabled for bulk loading,
+    then refreshes and force-merges the index
+    """
+    es: AsyncElasticsearch = await _get_es_client()
+    await es.indices.put_settings(
+        index=index_name,
+        settings={
+            "index": {
+                "refresh_interval": None,  # reset to default
+                "number_of_replicas": IDX_TEMPLATE["settings"]["index"][
+                    "number_of_replicas"
+                ],
+            }
+        },
+    )
+    await es.indices.refresh(index=index_name)
+    # force-merging large indices may take a while, so we don't use a timeout here
+    await es.options(request_timeout=None).indices.forcemerge(
+        index=index_name,
+        max_num_segments=1,
+    )
 
 
 async def create_indices(
     *,
     user: UserRead | None = None,
     force: bool = False,
+    incremental: bool = False,
 ) -> tasks.TaskDocument:
-    log.info(f"Creating search indices (forced: {force}) ...")
+    log.info(
+        f"Creating search indices (forced: {force}, incremental: {incremental})..."
+    )
     # create index task
     return await tasks.create_task(
         create_indices_task,
         tasks.TaskType.INDICES_CREATE_UPDATE,
         target_id=tasks.TaskType.INDICES_CREATE_UPDATE.value,
         user_id=user.id if user else None,
-        task_kwargs={"force": force},
+        task_kwargs={"force": force, "incremental": incremental},
     )
 
 
 async def _populate_index(
     index_name: str,
     text: TextDocument,
+    *,
+    traverse_ids: dict[int, set[PydanticObjectId]] | None = None,
+    affected_ids: set[PydanticObjectId] | None = None,
 ) -> None:
+    """
+    Populates the given index with documents for all locations of the given text
+    (or only for the given affected locations, see `_generate_index_actions`).
+    Index documents are generated from the DB by a producer that feeds chunks of
+    documents (limited by a configured byte budget) into a bounded queue. These are
+    concurrently drained by a number of bulk indexing workers.
+    """
     es: AsyncElasticsearch = await _get_es_client()
+    workers_count = _cfg.es.index_bulk_workers
+    max_chunk_bytes = _cfg.es.index_bulk_max_bytes
+    queue: asyncio.Queue[list[dict[str, Any]] | None] = asyncio.Queue(
+        maxsize=workers_count * 2
+    )
 
-    async def _bulk_index(
-        reqest_body: list[dict[str, Any]],
-        req_no: int | None = None,
-    ) -> None:
-        resp = await es.bulk(
-            body=reqest_body,
-            timeout=f"{_cfg.es.timeout_general_s}s",
-            refresh="wait_for",
-        )
-        if resp.get("errors", False):  # pragma: no cover
-            for error in resp["items"]:
-                log.error(str(error))
-            raise RuntimeError(f"Failed to index documents for text '{text.title}'.")
-        req_no_str = f"#{req_no} " if req_no is not None else ""
-        log.debug(f"Bulk index request {req_no_str} [{resp.get('took', '???')}ms]")
+    async def _produce() -> None:
+        chunk = []
+        chunk_bytes = 0
+        async for action in _generate_index_actions(
+            index_name,
+            text,
+            traverse_ids=traverse_ids,
+            affected_ids=affected_ids,
+        ):
+            action_bytes = len(json.dumps(action["_source"]).encode())
+            chunk_full = chunk_bytes + action_bytes > max_chunk_bytes
+            if chunk and chunk_full:  # pragma: no cover
+                await queue.put(chunk)
+                chunk = []
+                chunk_bytes = 0
+            chunk.append(action)
+            chunk_bytes += action_bytes
+        if chunk:
+            await queue.put(chunk)
+        # signal end of data to all workers
+        for _ in range(workers_count):
+            await queue.put(None)
+
+    async def _consume(worker_no: int) -> None:
+        while (chunk := await queue.get()) is not None:
+            t0 = time.perf_counter()
+            errors_count = 0
+            async for ok, item in async_streaming_bulk(
+                es,
+                chunk,
+                chunk_size=len(chunk),
+                max_chunk_bytes=max_chunk_bytes,
+                raise_on_error=False,
+                max_retries=3,
+                timeout=f"{_cfg.es.timeout_general_s}s",
+            ):
+                if not ok:  # pragma: no cover
+                    errors_count += 1
+                    log.error(str(item))
+            if errors_count:  # pragma: no cover
+                raise RuntimeError(
+                    f"Failed to index {errors_count} documents for text '{text.title}'."
+                )
+            took = max(time.perf_counter() - t0, 1e-6)
+            log.debug(
+                f"Bulk index worker #{worker_no}: {len(chunk)} docs "
+                f"in {took * 1000:.0f}ms ({len(chunk) / took:.0f} docs/s)"
+            )
 
-    bulk_index_max_size = 200
-    bulk_index_body = []
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_produce())
+            for worker_no in range(workers_count):
+                tg.create_task(_consume(worker_no + 1))
+    except ExceptionGroup as eg:  # pragma: no cover
+        raise eg.exceptions[0]
 
+
+async def _generate_index_actions(
+    index_name: str,
+    text: TextDocument,
+    *,
+    traverse_ids: dict[int, set[PydanticObjectId]] | None = None,
+    affected_ids: set[PydanticObjectId] | None = None,
+) -> AsyncGenerator[dict[str, Any]]:
+    """
+    Yields bulk index actions for all locations of the given text. If `traverse_ids`
+    (location IDs by level) is given, only these locations are processed. If
+    `affected_ids` is given, only actions for these locations are yielded.
+    """
     target_resource_ids = [
         res.id
         for res in await _get_resources(
@@ -272,102 +595,161 @@ async def _populate_index(
         and not res.patch_for
     ]
 
-    # Initialize stack with all level 0 locations (sorted) of the current text.
-    # Each item on the stack is a tuple containing
-    # (0) the location itself as LocationDocument
-    # (1) location labels from the root level up to the current location as list[str],
-    stack = [
-        (location, [location.label])
-        for location in await LocationDocument.find(
-            LocationDocument.text_id == text.id,
-            LocationDocument.level == 0,
-        )
-        .sort(+LocationDocument.position)
-        .to_list()
-    ]
+    # The text structure is traversed level by level. For each level, all locations
+    # are read from a single sorted cursor and processed in batches. The contents of
+    # all locations in a batch are fetched using a single query. Full labels and
+    # index doc contents of the locations on the previous level are kept in memory
+    # so they can be resolved for the child locations without additional queries.
+    parent_labels: dict[PydanticObjectId, str] = {}
+    parent_idx_contents: dict[PydanticObjectId, dict[str, Any]] = {}
+
+    for level in range(len(text.levels)):
+        if traverse_ids is not None and not traverse_ids.get(level):
+            break
+        is_last_level = level >= len(text.levels) - 1
+        level_labels: dict[PydanticObjectId, str] = {}
+        level_idx_contents: dict[PydanticObjectId, dict[str, Any]] = {}
+
+        async for locations in _iter_level_batches(
+            text_id=text.id,
+            level=level,
+            batch_size=_POPULATE_INDEX_LOCATIONS_BATCH_SIZE,
+            location_ids=traverse_ids.get(level) if traverse_ids else None,
+        ):
+            idx_docs_by_loc = await _get_content_index_docs_by_location(
+                location_ids=[loc.id for loc in locations],
+                resource_ids=target_resource_ids,
+            )
 
-    # abort if initial stack is empty
-    if not stack:  # pragma: no cover
-        return
+            for loc in locations:
+                # compose full label using the cached full label of the parent
+                full_label = (
+                    text.loc_delim.join([parent_labels[loc.parent_id], loc.label])
+                    if loc.parent_id in parent_labels
+                    else loc.label
+                )
 
-    # cache mapping of location IDs to index doc contents
-    # for re-use in child location index docs
-    parent_idx_contents: dict[str, dict[str, Any]] = {}
-
-    # keep track of number of bulk index requests
-    bulk_req_count = 0
-
-    while len(stack):
-        loc, labels = stack.pop(0)
-        loc_id_str = str(loc.id)
-
-        # create index document for this location
-        loc_idx_doc = {
-            "label": loc.label,
-            "full_label": text.loc_delim.join(labels),
-            "text_id": str(loc.text_id),
-            "level": loc.level,
-            "position": loc.position,
-            "default_level": loc.level == text.default_level,
-            "resources": {},
-        }
+                # create index document for this location
+                loc_idx_doc = {
+                    "label": loc.label,
+                    "full_label": full_label,
+                    "text_id": str(loc.text_id),
+                    "level": loc.level,
+                    "position": loc.position,
+                    "default_level": loc.level == text.default_level,
+                    "resources": {},
+                }
+
+                # add parent contents
+                if loc.parent_id in parent_idx_contents:
+                    loc_idx_doc["resources"].update(parent_idx_contents[loc.parent_id])
+
+                # add data for each content for this location
+                loc_idx_doc["resources"].update(idx_docs_by_loc.get(loc.id, {}))
+
+                # cache full label and contents for re-use in child location index
+                # docs (only if the current location's level is < max level,
+                # otherwise there won't be any child locations we need them for)
+                # but set "native" to False for the contents, as these contents
+                # aren't native to child locations
+                if not is_last_level:
+                    level_labels[loc.id] = full_label
+                    level_idx_contents[loc.id] = {
+                        res_id: {**res_idx_doc, "native": False}
+                        for res_id, res_idx_doc in loc_idx_doc["resources"].items()
+                    }
+
+                if affected_ids is not None and loc.id not in affected_ids:
+                    continue
 
-        # add parent contents
-        if str(loc.parent_id) in parent_idx_contents:
-            loc_idx_doc["resources"].update(parent_idx_contents[str(loc.parent_id)])
-
-        # add data for each content for this location
-        for content in await ContentBaseDocument.find(
-            Eq(ContentBaseDocument.location_id, loc.id),
-            In(ContentBaseDocument.resource_id, target_resource_ids),
-            Eq(ContentBaseDocument.archived, False),
-            with_children=True,
-        ).to_list():
-            # add resource level and content to location index document
-            loc_idx_doc["resources"][str(content.resource_id)] = resource_types_mgr.get(
-                content.resource_type
-            ).index_doc(content=content, native=True)
-
-        # add location contents to cached parent contents
-        # (only if the current location's level is < max level,
-        # otherwise there won't be any child locations we need that content for)
-        # but set "native" to False, as these contents aren't native to child locations
-        if loc.level < len(text.levels) - 1:
-            parent_idx_contents[loc_id_str] = {}
-            for res_id in loc_idx_doc["resources"]:
-                parent_idx_contents[loc_id_str][res_id] = {
-                    **loc_idx_doc["resources"][res_id],
-                    "native": False,
+                yield {
+                    "_index": index_name,
+                    "_id": str(loc.id),
+                    "_source": loc_idx_doc,
                 }
 
-        # add index document to bulk index request body
-        bulk_index_body.append({"index": {"_index": index_name, "_id": loc_id_str}})
-        bulk_index_body.append(loc_idx_doc)
+        # data of the current level is now parent data for the next level
+        parent_labels = level_labels
+        parent_idx_contents = level_idx_contents
 
-        # check bulk request body size, fire bulk request if necessary
-        if len(bulk_index_body) / 2 >= bulk_index_max_size:  # pragma: no cover
-            bulk_req_count += 1
-            await _bulk_index(bulk_index_body, bulk_req_count)
-            bulk_index_body = []
 
-        # add all child locations to the processing stack
-        stack.extend(
-            [
-                (
-                    child,  # the target location document
-                    labels + [child.label],  # all the labels
-                )
-                for child in await LocationDocument.find(
-                    LocationDocument.parent_id == loc.id,
-                )
-                .sort(+LocationDocument.position)
-                .to_list()
-            ]
+async def _iter_level_batches(
+    *,
+    text_id: PydanticObjectId,
+    level: int,
+    batch_size: int,
+    location_ids: set[PydanticObjectId] | None = None,
+) -> AsyncGenerator[list[LocationDocument]]:
+    """
+    Yields batches of the locations on the given level of the given text
+    (optionally constrained to the given location IDs),
+    sorted by position, read from a single DB cursor
+    """
+    batch = []
+    async for location in LocationDocument.find(
+        LocationDocument.text_id == text_id,
+        LocationDocument.level == level,
+        In(LocationDocument.id, list(location_ids)) if location_ids else {},
+    ).sort(+LocationDocument.position):
+        batch.append(location)
+        if len(batch) >= batch_size:  # pragma: no cover
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _get_content_index_docs_by_location(
+    *,
+    location_ids: list[PydanticObjectId],
+    resource_ids: list[PydanticObjectId],
+) -> dict[PydanticObjectId, dict[str, dict[str, Any]]]:
+    """
+    Returns the index docs for the non-archived contents of the given resources
+    for all the given locations (fetched using a single query), mapped by location ID
+    and resource ID. The raw contents data is turned into index docs by the executor.
+    """
+    idx_docs_by_loc: dict[PydanticObjectId, dict[str, dict[str, Any]]] = {}
+    if not location_ids or not resource_ids:  # pragma: no cover
+        return idx_docs_by_loc
+    contents_data = await (
+        ContentBaseDocument.get_pymongo_collection()
+        .find(
+            {
+                "location_id": {"$in": location_ids},
+                "resource_id": {"$in": resource_ids},
+                "archived": False,
+            }
         )
+        .to_list()
+    )
+    for location_id, resource_id, idx_doc in await executor.run_cpu_bound(
+        _build_content_index_docs,
+        contents_data,
+    ):
+        idx_docs_by_loc.setdefault(location_id, {})[str(resource_id)] = idx_doc
+    return idx_docs_by_loc
 
-    # index the remaining documents
-    await _bulk_index(bulk_index_body, bulk_req_count + 1)
-    bulk_index_body = []
+
+def _build_content_index_docs(
+    contents_data: list[dict[str, Any]],
+) -> list[tuple[PydanticObjectId, PydanticObjectId, dict[str, Any]]]:
+    """
+    Validates the given raw contents data and builds the index doc for each content.
+    Returns tuples of location ID, resource ID and index doc for each content.
+    """
+    idx_docs = []
+    for content_data in contents_data:
+        resource_type = resource_types_mgr.get(content_data["resource_type"])
+        content = resource_type.content_model().model_validate(content_data)
+        idx_docs.append(
+            (
+                content.location_id,
+                content.resource_id,
+                resource_type.index_doc(content=content, native=True),
+            )
+        )
+    return idx_docs
 
 
 async def _get_mapped_fields_count(index: str) -> int:
@@ -429,6 +811,36 @@ async def _get_resources(
     Returns a constrained list of target resources for a search request,
     based on the requesting user's permissions, target texts and publication status.
     """
+    if check_read_access:
+        # the resources readable by a user only change on writes to resources, texts
+        # or the platform state, so they're cached per permission scope
+        return list(
+            await access_cache.memoized(
+                (
+                    "search_resources",
+                    access_cache.permission_scope(user),
+                    tuple(sorted(str(txt_id) for txt_id in text_ids or [])),
+                ),
+                lambda: _query_resources(
+                    user=user,
+                    text_ids=text_ids,
+                    check_read_access=True,
+                ),
+            )
+        )
+    return await _query_resources(
+        user=user,
+        text_ids=text_ids,
+        check_read_access=False,
+    )
+
+
+async def _query_resources(
+    *,
+    user: UserRead | None,
+    text_ids: list[PydanticObjectId] | None,
+    check_read_access: bool,
+) -> list[ResourceBaseDocument]:
     state = await get_state()
     # prepare DB query restrictions
     texts_restr = In(ResourceBaseDocument.text_id, text_ids) if text_ids else {}
@@ -455,6 +867,7 @@ async def _search_quick(
     user_query: str | None = None,
     settings_general: GeneralSearchSettings = GeneralSearchSettings(),
     settings_quick: QuickSearchSettings = QuickSearchSettings(),
+    size: int | None = None,
 ) -> SearchResults:
     # get (pre-)selection of target resources
     target_resources = await _get_resources(
@@ -512,21 +925,13 @@ async def _search_quick(
     log.debug(f"Running ES query: {es_query}")
 
     # perform the search
-    es: AsyncElasticsearch = await _get_es_client()
-    return SearchResults.from_es_results(
-        results=await es.search(
-            index=IDX_ALIAS,
-            query=es_query,
-            highlight={
-                "fields": [{field_path: {}} for _, field_path in fields],
-            },
-            from_=settings_general.pagination.es_from(),
-            size=settings_general.pagination.es_size(),
-            track_scores=True,
-            sort=SORTING_PRESETS.get(settings_general.sorting_preset or "relevance"),
-            source={"includes": QUERY_SOURCE_INCLUDES},
-            timeout=_cfg.es.timeout_search_s,
-        ),
+    return await _run_search(
+        query=es_query,
+        highlight={
+            "fields": [{field_path: {}} for _, field_path in fields],
+        },
+        settings_general=settings_general,
+        size=size,
     )
 
 
@@ -535,6 +940,7 @@ async def _search_advanced(
     queries: list[ResourceSearchQuery],
     settings_general: GeneralSearchSettings = GeneralSearchSettings(),
     settings_advanced: AdvancedSearchSettings = AdvancedSearchSettings(),
+    size: int | None = None,
 ) -> SearchResults:
     accessible_resources_by_id = {
         str(res.id): res for res in await _get_resources(user=user)
@@ -631,42 +1037,197 @@ async def _search_advanced(
     log.debug(f"Running ES query: {es_query}")
 
     # perform the search
+    return await _run_search(
+        query=es_query,
+        highlight={"fields": {"*": {}}},
+        settings_general=settings_general,
+        size=size,
+        highlights_generators=highlights_generators,
+    )
+
+
+def _encode_cursor(pit_id: str, search_after: list[Any]) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps({"pit": pit_id, "after": search_after}).encode()
+    ).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, list[Any]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(data["pit"]), list(data["after"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise errors.E_400_INVALID_SEARCH_CURSOR
+
+
+def _is_invalid_pit_error(e: ApiError) -> bool:
+    """
+    Returns whether the given error means that the point in time (PIT) used by a
+    search doesn't exist (anymore, e.g. because it expired) or its ID is invalid
+    """
+    if e.status_code == 404:
+        return True
+    error = e.body.get("error") if isinstance(e.body, dict) else None
+    if not isinstance(error, dict):  # pragma: no cover
+        return False
+    return any(
+        cause.get("type") == "search_context_missing_exception"
+        or (
+            cause.get("type") == "illegal_argument_exception"
+            and str(cause.get("reason", "")).startswith("invalid id")
+        )
+        for cause in [error, *error.get("root_cause", [])]
+    )
+
+
+async def _run_search(
+    *,
+    query: dict[str, Any],
+    highlight: dict[str, Any],
+    settings_general: GeneralSearchSettings,
+    size: int | None = None,
+    highlights_generators: dict[str, Callable[[dict[str, Any]], list[str]]]
+    | None = None,
+) -> SearchResults:
+    """
+    Runs the given search query, either using offset-based pagination or,
+    if a cursor is passed, using a point in time (PIT) and `search_after`
+    """
     es: AsyncElasticsearch = await _get_es_client()
+    pagination = settings_general.pagination
+    size = size or pagination.es_size()
+    sort = SORTING_PRESETS.get(settings_general.sorting_preset or "relevance")
+    search_kwargs: dict[str, Any] = {
+        "query": query,
+        "highlight": highlight,
+        "size": size,
+        "track_scores": True,
+        "source": {"includes": QUERY_SOURCE_INCLUDES},
+        "timeout": _cfg.es.timeout_search_s,
+    }
+
+    # offset-based pagination
+    if pagination.cursor is None:
+        return SearchResults.from_es_results(
+            results=await es.search(
+                index=IDX_ALIAS,
+                from_=pagination.es_from(),
+                sort=sort,
+                **search_kwargs,
+            ),
+            highlights_generators=highlights_generators,
+        )
+
+    # cursor-based pagination: start a new point in time or continue an existing one
+    if pagination.cursor:
+        pit_id, search_after = _decode_cursor(pagination.cursor)
+    else:
+        pit_id = (
+            await es.open_point_in_time(
+                index=IDX_ALIAS,
+                keep_alive=_PIT_KEEP_ALIVE,
+            )
+        )["id"]
+        search_after = None
+
+    try:
+        results = await es.search(
+            pit={"id": pit_id, "keep_alive": _PIT_KEEP_ALIVE},
+            search_after=search_after,
+            # search requests using a PIT get an implicit tiebreaker sort
+            # on the internal shard document ID, so paging is stable
+            sort=sort or ["_score"],
+            **search_kwargs,
+        )
+    except ApiError as e:
+        if not pagination.cursor:
+            # close the PIT opened for this search, as it won't be used anymore
+            try:
+                await es.close_point_in_time(id=pit_id)
+            except Exception as close_error:  # pragma: no cover
+                log.warning(f"Could not close point in time: {close_error}")
+        elif _is_invalid_pit_error(e):
+            raise errors.E_400_INVALID_SEARCH_CURSOR
+        raise
+
+    # if this is the last page, close the PIT, otherwise return a cursor
+    hits = results["hits"]["hits"]
+    if len(hits) < size:
+        await es.close_point_in_time(id=results["pit_id"])
+        cursor = None
+    else:
+        cursor = _encode_cursor(results["pit_id"], hits[-1]["sort"])
+
     return SearchResults.from_es_results(
-        results=await es.search(
-            index=IDX_ALIAS,
-            query=es_query,
-            highlight={"fields": {"*": {}}},
-            from_=settings_general.pagination.es_from(),
-            size=settings_general.pagination.es_size(),
-            track_scores=True,
-            sort=SORTING_PRESETS.get(settings_general.sorting_preset or "relevance"),
-            source={"includes": QUERY_SOURCE_INCLUDES},
-            timeout=_cfg.es.timeout_search_s,
-        ),
+        results=results,
         highlights_generators=highlights_generators,
+        cursor=cursor,
     )
 
 
 async def search(
     user: UserRead | None,
     body: QuickSearchRequestBody | AdvancedSearchRequestBody,
+    *,
+    size: int | None = None,
 ) -> SearchResults:
+    # look up cached results for this request
+    # (results of cursor-based searches depend on the state of their PIT)
+    cache_key = None
+    if (
+        search_cache.is_enabled()
+        and size is None
+        and body.settings_general.pagination.cursor is None
+    ):
+        cache_key = search_cache.make_key(
+            body,
+            [str(res.id) for res in await _get_resources(user=user)],
+            await search_cache.get_index_generation(),
+        )
+        if (results := await search_cache.get(cache_key)) is not None:
+            return results
+
     if isinstance(body, QuickSearchRequestBody):
-        return await _search_quick(
+        results = await _search_quick(
             user=user,
             user_query=body.query,
             settings_general=body.settings_general,
             settings_quick=body.settings_quick,
+            size=size,
         )
-    elif isinstance(body, AdvancedSearchRequestBody):
-        return await _search_advanced(
+    else:
+        results = await _search_advanced(
             user=user,
             queries=body.queries,
             settings_general=body.settings_general,
             settings_advanced=body.settings_advanced,
+            size=size,
         )
 
+    if cache_key is not None:
+        await search_cache.put(cache_key, results)
+    return results
+
+
+async def search_pages(
+    user: UserRead | None,
+    body: QuickSearchRequestBody | AdvancedSearchRequestBody,
+    *,
+    page_size: int = 1000,
+) -> AsyncGenerator[SearchResults]:
+    """
+    Yields all pages of results for the given search request, using cursor-based
+    pagination (so there is no limit to the number of results)
+    """
+    body = body.model_copy(deep=True)
+    body.settings_general.pagination.cursor = ""
+    while True:
+        results = await search(user, body, size=page_size)
+        yield results
+        if not results.cursor:
+            break
+        body.settings_general.pagination.cursor = results.cursor
+
 
 async def search_nearest_content_location(
     *,
@@ -674,7 +1235,6 @@ async def search_nearest_content_location(
     location: LocationDocument,
     direction: Literal["before", "after"],
 ) -> LocationDocument | None:
-    text = ensure(await TextDocument.get(resource.text_id))
     query = {
         "bool": {
             "must": [
@@ -687,13 +1247,16 @@ async def search_nearest_content_location(
                     }
                 },
             ],
-            "filter": [{"term": {"level": location.level}}],
+            "filter": [
+                {"term": {"text_id": str(resource.text_id)}},
+                {"term": {"level": location.level}},
+            ],
         }
     }
     sort = {"position": {"order": "desc" if direction == "before" else "asc"}}
     es: AsyncElasticsearch = await _get_es_client()
     results = await es.search(
-        index=f"{IDX_NAME_PREFIX}{text.slug}_*",
+        index=IDX_ALIAS,
         query=query,
         track_scores=False,
         sort=sort,
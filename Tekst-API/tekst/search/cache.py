@@ -0,0 +1,160 @@
+import hashlib
+import json
+import time
+
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import UTC, datetime, timedelta
+
+from beanie.operators import Eq, Set
+from pymongo.errors import DuplicateKeyError
+
+from tekst import change_tracker
+from tekst.config import TekstConfig, get_config
+from tekst.counters import counter_get, counter_incr
+from tekst.models.search import (
+    AdvancedSearchRequestBody,
+    QuickSearchRequestBody,
+    SearchResults,
+)
+from tekst.models.search_cache import SearchCacheEntryDocument
+
+
+_cfg: TekstConfig = get_config()
+
+# ID of the counter holding the current search index generation
+_GENERATION_COUNTER_ID = "search_index_generation"
+
+# interval in seconds after which the search index generation is checked again
+# (to pick up index updates done by other API workers)
+_GENERATION_CHECK_INTERVAL_S = 1.0
+
+# in-process LRU cache mapping cache keys to tuples of (expiry time, results)
+_local: OrderedDict[str, tuple[float, SearchResults]] = OrderedDict()
+_generation: int | None = None
+_generation_checked_at: float = 0.0
+
+
+def is_enabled() -> bool:
+    return _cfg.es.search_cache_size > 0
+
+
+def clear() -> None:
+    """Clears the cached search results and index generation of this API worker"""
+    global _generation
+    _local.clear()
+    _generation = None
+
+
+async def get_index_generation() -> int:
+    """
+    Returns the current search index generation. Index updates done by other
+    API workers are picked up with a delay of at most
+    `_GENERATION_CHECK_INTERVAL_S` seconds.
+    """
+    global _generation, _generation_checked_at
+    if (
+        _generation is None
+        or time.monotonic() - _generation_checked_at >= _GENERATION_CHECK_INTERVAL_S
+    ):
+        _generation = await counter_get(_GENERATION_COUNTER_ID)
+        _generation_checked_at = time.monotonic()
+    return _generation
+
+
+async def bump_index_generation() -> None:
+    """
+    Increments the search index generation, which renders all
+    search results cached for previous generations invalid
+    """
+    global _generation
+    await counter_incr(_GENERATION_COUNTER_ID)
+    _generation = None
+    _local.clear()
+    await SearchCacheEntryDocument.delete_all()
+
+
+def make_key(
+    body: QuickSearchRequestBody | AdvancedSearchRequestBody,
+    resource_ids: list[str],
+    generation: int,
+) -> str:
+    """
+    Returns a cache key for a search request, based on the canonical form of the
+    request body, the resources readable for the requesting user
+    and the current search index generation
+    """
+    body_data = body.model_dump(mode="json")
+    # the order of the target texts of a quick search doesn't affect the results
+    if isinstance(body, QuickSearchRequestBody) and body_data["settings_quick"].get(
+        "texts"
+    ):
+        body_data["settings_quick"]["texts"].sort()
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "body": body_data,
+                "resources": sorted(resource_ids),
+                "generation": generation,
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        ).encode()
+    ).hexdigest()
+
+
+async def get(key: str) -> SearchResults | None:
+    """Returns the cached search results for the given key, if there are any"""
+    results = None
+    cached = _local.get(key)
+    if cached and cached[0] > time.monotonic():
+        _local.move_to_end(key)
+        results = cached[1]
+    else:
+        _local.pop(key, None)
+        if _cfg.es.search_cache_shared:
+            entry = await SearchCacheEntryDocument.find_one(
+                Eq(SearchCacheEntryDocument.key, key),
+                SearchCacheEntryDocument.expires_at > datetime.now(UTC),
+            )
+            if entry:
+                results = SearchResults.model_validate(entry.results)
+                _put_local(key, results)
+    # the cache stats are written along with the other pending changes
+    await change_tracker.counter_incr(
+        "search_cache_hits" if results is not None else "search_cache_misses"
+    )
+    return results
+
+
+async def put(key: str, results: SearchResults) -> None:
+    """Stores search results in the cache"""
+    _put_local(key, results)
+    if not _cfg.es.search_cache_shared:
+        return
+    expires_at = datetime.now(UTC) + timedelta(seconds=_cfg.es.search_cache_ttl_s)
+    results_data = results.model_dump(mode="json")
+    # another worker might cache the same results concurrently
+    with suppress(DuplicateKeyError):
+        await SearchCacheEntryDocument.find_one(
+            Eq(SearchCacheEntryDocument.key, key),
+        ).upsert(
+            Set(
+                {
+                    SearchCacheEntryDocument.results: results_data,
+                    SearchCacheEntryDocument.expires_at: expires_at,
+                }
+            ),
+            on_insert=SearchCacheEntryDocument(
+                key=key,
+                results=results_data,
+                expires_at=expires_at,
+            ),
+        )
+
+
+def _put_local(key: str, results: SearchResults) -> None:
+    _local[key] = (time.monotonic() + _cfg.es.search_cache_ttl_s, results)
+    _local.move_to_end(key)
+    while len(_local) > _cfg.es.search_cache_size:
+        _local.popitem(last=False)
@@ -12,8 +12,9 @@ IDX_TEMPLATE_NAME = f"{_cfg.es.prefix}_{IDX_NAME_CORE}_template"
 IDX_TEMPLATE_NAME_PATTERN = f"*_{IDX_NAME_CORE}_template"
 
 
+# The index template intentionally doesn't attach the IDX_ALIAS alias to new
+# indices: New indices are only added to the alias once they are fully populated!
 IDX_TEMPLATE = {
-    "aliases": {IDX_ALIAS: {}},
     "settings": {
         "index": {
             "number_of_shards": 1,
@@ -12,10 +12,14 @@ async def get_state() -> PlatformStateDocument:
 
 
 async def update_state(**kwargs) -> PlatformStateDocument:
+    from tekst import platform_cache
+
     state = await get_state()
     for k, v in kwargs.items():
         setattr(state, k, v)
-    return await state.replace()
+    state = await state.replace()
+    await platform_cache.invalidate()
+    return state
 
 
 StateDep = Annotated[PlatformStateDocument, Depends(get_state)]
@@ -1,17 +1,23 @@
 import asyncio
+import importlib
+import os
+import socket
+import time
 import traceback
 
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Coroutine
 from datetime import UTC, datetime, timedelta
 from enum import Enum
-from typing import Annotated, Any, Literal, ParamSpec, TypeVar
+from typing import Annotated, Any, Literal, ParamSpec, TypeVar, get_type_hints
 from uuid import uuid4
 
 from beanie import PydanticObjectId
-from beanie.operators import LT, NE, Eq, In
+from beanie.operators import LT, NE, And, Eq, In, Or
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
-from pydantic import AwareDatetime, Field, StringConstraints
+from pydantic import AwareDatetime, Field, StringConstraints, TypeAdapter
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from tekst import errors
 from tekst.config import TekstConfig, get_config
@@ -21,20 +27,37 @@ from tekst.models.common import DocumentBase, ModelBase, ReadBase
 from tekst.models.user import UserRead
 
 
+_cfg: TekstConfig = get_config()
+
+# name of the collection holding the locks of running tasks of locking types
+_LOCKS_COLLECTION = "task_locks"
+
+# ID identifying this process as a task worker
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+# interval in seconds in which task workers clean up outdated and abandoned tasks
+_CLEANUP_INTERVAL_S = 60
+
+# tasks currently run by this process
+_running: set[asyncio.Task[None]] = set()
+
+
 class TaskType(Enum):
     """
-    Task types with locking and artifact flags
+    Task types with locking, artifact and retryable flags
+    (only tasks that are safe to run again after a partial run may be retried)
     """
 
-    INDICES_CREATE_UPDATE = "indices_create_update", True, False
-    RESOURCE_IMPORT = "resource_import", True, False
-    RESOURCE_EXPORT = "resource_export", True, True
-    SEARCH_EXPORT = "search_export", True, True
-    BROADCAST_USER_NTFC = "broadcast_user_ntfc", False, False
-    BROADCAST_ADMIN_NTFC = "broadcast_admin_ntfc", False, False
-    PRECOMPUTE_DATA = "precompute_data", True, False
-    STRUCTURE_UPDATE = "structure_update", True, False
-    PLATFORM_CLEANUP = "platform_cleanup", True, False
+    INDICES_CREATE_UPDATE = "indices_create_update", True, False, True
+    RESOURCE_IMPORT = "resource_import", True, False, False
+    RESOURCE_EXPORT = "resource_export", True, True, True
+    SEARCH_EXPORT = "search_export", True, True, True
+    BROADCAST_USER_NTFC = "broadcast_user_ntfc", False, False, False
+    BROADCAST_ADMIN_NTFC = "broadcast_admin_ntfc", False, False, False
+    EMAIL_OUTBOX = "email_outbox", False, False, True
+    PRECOMPUTE_DATA = "precompute_data", True, False, True
+    STRUCTURE_UPDATE = "structure_update", True, False, False
+    PLATFORM_CLEANUP = "platform_cleanup", True, False, True
 
     def __new__(cls, *args, **kwargs):
         obj = object.__new__(cls)
@@ -42,9 +65,10 @@ class TaskType(Enum):
         return obj
 
     # ignore the first param since it's already set by __new__
-    def __init__(self, _: str, locking: bool, artifact: bool):
+    def __init__(self, _: str, locking: bool, artifact: bool, retryable: bool):
         self._locking_ = locking
         self._artifact_ = artifact
+        self._retryable_ = retryable
 
     def __str__(self):
         return self.value
@@ -57,6 +81,10 @@ class TaskType(Enum):
     def artifact(self):
         return self._artifact_
 
+    @property
+    def retryable(self):
+        return self._retryable_
+
 
 class Task(ModelBase):
     task_type: Annotated[
@@ -136,32 +164,219 @@ class TaskDocument(Task, DocumentBase):
                 "user_id",
                 "pickup_key",
                 "target_id",
-            ]
+            ],
+            [
+                "status",
+                "not_before",
+            ],
         ]
 
+    func: Annotated[
+        str | None,
+        Field(description="Import path of the coroutine function run by the task"),
+    ] = None
+    func_kwargs: Annotated[
+        dict[str, Any],
+        Field(description="JSON-encoded keyword arguments for the task function"),
+    ] = {}
+    attempts: Annotated[
+        int,
+        Field(description="Number of times the task has been claimed by a worker"),
+    ] = 0
+    max_attempts: Annotated[
+        int,
+        Field(description="Maximum number of attempts to run the task"),
+    ] = 1
+    worker_id: Annotated[
+        str | None,
+        Field(description="ID of the worker running the task"),
+    ] = None
+    lease_until: Annotated[
+        AwareDatetime | None,
+        Field(description="Time the claim of the worker running the task expires"),
+    ] = None
+    not_before: Annotated[
+        AwareDatetime | None,
+        Field(description="Time before which the task must not be (re)started"),
+    ] = None
+
 
-async def _run_task(
-    *,
-    task: AsyncFunc,
-    task_doc: TaskDocument,
-    task_kwargs: dict[str, Any] = {},
-) -> None:
+def _func_path(func: AsyncFunc) -> str:
+    return f"{func.__module__}:{func.__qualname__}"  # ty:ignore[unresolved-attribute]
+
+
+def _resolve_func(path: str) -> AsyncFunc:
+    module_name, qualname = path.split(":")
+    func = importlib.import_module(module_name)
+    for attr in qualname.split("."):
+        func = getattr(func, attr)
+    return func  # ty:ignore[invalid-return-type]
+
+
+def _encode_kwargs(func: AsyncFunc, kwargs: dict[str, Any]) -> dict[str, Any]:
+    """
+    JSON-encodes the given task function keyword arguments according to the type
+    hints of the task function, so the task can be run by any (other) worker process
+    """
+    hints = get_type_hints(func)
+    encoded = {}
+    for name, value in kwargs.items():
+        # the config is never stored, it is passed by the worker running the task
+        if isinstance(value, TekstConfig):
+            continue
+        encoded[name] = (
+            TypeAdapter(hints[name]).dump_python(value, mode="json", by_alias=True)
+            if name in hints
+            else jsonable_encoder(value)
+        )
+    return encoded
+
+
+def _decode_kwargs(func: AsyncFunc, encoded: dict[str, Any]) -> dict[str, Any]:
+    hints = get_type_hints(func)
+    kwargs = {
+        name: TypeAdapter(hints[name]).validate_python(value)
+        if name in hints
+        else value
+        for name, value in encoded.items()
+    }
+    for name, hint in hints.items():
+        if hint is TekstConfig:
+            kwargs[name] = _cfg
+    return kwargs
+
+
+def _tasks_coll():
+    return TaskDocument.get_pymongo_collection()
+
+
+def _locks_coll():
+    return _tasks_coll().database[_LOCKS_COLLECTION]
+
+
+def _lock_key(task_doc: TaskDocument) -> str:
+    return f"{task_doc.task_type.value}:{task_doc.target_id or ''}"
+
+
+async def _acquire_lock(task_doc: TaskDocument) -> bool:
+    """
+    Atomically acquires the lock for the type and target of the given task
+    (if its type is a locking one). Returns whether the lock is held by the task.
+    """
+    if not task_doc.task_type.locking:
+        return True
+    try:
+        # the lock is either free, already held by this task or held by a task
+        # whose worker stopped renewing its claim – otherwise the upsert
+        # tries to insert a second lock with the same ID, which fails
+        await _locks_coll().update_one(
+            {
+                "_id": _lock_key(task_doc),
+                "$or": [
+                    {"task_id": task_doc.id},
+                    {"lease_until": {"$lt": datetime.now(UTC)}},
+                ],
+            },
+            {
+                "$set": {
+                    "task_id": task_doc.id,
+                    "lease_until": task_doc.lease_until,
+                }
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def _release_lock(task_doc: TaskDocument) -> None:
+    if task_doc.task_type.locking:
+        await _locks_coll().delete_one(
+            {"_id": _lock_key(task_doc), "task_id": task_doc.id}
+        )
+
+
+async def _claim_task(task_id: PydanticObjectId | None = None) -> TaskDocument | None:
+    """
+    Atomically claims the given task (or the next one that is due) for this worker.
+    Tasks can be claimed if they are waiting or if the claim of the worker running
+    them has expired (e.g. because the worker process died) and they may be attempted
+    again.
+    """
+    now = datetime.now(UTC)
+    query = {
+        "func": {"$exists": True},
+        "$or": [
+            {
+                "status": "waiting",
+                "$or": [
+                    {"not_before": None},
+                    {"not_before": {"$lte": now}},
+                ],
+            },
+            {
+                "status": "running",
+                "lease_until": {"$lt": now},
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+            },
+        ],
+    }
+    if task_id:
+        query["_id"] = task_id
+    claimed = await _tasks_coll().find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": _WORKER_ID,
+                "start_time": now,
+                "lease_until": now + timedelta(seconds=_cfg.tasks.lease_s),
+            },
+            "$unset": {"not_before": ""},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("_id", ASCENDING)],
+        projection={"_id": True},
+        return_document=ReturnDocument.AFTER,
+    )
+    return await TaskDocument.get(claimed["_id"]) if claimed else None
+
+
+async def _heartbeat(task_doc: TaskDocument) -> None:
+    """Periodically renews the claim of this worker on the given running task"""
+    while True:  # pragma: no cover
+        await asyncio.sleep(_cfg.tasks.lease_s / 3)
+        lease_until = datetime.now(UTC) + timedelta(seconds=_cfg.tasks.lease_s)
+        renewed = await _tasks_coll().update_one(
+            {"_id": task_doc.id, "worker_id": _WORKER_ID, "status": "running"},
+            {"$set": {"lease_until": lease_until}},
+        )
+        if not renewed.matched_count:
+            log.warning(f"Worker lost its claim on task {str(task_doc.id)}")
+            return
+        if task_doc.task_type.locking:
+            await _locks_coll().update_one(
+                {"_id": _lock_key(task_doc), "task_id": task_doc.id},
+                {"$set": {"lease_until": lease_until}},
+            )
+
+
+async def _run_task(task_doc: TaskDocument) -> None:
     op_id = log_op_start(
         f"Run task {str(task_doc.id)} of type {task_doc.task_type} "
-        f"with target ID {str(task_doc.target_id)}"
+        f"with target ID {str(task_doc.target_id)} (attempt {task_doc.attempts})"
     )
+    heartbeat = asyncio.create_task(_heartbeat(task_doc))
     try:
-        if task_doc.id and await is_locked(
-            task_doc.task_type,
-            task_doc.id,
-            task_doc.target_id,
-        ):
+        if not await _acquire_lock(task_doc):
             log.warning(
                 f"Task '{task_doc.task_type.value}' with target ID "
                 f"{task_doc.target_id} already running. Task will be ended as 'failed'."
             )
             raise errors.E_409_ACTION_LOCKED
-        result = await task(**task_kwargs)
+        func = _resolve_func(task_doc.func or "")
+        result = await func(**_decode_kwargs(func, task_doc.func_kwargs))
         task_doc.status = "done"
         log_op_end(op_id)
         try:
@@ -182,16 +397,100 @@ async def _run_task(
         # write to error log if the exception is not an HTTPException
         if not isinstance(e, HTTPException):  # pragma: no cover
             log.error(str(e) + "\n" + traceback.format_exc())
+    except Exception as e:
+        # unexpected errors might be temporary, so the task is retried (if allowed)
+        log_op_end(op_id, failed=True)
+        log.error(str(e) + "\n" + traceback.format_exc())
+        if task_doc.attempts < task_doc.max_attempts:
+            task_doc.status = "waiting"
+            task_doc.not_before = datetime.now(UTC) + timedelta(
+                seconds=_cfg.tasks.retry_backoff_s * 2 ** (task_doc.attempts - 1)
+            )
+        else:
+            task_doc.status = "failed"
+            task_doc.error = errors.E_500_INTERNAL_SERVER_ERROR.detail.detail.key
+            task_doc.error_details = str(e)
+    except asyncio.CancelledError:  # pragma: no cover
+        # the worker is shutting down, so hand the task back to the queue
+        # (if it may be attempted again, otherwise it has failed)
+        if task_doc.attempts < task_doc.max_attempts:
+            task_doc.status = "waiting"
+            task_doc.not_before = None
+        else:
+            task_doc.status = "failed"
+            task_doc.error = errors.E_500_INTERNAL_SERVER_ERROR.detail.detail.key
+            task_doc.error_details = "Task was interrupted by a worker shutdown"
+        raise
     finally:
-        task_doc.end_time = datetime.now(UTC)
-        task_doc.duration_seconds = (
-            task_doc.end_time - task_doc.start_time
-        ).total_seconds()
-        await task_doc.save()
-        # if this task produced an artifact, automatically
-        # delete it after the configured time
-        if task_doc.task_type.artifact:
-            _auto_delete_task_delayed(task_doc)
+        heartbeat.cancel()
+        await _release_lock(task_doc)
+        if task_doc.status == "waiting":
+            update = {
+                "$set": {"status": "waiting", "not_before": task_doc.not_before},
+                "$unset": {"worker_id": "", "lease_until": ""},
+            }
+        else:
+            task_doc.end_time = datetime.now(UTC)
+            task_doc.duration_seconds = (
+                task_doc.end_time - task_doc.start_time
+            ).total_seconds()
+            update = {
+                "$set": {
+                    "status": task_doc.status,
+                    "result": task_doc.result,
+                    "error": task_doc.error,
+                    "error_details": task_doc.error_details,
+                    "end_time": task_doc.end_time,
+                    "duration_seconds": task_doc.duration_seconds,
+                },
+                "$unset": {"lease_until": ""},
+            }
+        # only write the outcome if this worker still holds its claim on the task
+        written = await _tasks_coll().update_one(
+            {"_id": task_doc.id, "worker_id": _WORKER_ID},
+            update,
+        )
+        if not written.matched_count:  # pragma: no cover
+            log.warning(
+                f"Outcome of task {str(task_doc.id)} discarded, "
+                "as the task has been claimed by another worker"
+            )
+
+
+async def _claim_and_run_task(task_id: PydanticObjectId) -> None:
+    if task_doc := await _claim_task(task_id):
+        await _run_task(task_doc)
+
+
+def _start(coro: Coroutine[Any, Any, None]) -> None:
+    running = asyncio.create_task(coro)
+    _running.add(running)
+    running.add_done_callback(_running.discard)
+
+
+async def run_worker(concurrency: int = 1) -> None:
+    """
+    Claims and runs queued tasks (at most the given number at once) until cancelled.
+    Tasks still running on cancellation are handed back to the queue.
+    """
+    log.info(f"Task worker {_WORKER_ID} started (concurrency: {concurrency})")
+    cleaned_up_at = None
+    try:
+        while True:
+            if (
+                cleaned_up_at is None
+                or time.monotonic() - cleaned_up_at >= _CLEANUP_INTERVAL_S
+            ):
+                await cleanup_tasks()
+                cleaned_up_at = time.monotonic()
+            while len(_running) < concurrency and (task_doc := await _claim_task()):
+                _start(_run_task(task_doc))
+            await asyncio.sleep(_cfg.tasks.poll_interval_s)
+    finally:
+        for running in list(_running):
+            running.cancel()
+        await asyncio.gather(*_running, return_exceptions=True)
+        log.info(f"Task worker {_WORKER_ID} stopped")
 
 
 async def create_task(
@@ -202,24 +501,47 @@ async def create_task(
     user_id: PydanticObjectId | None = None,
     task_kwargs: dict[str, Any] = {},
 ) -> TaskDocument:
+    """
+    Queues a task that runs the given coroutine function with the given keyword
+    arguments. The arguments must be JSON-encodable according to the type hints
+    of the function, as the task might be run by any worker process. Only tasks
+    of retryable types are attempted again if they fail unexpectedly.
+    """
     task_doc = await TaskDocument(
         task_type=task_type,
         target_id=target_id,
         user_id=user_id,
         pickup_key=str(uuid4()),
-        status="running",
+        status="waiting",
         start_time=datetime.now(UTC),
+        func=_func_path(task),
+        func_kwargs=_encode_kwargs(task, task_kwargs),
+        max_attempts=_cfg.tasks.max_attempts if task_type.retryable else 1,
     ).create()
-    asyncio.create_task(
-        _run_task(
-            task=task,
-            task_doc=task_doc,
-            task_kwargs=task_kwargs,
-        )
-    )
+    # start the task right away if the API is responsible for running tasks
+    if _cfg.tasks.run_in_api and task_doc.id:
+        _start(_claim_and_run_task(task_doc.id))
     return task_doc
 
 
+async def update_progress(
+    task_type: TaskType,
+    progress: dict[str, Any],
+    *,
+    target_id: PydanticObjectId | str | None = None,
+) -> None:
+    """
+    Sets the given progress data as the (preliminary) result of all running tasks
+    of the given type (and target, if given). This has no effect if the task code
+    isn't run as a task (e.g. when called directly via the CLI).
+    """
+    await TaskDocument.find(
+        Eq(TaskDocument.task_type, task_type),
+        Eq(TaskDocument.target_id, target_id) if target_id else {},
+        Eq(TaskDocument.status, "running"),
+    ).set({TaskDocument.result: jsonable_encoder(progress)})
+
+
 async def get_tasks(
     user: UserRead | None,
     *,
@@ -256,21 +578,6 @@ async def get_tasks(
     return tasks
 
 
-async def is_locked(
-    task_type: TaskType,
-    task_id: PydanticObjectId,
-    target_id: PydanticObjectId | str | None = None,
-) -> bool:
-    if not task_type.locking:
-        return False
-    return await TaskDocument.find_one(
-        NE(TaskDocument.id, task_id),
-        Eq(TaskDocument.task_type, task_type),
-        Eq(TaskDocument.target_id, target_id) if target_id else {},
-        In(TaskDocument.status, ["waiting", "running"]),
-    ).exists()
-
-
 async def delete_task(task_doc: TaskDocument | None) -> None:
     if not task_doc:  # pragma: no cover
         return
@@ -287,22 +594,45 @@ async def delete_all_tasks() -> None:
 
 
 async def cleanup_tasks() -> None:
-    # delete all tasks that started more than 1 week ago
+    """
+    Fails tasks whose worker stopped responding if they may not be attempted again
+    and deletes outdated tasks (including their artifacts). This is run periodically
+    by all task workers, so it doesn't depend on the process that ran a task.
+    """
+    now = datetime.now(UTC)
+    # fail abandoned tasks that can't be claimed again
+    await _tasks_coll().update_many(
+        {
+            "status": "running",
+            "lease_until": {"$lt": now},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]},
+        },
+        {
+            "$set": {
+                "status": "failed",
+                "end_time": now,
+                "error": errors.E_500_INTERNAL_SERVER_ERROR.detail.detail.key,
+                "error_details": "The worker running the task stopped responding",
+            },
+            "$unset": {"lease_until": ""},
+        },
+    )
+    # delete tasks that produced an artifact after the configured time
+    # and all other tasks that started more than 1 week ago
     for task in await TaskDocument.find(
-        NE(TaskDocument.task_type, TaskType.RESOURCE_EXPORT),
-        LT(TaskDocument.start_time, datetime.now(UTC) - timedelta(weeks=1)),
+        Or(
+            And(
+                In(TaskDocument.task_type, [t for t in TaskType if t.artifact]),
+                In(TaskDocument.status, ["done", "failed"]),
+                LT(
+                    TaskDocument.end_time,
+                    now - timedelta(minutes=_cfg.misc.del_exports_after_minutes),
+                ),
+            ),
+            And(
+                NE(TaskDocument.task_type, TaskType.RESOURCE_EXPORT),
+                LT(TaskDocument.start_time, now - timedelta(weeks=1)),
+            ),
+        )
     ).to_list():
-        await delete_task(task)  # pragma: no cover
-
-
-async def _auto_delete_task_delayed_task(
-    task_doc: TaskDocument,
-    *,
-    cfg: TekstConfig = get_config(),
-) -> None:
-    await asyncio.sleep(cfg.misc.del_exports_after_minutes * 60)
-    await delete_task(task_doc)  # pragma: no cover
-
-
-def _auto_delete_task_delayed(task_doc: TaskDocument) -> None:
-    asyncio.create_task(_auto_delete_task_delayed_task(task_doc))
+        await delete_task(task)
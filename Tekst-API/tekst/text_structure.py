@@ -0,0 +1,390 @@
+import asyncio
+import time
+
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from beanie import PydanticObjectId
+
+from tekst.counters import counter_get, counter_incr
+from tekst.models.location import LocationDocument
+from tekst.models.text import TextDocument
+
+
+# maximum number of cached entries
+_MAX_ENTRIES = 10000
+
+# interval in seconds after which the structure version of a text is checked again
+# (to pick up structure changes caused by writes handled by other API workers)
+_VERSION_CHECK_INTERVAL_S = 1.0
+
+# in-process LRU cache of data derived from text structures, mapping
+# tuples of (text ID, key) to tuples of (structure version, data)
+_entries: OrderedDict[tuple[PydanticObjectId, Hashable], tuple[int, Any]] = (
+    OrderedDict()
+)
+
+# structure versions of texts and the (monotonic) time they were checked at
+_versions: dict[PydanticObjectId, tuple[int, float]] = {}
+
+# data currently being computed, mapping tuples of (text ID, key)
+# to tuples of (structure version, computing task)
+_pending: dict[tuple[PydanticObjectId, Hashable], tuple[int, asyncio.Task[Any]]] = {}
+
+
+def _version_counter_id(text_id: PydanticObjectId) -> str:
+    return f"text_structure_version:{text_id}"
+
+
+def clear() -> None:
+    """Clears the cached text structure data of this API worker"""
+    _entries.clear()
+    _versions.clear()
+    _pending.clear()
+
+
+async def get_version(text_id: PydanticObjectId) -> int:
+    """
+    Returns the current version of the structure (locations) of the given text.
+    Structure changes caused by other API workers are picked up with a delay of
+    at most `_VERSION_CHECK_INTERVAL_S` seconds.
+    """
+    cached = _versions.get(text_id)
+    if cached and time.monotonic() - cached[1] < _VERSION_CHECK_INTERVAL_S:
+        return cached[0]
+    version = await counter_get(_version_counter_id(text_id))
+    _versions[text_id] = (version, time.monotonic())
+    return version
+
+
+async def structure_changed(text_id: PydanticObjectId) -> None:
+    """
+    Increments the structure version of the given text. This has to be called
+    after each write operation that affects the text's locations.
+    """
+    await counter_incr(_version_counter_id(text_id))
+    _versions.pop(text_id, None)
+
+
+async def _compute[T](
+    entry_key: tuple[PydanticObjectId, Hashable],
+    version: int,
+    factory: Callable[[], Awaitable[T]],
+) -> T:
+    try:
+        data = await factory()
+        _entries[entry_key] = (version, data)
+        _entries.move_to_end(entry_key)
+        while len(_entries) > _MAX_ENTRIES:  # pragma: no cover
+            _entries.popitem(last=False)
+        return data
+    finally:
+        if entry_key in _pending and _pending[entry_key][0] == version:
+            del _pending[entry_key]
+
+
+async def memoized[T](
+    text_id: PydanticObjectId,
+    key: Hashable,
+    factory: Callable[[], Awaitable[T]],
+) -> T:
+    """
+    Returns the cached data derived from the structure of the given text for the
+    given key. If there is none (or the text's structure changed since it was cached),
+    the data is computed by awaiting the given factory and then cached. Concurrent
+    calls for data that is already being computed wait for the same computation.
+    """
+    entry_key = (text_id, key)
+    version = await get_version(text_id)
+    cached = _entries.get(entry_key)
+    if cached and cached[0] == version:
+        _entries.move_to_end(entry_key)
+        return cached[1]
+    pending = _pending.get(entry_key)
+    if not pending or pending[0] != version:
+        pending = (version, asyncio.create_task(_compute(entry_key, version, factory)))
+        _pending[entry_key] = pending
+    # shielded, so cancelling one of the waiting requests doesn't affect the others
+    return await asyncio.shield(pending[1])
+
+
+class TextStructureIndex:
+    """
+    Compact in-memory index of the structure (locations) of a text, answering
+    navigation queries without hitting the database. Each location is a row,
+    rows are ordered by level and position and each location property is stored
+    in its own array (column), so the index stays small even for huge texts.
+    """
+
+    def __init__(self) -> None:
+        self._ids = bytearray()
+        self._labels = bytearray()
+        self._levels = array("B")
+        self._positions = array("I")
+        self._parents = array("i")
+        self._first_children = array("i")
+        self._children_counts = array("I")
+        self._label_offsets = array("I", [0])
+        self._level_starts = array("I")
+        self._rows_by_id = array("I")
+
+    @classmethod
+    async def load(cls, text_id: PydanticObjectId) -> "TextStructureIndex":
+        """Loads the structure index of the given text from the database"""
+        index = cls()
+        rows: dict[Any, int] = {}  # only needed while building the index
+        async for loc in (
+            LocationDocument.get_pymongo_collection()
+            .find(
+                {"text_id": text_id},
+                {"_id": 1, "parent_id": 1, "level": 1, "position": 1, "label": 1},
+            )
+            .sort([("level", 1), ("position", 1)])
+        ):
+            index._append(loc, rows)
+        index._level_starts.append(len(index))
+        # row numbers sorted by location ID, for looking up rows by ID
+        index._rows_by_id = array("I", sorted(range(len(index)), key=index._oid))
+        return index
+
+    def _append(self, loc: dict[str, Any], rows: dict[Any, int]) -> None:
+        row = len(self)
+        while len(self._level_starts) <= loc["level"]:
+            self._level_starts.append(row)
+        parent_row = rows.get(loc.get("parent_id"), -1)
+        if parent_row >= 0:
+            if self._first_children[parent_row] < 0:
+                self._first_children[parent_row] = row
+            self._children_counts[parent_row] += 1
+        rows[loc["_id"]] = row
+        self._ids += loc["_id"].binary
+        self._labels += loc["label"].encode()
+        self._levels.append(loc["level"])
+        self._positions.append(loc["position"])
+        self._parents.append(parent_row)
+        self._first_children.append(-1)
+        self._children_counts.append(0)
+        self._label_offsets.append(len(self._labels))
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    def _oid(self, row: int) -> bytes:
+        return bytes(self._ids[row * 12 : row * 12 + 12])
+
+    def _id(self, row: int) -> PydanticObjectId:
+        return PydanticObjectId(self._oid(row))
+
+    def _label(self, row: int) -> str:
+        return self._labels[
+            self._label_offsets[row] : self._label_offsets[row + 1]
+        ].decode()
+
+    def _row(self, location_id: PydanticObjectId) -> int | None:
+        i = bisect_left(self._rows_by_id, location_id.binary, key=self._oid)
+        if i < len(self._rows_by_id) and self._oid(self._rows_by_id[i]) == (
+            location_id.binary
+        ):
+            return self._rows_by_id[i]
+        return None
+
+    def _level_rows(self, level: int) -> range:
+        if level < 0 or level >= len(self._level_starts) - 1:
+            return range(0)
+        return range(self._level_starts[level], self._level_starts[level + 1])
+
+    def location_id(self, level: int, position: int) -> PydanticObjectId | None:
+        """Returns the ID of the location at the given level and position"""
+        rows = self._level_rows(level)
+        i = bisect_left(self._positions, position, rows.start, rows.stop)
+        if i < rows.stop and self._positions[i] == position:
+            return self._id(i)
+        return None
+
+    def first_and_last_ids(
+        self,
+        level: int,
+    ) -> tuple[PydanticObjectId, PydanticObjectId] | None:
+        """Returns the IDs of the first and last location on the given level"""
+        rows = self._level_rows(level)
+        if not rows:
+            return None
+        return self._id(rows[0]), self._id(rows[-1])
+
+    def adjacent_ids(
+        self,
+        location_id: PydanticObjectId,
+    ) -> tuple[PydanticObjectId | None, PydanticObjectId | None]:
+        """
+        Returns the IDs of the previous and next location on the same level as the
+        given location (wrapping around at the first and last location of the level)
+        """
+        row = self._row(location_id)
+        if row is None:
+            return None, None
+        rows = self._level_rows(self._levels[row])
+        prev_row = row - 1 if row > rows.start else rows.stop - 1
+        next_row = row + 1 if row < rows.stop - 1 else rows.start
+        return self._id(prev_row), self._id(next_row)
+
+    def path_ids(self, location_id: PydanticObjectId) -> list[PydanticObjectId]:
+        """
+        Returns the IDs of the locations on the path of the given location,
+        from the root location down to the given location itself
+        """
+        row = self._row(location_id)
+        path = []
+        while row is not None and row >= 0:
+            path.insert(0, self._id(row))
+            row = self._parents[row]
+        return path
+
+    def child_ids(
+        self,
+        parent_id: PydanticObjectId | None,
+        level: int,
+    ) -> list[PydanticObjectId]:
+        """
+        Returns the IDs of all locations on the given level that are children of the
+        given parent location (or have no parent location if none is given)
+        """
+        if parent_id is None:
+            rows = [row for row in self._level_rows(level) if self._parents[row] < 0]
+        else:
+            parent_row = self._row(parent_id)
+            if parent_row is None or self._levels[parent_row] != level - 1:
+                return []
+            start = self._first_children[parent_row]
+            rows = range(start, start + self._children_counts[parent_row])
+        return [self._id(row) for row in rows]
+
+    def full_labels(self, level: int, loc_delim: str) -> dict[str, str]:
+        """
+        Returns a dict mapping the IDs of all locations on the given level to their
+        full labels (the labels of all locations on their path, joined by the
+        given delimiter)
+        """
+        full_labels = {}
+        for row in self._level_rows(level):
+            labels = []
+            parent_row = row
+            while parent_row >= 0:
+                labels.insert(0, self._label(parent_row))
+                parent_row = self._parents[parent_row]
+            full_labels[str(self._id(row))] = loc_delim.join(labels)
+        return full_labels
+
+
+async def get_index(text_id: PydanticObjectId) -> TextStructureIndex:
+    """
+    Returns the structure index of the given text. It is loaded lazily and
+    reloaded after the text's structure changed.
+    """
+    return await memoized(
+        text_id,
+        "index",
+        lambda: TextStructureIndex.load(text_id),
+    )
+
+
+async def update_location_paths(
+    text_id: PydanticObjectId,
+    *,
+    location_ids: list[PydanticObjectId] | None = None,
+) -> None:
+    """
+    Updates the materialized paths (ancestor IDs and full labels) of the locations of
+    the given text. If location IDs are given, only these locations and their
+    descendants are updated (the ancestor IDs stored with the descendants have to
+    still contain the given locations for this to work). This has to be called after
+    each write operation that changes the parents or labels of locations, as well as
+    after changing the text's location delimiter.
+    """
+    text = await TextDocument.get(text_id)
+    if not text:  # pragma: no cover
+        return
+    loc_delim = text.loc_delim or ", "
+    query: dict[str, Any] = {"text_id": text_id}
+    if location_ids is not None:
+        query["$or"] = [
+            {"_id": {"$in": location_ids}},
+            {"ancestors": {"$in": location_ids}},
+        ]
+    await (
+        LocationDocument.find(query)
+        .aggregate(
+            [
+                # collect all ancestors of each location
+                {
+                    "$graphLookup": {
+                        "from": LocationDocument.get_collection_name(),
+                        "startWith": "$parent_id",
+                        "connectFromField": "parent_id",
+                        "connectToField": "_id",
+                        "as": "path",
+                        "depthField": "depth",
+                        "restrictSearchWithMatch": {"text_id": text_id},
+                    }
+                },
+                # sort them from the root location down to the parent
+                {
+                    "$set": {
+                        "path": {
+                            "$sortArray": {"input": "$path", "sortBy": {"depth": -1}}
+                        }
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 1,
+                        "ancestors": "$path._id",
+                        "full_label": {
+                            "$reduce": {
+                                "input": {"$concatArrays": ["$path.label", ["$label"]]},
+                                "initialValue": None,
+                                "in": {
+                                    "$cond": {
+                                        "if": {"$eq": ["$$value", None]},
+                                        "then": "$$this",
+                                        "else": {
+                                            "$concat": [
+                                                "$$value",
+                                                {"$literal": loc_delim},
+                                                "$$this",
+                                            ]
+                                        },
+                                    }
+                                },
+                            }
+                        },
+                    }
+                },
+                {
+                    "$merge": {
+                        "into": LocationDocument.get_collection_name(),
+                        "on": "_id",
+                        "whenMatched": "merge",
+                        "whenNotMatched": "discard",
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+        .to_list()
+    )
+
+
+async def init_location_paths() -> None:
+    """
+    Materializes the paths of all locations that don't have them, yet
+    (e.g. because they were inserted into the database directly, like sample data).
+    Locations of existing databases get their paths via a DB migration.
+    """
+    for text_id in await LocationDocument.get_pymongo_collection().distinct(
+        "text_id",
+        {"full_label": {"$exists": False}},
+    ):
+        await update_location_paths(text_id)
@@ -14,11 +14,12 @@ from bson import ObjectId, json_util
 from elasticsearch import Elasticsearch
 from httpx import ASGITransport, AsyncClient, Response
 from humps import camelize
-from tekst import db, tasks
+from tekst import access_cache, db, platform_cache, tasks, text_structure
 from tekst.app import app
 from tekst.auth import _create_user
 from tekst.config import TekstConfig, get_config
 from tekst.models.user import UserCreate
+from tekst.search import cache as search_cache
 from tekst.search import create_indices_task
 from tekst.search.templates import IDX_ALIAS
 
@@ -97,6 +98,10 @@ async def database(
     db = db_client[config.db.name]
     for collection in await db.list_collection_names():
         await db.drop_collection(collection)
+    access_cache.clear()
+    text_structure.clear()
+    platform_cache.clear()
+    search_cache.clear()
     yield db
 
 
@@ -104,6 +109,10 @@ async def database(
 async def clear_db(database) -> None:
     for collection in await database.list_collection_names():
         await database.drop_collection(collection)
+    access_cache.clear()
+    text_structure.clear()
+    platform_cache.clear()
+    search_cache.clear()
 
 
 @pytest.fixture(scope="session")
@@ -170,6 +179,10 @@ async def insert_test_data(
             if not result.acknowledged:
                 raise Exception(f"Failed to insert into test collection '{collection}'")
             ids[collection] = [str(id_) for id_ in result.inserted_ids]
+        access_cache.clear()
+        text_structure.clear()
+        platform_cache.clear()
+        search_cache.clear()
         return ids
 
     return _insert_test_data
@@ -1,6 +1,9 @@
+from datetime import UTC, datetime
+
 import pytest
 
 from beanie import PydanticObjectId
+from beanie.operators import Set
 from httpx import AsyncClient
 from tekst.models.location import LocationDocument
 from tekst.models.resource import ResourceBaseDocument
@@ -142,6 +145,59 @@ async def test_get_location_data(
     assert_status(404, resp)
 
 
+@pytest.mark.anyio
+async def test_get_location_data_conditional(
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+):
+    await insert_test_data()
+    text_id = PydanticObjectId("67c03aed5dbf06b9624fd57e")
+    params = {"txt": str(text_id), "lvl": 1, "pos": 0}
+    resp = await test_client.get("/browse", params=params)
+    assert_status(200, resp)
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "public, no-cache"
+    assert "Last-Modified" not in resp.headers
+
+    # revalidate cached location data
+    resp = await test_client.get(
+        "/browse",
+        params=params,
+        headers={"If-None-Match": etag},
+    )
+    assert_status(304, resp)
+    assert resp.headers["ETag"] == etag
+    assert not resp.content
+
+    # contents changed
+    await ResourceBaseDocument.find(
+        ResourceBaseDocument.text_id == text_id,
+        with_children=True,
+    ).update(Set({ResourceBaseDocument.contents_changed_at: datetime.now(UTC)}))
+    resp = await test_client.get(
+        "/browse",
+        params=params,
+        headers={"If-None-Match": etag},
+    )
+    assert_status(200, resp)
+    assert resp.headers["ETag"] != etag
+    etag = resp.headers["ETag"]
+
+    # resource config changed
+    await ResourceBaseDocument.find(
+        ResourceBaseDocument.text_id == text_id,
+        with_children=True,
+    ).update(Set({"config.general.enable_content_context": False}))
+    resp = await test_client.get(
+        "/browse",
+        params=params,
+        headers={"If-None-Match": etag},
+    )
+    assert_status(200, resp)
+    assert resp.headers["ETag"] != etag
+
+
 @pytest.mark.anyio
 async def test_get_nearest_content_position(
     test_client: AsyncClient,
@@ -1,6 +1,8 @@
 import pytest
 
+from beanie import PydanticObjectId
 from httpx import AsyncClient
+from tekst import text_structure
 from tekst.models.location import LocationDocument
 from tekst.models.text import TextDocument
 
@@ -362,6 +364,26 @@ async def test_get_first_and_last_locations_paths(
     assert first_loc["position"] == 0
     assert last_loc["position"] > first_loc["position"]
 
+    # revalidate cached paths
+    etag = resp.headers["ETag"]
+    resp = await test_client.get(
+        "/locations/first-last-paths",
+        params={"txt": text_id, "lvl": 1},
+        headers={"If-None-Match": etag},
+    )
+    assert_status(304, resp)
+    assert resp.headers["Cache-Control"] == "public, no-cache"
+
+    # text structure changed
+    await text_structure.structure_changed(PydanticObjectId(text_id))
+    resp = await test_client.get(
+        "/locations/first-last-paths",
+        params={"txt": text_id, "lvl": 1},
+        headers={"If-None-Match": etag},
+    )
+    assert_status(200, resp)
+    assert resp.headers["ETag"] != etag
+
     # fail because of wrong text ID
     resp = await test_client.get(
         "/locations/first-last-paths",
@@ -425,6 +447,19 @@ async def test_update_location(
     )
     assert_status(200, resp)
 
+    # update parent location label, check full label of child location
+    resp = await test_client.patch(
+        f"/locations/{location['parentId']}",
+        json={"label": "A fresh parent label"},
+    )
+    assert_status(200, resp)
+    resp = await test_client.get(
+        "/locations",
+        params={"locId": location["id"], "fullLabels": True},
+    )
+    assert_status(200, resp)
+    assert resp.json()[0]["full"] == "A fresh parent label; A fresh label"
+
     # update invalid location
     location_update = {"label": "Brand new label"}
     resp = await test_client.patch(
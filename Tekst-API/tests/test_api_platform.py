@@ -8,6 +8,7 @@ from httpx import AsyncClient
 from tekst import package_metadata
 from tekst.auth import AccessTokenDocument
 from tekst.models.content import ContentBaseDocument
+from tekst.models.email_outbox import EmailOutboxDocument
 from tekst.models.message import UserMessageDocument
 
 
@@ -54,6 +55,49 @@ async def test_web_init_data(
     assert len(resp.json()["platform"]["infoSegments"]) == 6
 
 
+@pytest.mark.anyio
+async def test_web_init_data_etag(
+    test_client: AsyncClient,
+    assert_status,
+    insert_test_data,
+    login,
+    logout,
+):
+    await insert_test_data()
+    # anonymous
+    resp = await test_client.get("/platform/web-init")
+    assert_status(200, resp)
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "public, no-cache"
+    # revalidate cached data
+    resp = await test_client.get(
+        "/platform/web-init",
+        headers={"If-None-Match": f'W/"foo", W/{etag}'},
+    )
+    assert_status(304, resp)
+    assert resp.headers["ETag"] == etag
+    resp = await test_client.get("/platform/web-init", headers={"If-None-Match": "*"})
+    assert_status(304, resp)
+    # logged in as admin
+    await login(is_superuser=True)
+    resp = await test_client.get("/platform/web-init", headers={"If-None-Match": etag})
+    assert_status(200, resp)
+    assert resp.headers["ETag"] != etag
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+    assert resp.json()["user"] is not None
+    # update platform state, invalidating the cached data
+    resp = await test_client.patch(
+        "/platform/state",
+        json={"platformName": "Foo"},
+    )
+    assert_status(200, resp)
+    await logout()
+    resp = await test_client.get("/platform/web-init", headers={"If-None-Match": etag})
+    assert_status(200, resp)
+    assert resp.headers["ETag"] != etag
+    assert resp.json()["platform"]["state"]["platformName"] == "Foo"
+
+
 @pytest.mark.anyio
 async def test_update_platform_state(
     test_client: AsyncClient,
@@ -230,6 +274,44 @@ async def test_platform_cleanup_user_messages(
     assert await UserMessageDocument.find().count() == 0
 
 
+@pytest.mark.anyio
+async def test_platform_cleanup_email_outbox(
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+    login,
+    wait_for_task_success,
+    config,
+):
+    await insert_test_data()
+    await login(is_superuser=True)
+
+    # create an expired and a pending outbox email
+    for to, age_hours in (
+        ("expired@bar.de", config.email.outbox_max_age_hours + 1),
+        ("pending@bar.de", 0),
+    ):
+        await EmailOutboxDocument(
+            to=to,
+            subject="Foo",
+            txt="Foo",
+            html="",
+            created_at=datetime.now(UTC) - timedelta(hours=age_hours),
+            # claimed by another sender, so it isn't sent in the meantime
+            claim_id="foo",
+            sending_until=datetime.now(UTC) + timedelta(minutes=5),
+        ).insert()
+
+    # run cleanup
+    resp = await test_client.get("/platform/cleanup")
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+
+    # only the expired email is deleted
+    emails = await EmailOutboxDocument.find_all().to_list()
+    assert [email.to for email in emails] == ["pending@bar.de"]
+
+
 @pytest.mark.anyio
 async def test_platform_cleanup_archive_duplicates(
     test_client: AsyncClient,
@@ -1,3 +1,4 @@
+import gzip
 import json
 
 import pytest
@@ -5,8 +6,10 @@ import pytest
 from beanie import PydanticObjectId
 from beanie.operators import Set
 from httpx import AsyncClient
+from tekst import change_tracker, errors, resources, tasks
 from tekst.models.platform import PlatformStateDocument
 from tekst.models.resource import ResourceBaseDocument
+from tekst.resource_types.plain_text import PlainTextContentDocument
 
 
 @pytest.mark.anyio
@@ -684,6 +687,31 @@ async def test_get_resources(
     assert_status(422, resp)
 
 
+@pytest.mark.anyio
+async def test_get_resources_of_deactivated_text(
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+    login,
+    logout,
+):
+    text_id = (await insert_test_data("texts", "locations", "resources"))["texts"][0]
+    resp = await test_client.get("/resources", params={"txt": text_id})
+    assert_status(200, resp)
+    assert len(resp.json()) > 0
+
+    # deactivate text
+    await login(is_superuser=True)
+    resp = await test_client.patch(f"/texts/{text_id}", json={"isActive": False})
+    assert_status(200, resp)
+    await logout()
+
+    # resources of the deactivated text should not be accessible anymore
+    resp = await test_client.get("/resources", params={"txt": text_id})
+    assert_status(200, resp)
+    assert len(resp.json()) == 0
+
+
 @pytest.mark.anyio
 async def test_propose_unpropose_publish_unpublish_resource(
     test_client: AsyncClient,
@@ -1451,6 +1479,110 @@ async def test_import_resource(
             break
 
 
+@pytest.mark.anyio
+async def test_import_resource_recovery(
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+    login,
+    wait_for_task_success,
+    database,
+    monkeypatch,
+):
+    await insert_test_data("texts", "locations", "resources", "contents")
+    await login(is_superuser=True)
+    resource_id = "67c043c0906e79b9062e22f4"
+    location_ids = ["67c040a0906e79b9062e22e8", "67c040bb906e79b9062e22e9"]
+    import_file = (
+        "foo.json",
+        json.dumps(
+            {
+                "contents": [
+                    {"locationId": location_ids[0], "text": "FOO"},
+                    {"locationId": location_ids[1], "text": "BAR"},
+                ],
+                "resourceId": resource_id,
+            }
+        ),
+        "application/json",
+    )
+
+    async def _count_contents(archived: bool) -> list[int]:
+        return [
+            await database.contents.count_documents(
+                {
+                    "resource_id": PydanticObjectId(resource_id),
+                    "location_id": PydanticObjectId(loc_id),
+                    "archived": archived,
+                }
+            )
+            for loc_id in location_ids
+        ]
+
+    # import failing after archiving the contents to replace
+    async def _failing_insert_many(*args, **kwargs):
+        raise RuntimeError("Connection lost")
+
+    monkeypatch.setattr(PlainTextContentDocument, "insert_many", _failing_insert_many)
+    resp = await test_client.post(
+        f"/resources/{resource_id}/import",
+        files={"file": import_file},
+    )
+    assert_status(202, resp)
+    assert not await wait_for_task_success(resp.json()["id"])
+    assert await _count_contents(archived=False) == [0, 0]
+    checkpoint = await database.precomputed.find_one(
+        {
+            "ref_id": PydanticObjectId(resource_id),
+            "precomputed_type": "import_checkpoint",
+        }
+    )
+    assert checkpoint["data"]["batch"]
+    monkeypatch.undo()
+
+    # the failed batch is undone and written again by the next import
+    resp = await test_client.post(
+        f"/resources/{resource_id}/import",
+        files={"file": import_file},
+    )
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+    assert await _count_contents(archived=False) == [1, 1]
+    assert await _count_contents(archived=True) == [1, 3]
+    assert not await database.precomputed.find_one(
+        {
+            "ref_id": PydanticObjectId(resource_id),
+            "precomputed_type": "import_checkpoint",
+        }
+    )
+
+
+@pytest.mark.anyio
+async def test_import_resource_task_creation_failed(
+    test_client: AsyncClient,
+    config,
+    insert_test_data,
+    assert_status,
+    login,
+    monkeypatch,
+):
+    await insert_test_data("texts", "locations", "resources")
+    await login(is_superuser=True)
+    temp_files = set(config.temp_files_dir.iterdir())
+
+    async def _failing_create_task(*args, **kwargs):
+        raise errors.E_500_INTERNAL_SERVER_ERROR
+
+    monkeypatch.setattr(tasks, "create_task", _failing_create_task)
+    resp = await test_client.post(
+        "/resources/67c043c0906e79b9062e22f4/import",
+        files={"file": ("foo.json", json.dumps({"contents": []}), "application/json")},
+    )
+    assert_status(500, resp)
+    # the spooled upload file is deleted
+    assert set(config.temp_files_dir.iterdir()) == temp_files
+
+
 @pytest.mark.anyio
 async def test_export_content(
     test_client: AsyncClient,
@@ -1461,9 +1593,12 @@ async def test_export_content(
     wait_for_task_success,
     wrong_id,
     config,
+    monkeypatch,
 ):
     await insert_test_data()
     await login(is_superuser=True)
+    # write JSON exports in small chunks (to test chunking)
+    monkeypatch.setattr(resources, "_EXPORT_CHUNK_SIZE", 2)
 
     formats = [
         "json",
@@ -1521,6 +1656,26 @@ async def test_export_content(
                 assert "id" in resp.json()
                 assert await wait_for_task_success(resp.json()["id"])
 
+    # create compressed export
+    resp = await test_client.get(
+        f"/resources/{target_res_ids[0]}/export",
+        params={
+            "format": "json",
+            "from": from_loc_id,
+            "to": to_loc_id,
+            "gzip": True,
+        },
+    )
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+    resp = await test_client.get(
+        "/platform/tasks/download",
+        params={"pickupKey": resp.json()["pickupKey"]},
+    )
+    assert_status(200, resp)
+    assert resp.headers["content-type"] == "application/gzip"
+    assert len(json.loads(gzip.decompress(resp.content))["contents"]) > 0
+
     # log out for the next tests
     await logout()
 
@@ -1642,11 +1797,96 @@ async def test_get_aggregations(
     assert isinstance(resp.json(), list)
     assert len(resp.json()) > 1
 
+    # update content, aggregations should be updated incrementally
+    resp = await test_client.patch(
+        "/contents/67c04530906e79b9062e2303",
+        json={
+            "resourceType": "textAnnotation",
+            "tokens": [{"annotations": [{"key": "foo", "value": ["bar", "baz"]}]}],
+        },
+    )
+    assert_status(200, resp)
+    content_id = resp.json()["id"]
+    resp = await test_client.get(f"/resources/{res_id}/aggregations")
+    assert_status(200, resp)
+    assert {"key": "foo", "values": ["bar", "baz"]} in resp.json()
+
+    # delete content, aggregations should be updated incrementally
+    resp = await test_client.delete(f"/contents/{content_id}")
+    assert_status(204, resp)
+    resp = await test_client.get(f"/resources/{res_id}/aggregations")
+    assert_status(200, resp)
+    assert "foo" not in [agg["key"] for agg in resp.json()]
+
+    # update location metadata content, aggregations should be updated incrementally
+    resp = await test_client.patch(
+        "/contents/67dbc8fc2e51e7949ae22722",
+        json={
+            "resourceType": "locationMetadata",
+            "entries": [{"key": "foo", "value": ["bar"]}],
+        },
+    )
+    assert_status(200, resp)
+    resp = await test_client.get("/resources/67c04473906e79b9062e22fb/aggregations")
+    assert_status(200, resp)
+    assert {"key": "foo", "values": ["bar"]} in resp.json()
+
     # fail to get aggregations for wrong resource ID
     resp = await test_client.get(f"/resources/{wrong_id}/aggregations")
     assert_status(404, resp)
 
 
+@pytest.mark.anyio
+async def test_aggregations_with_pending_changes(
+    config,
+    monkeypatch,
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+    login,
+    wait_for_task_success,
+):
+    await insert_test_data()
+    await login(is_superuser=True)
+    res_id = "67c0442e906e79b9062e22f6"
+
+    # run resource precompute hooks to generate aggregations
+    resp = await test_client.get("/resources/precompute")
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+
+    # bulk change of the resource's contents (e.g. an import) that isn't written, yet
+    monkeypatch.setattr(config.misc, "changes_flush_delay_ms", 5000)
+    resource = await ResourceBaseDocument.get(
+        PydanticObjectId(res_id), with_children=True
+    )
+    assert resource
+    await resource.contents_changed_hook()
+
+    # single content change before the bulk change is written,
+    # aggregations must not be updated incrementally
+    resp = await test_client.patch(
+        "/contents/67c04530906e79b9062e2303",
+        json={
+            "resourceType": "textAnnotation",
+            "tokens": [{"annotations": [{"key": "foo", "value": ["bar", "baz"]}]}],
+        },
+    )
+    assert_status(200, resp)
+    resp = await test_client.get(f"/resources/{res_id}/aggregations")
+    assert_status(200, resp)
+    assert "foo" not in [agg["key"] for agg in resp.json()]
+
+    # aggregations are recomputed by the next precompute run
+    await change_tracker.flush()
+    resp = await test_client.get("/resources/precompute")
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+    resp = await test_client.get(f"/resources/{res_id}/aggregations")
+    assert_status(200, resp)
+    assert {"key": "foo", "values": ["bar", "baz"]} in resp.json()
+
+
 @pytest.mark.anyio
 async def test_get_resource_coverage_data(
     test_client: AsyncClient,
@@ -1680,6 +1920,32 @@ async def test_get_resource_coverage_data(
     assert isinstance(resp.json(), dict)
     assert len(resp.json()["ranges"]) > 0
 
+    # revalidate cached coverage data
+    resp = await test_client.get(
+        f"/resources/{resource_id}/coverage",
+        headers={"If-None-Match": resp.headers["ETag"]},
+    )
+    assert_status(304, resp)
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+    last_modified = resp.headers["Last-Modified"]
+    resp = await test_client.get(
+        f"/resources/{resource_id}/coverage",
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert_status(304, resp)
+    # If-None-Match takes precedence over If-Modified-Since
+    resp = await test_client.get(
+        f"/resources/{resource_id}/coverage",
+        headers={"If-None-Match": '"foo"', "If-Modified-Since": last_modified},
+    )
+    assert_status(200, resp)
+    # invalid date
+    resp = await test_client.get(
+        f"/resources/{resource_id}/coverage",
+        headers={"If-Modified-Since": "foo"},
+    )
+    assert_status(200, resp)
+
     # fail w/ invalid resource ID
     resp = await test_client.get(
         f"/resources/{wrong_id}/coverage",
@@ -1,6 +1,27 @@
+import base64
+import csv
+import gzip
+import io
+import json
+
 import pytest
 
+from beanie import PydanticObjectId
+from beanie.operators import Set
+from elasticsearch import ApiError
 from httpx import AsyncClient, Response
+from tekst import change_tracker
+from tekst.errors import TekstHTTPException
+from tekst.models.index_journal import IndexJournalEntryDocument
+from tekst.models.search import GeneralSearchSettings, QuickSearchRequestBody
+from tekst.models.text import TextDocument
+from tekst.search import (
+    _decode_cursor,
+    _get_es_client,
+    _run_search,
+    _set_index_utd,
+    search_pages,
+)
 
 
 def _assert_search_resp(
@@ -55,6 +76,190 @@ async def test_get_indices_info(
     assert resp.json()[0]["upToDate"]
 
 
+@pytest.mark.anyio
+async def test_update_search_index_incrementally(
+    test_client: AsyncClient,
+    login,
+    use_indices,
+    assert_status,
+    wait_for_task_success,
+):
+    await login(is_superuser=True)
+
+    # update content
+    resp = await test_client.patch(
+        "/contents/67c044b4906e79b9062e22fb",
+        json={"resourceType": "plainText", "text": "Xylophone"},
+    )
+    assert_status(200, resp)
+
+    # index should be out of date now
+    resp = await test_client.get("/search/index/info")
+    assert_status(200, resp)
+    assert not all(idx["upToDate"] for idx in resp.json())
+
+    # update index incrementally
+    resp = await test_client.get(
+        "/search/index/create",
+        params={"incremental": True},
+    )
+    assert_status(202, resp)
+    assert await wait_for_task_success(resp.json()["id"])
+
+    # index should be up to date again
+    resp = await test_client.get("/search/index/info")
+    assert_status(200, resp)
+    assert len(resp.json()) == 2
+    assert all(idx["upToDate"] for idx in resp.json())
+
+    # updated content should be found
+    _assert_search_resp(
+        await test_client.post(
+            "/search",
+            json={
+                "type": "quick",
+                "q": "xylophone",
+            },
+        ),
+        expected_hits=1,
+    )
+
+    # force re-creation of all indices, replacing the existing ones
+    resp = await test_client.get(
+        "/search/index/create",
+        params={"force": True},
+    )
+    assert_status(202, resp)
+    task_id = resp.json()["id"]
+    assert await wait_for_task_success(task_id)
+    resp = await test_client.get("/platform/tasks/user")
+    assert_status(200, resp)
+    task = next(t for t in resp.json() if t["id"] == task_id)
+    assert all(txt["mode"] == "full" for txt in task["result"]["texts"].values())
+    resp = await test_client.get("/search/index/info")
+    assert_status(200, resp)
+    assert len(resp.json()) == 2
+
+
+@pytest.mark.anyio
+async def test_search_results_cache(
+    test_client: AsyncClient,
+    config,
+    login,
+    use_indices,
+    assert_status,
+):
+    await login(is_superuser=True)
+
+    async def _get_cache_stats():
+        resp = await test_client.get("/platform/stats")
+        assert_status(200, resp)
+        return resp.json()["searchCacheHits"], resp.json()["searchCacheMisses"]
+
+    async def _search(q: str):
+        resp = await test_client.post("/search", json={"type": "quick", "q": q})
+        assert_status(200, resp)
+        return resp.json()["totalHits"]
+
+    hits, misses = await _get_cache_stats()
+
+    # first request is a cache miss, repeated request is a cache hit
+    assert await _search("foo") == 2
+    assert await _search("foo") == 2
+    assert await _get_cache_stats() == (hits + 1, misses + 1)
+
+    # use shared cache tier, only keep one result in the in-process cache
+    config.es.search_cache_shared = True
+    config.es.search_cache_size = 1
+    try:
+        assert await _search("*") == 8
+        assert await _search("f*") > 0
+        # evicted from in-process cache, but still in shared cache
+        assert await _search("*") == 8
+        assert await _get_cache_stats() == (hits + 2, misses + 3)
+    finally:
+        config.es.search_cache_shared = False
+        config.es.search_cache_size = 1000
+
+
+@pytest.mark.anyio
+async def test_cursor_pagination(
+    test_client: AsyncClient,
+    use_indices,
+    assert_status,
+):
+    # start cursor-based search, all hits fit on one page, so there's no cursor
+    resp = await test_client.post(
+        "/search",
+        json={"type": "quick", "q": "*", "gen": {"pgn": {"pgs": 10, "cur": ""}}},
+    )
+    assert_status(200, resp)
+    assert len(resp.json()["hits"]) == 8
+    assert resp.json()["cursor"] is None
+
+    # page through all results using small pages
+    pages = [
+        page
+        async for page in search_pages(
+            None,
+            QuickSearchRequestBody.model_validate({"type": "quick", "q": "*"}),
+            page_size=3,
+        )
+    ]
+    assert len(pages) == 3
+    assert all(page.cursor for page in pages[:-1])
+    assert pages[-1].cursor is None
+    assert len({hit.id for page in pages for hit in page.hits}) == 8
+
+    # invalid cursors
+    for cursor in (
+        "foo",
+        base64.urlsafe_b64encode(
+            json.dumps({"pit": "foo", "after": [1]}).encode()
+        ).decode(),
+    ):
+        resp = await test_client.post(
+            "/search",
+            json={"type": "quick", "q": "*", "gen": {"pgn": {"cur": cursor}}},
+        )
+        assert_status(400, resp)
+
+
+@pytest.mark.anyio
+async def test_cursor_pagination_errors(use_indices):
+    settings = GeneralSearchSettings.model_validate({"pgn": {"pgs": 3, "cur": ""}})
+    results = await _run_search(
+        query={"match_all": {}},
+        highlight={"fields": {"*": {}}},
+        settings_general=settings,
+    )
+    assert results.cursor
+    # errors not caused by the cursor are raised as they are
+    for cursor in ("", results.cursor):
+        settings = GeneralSearchSettings.model_validate(
+            {"pgn": {"pgs": 3, "cur": cursor}}
+        )
+        with pytest.raises(ApiError):
+            await _run_search(
+                query={"foo": {}},
+                highlight={"fields": {"*": {}}},
+                settings_general=settings,
+            )
+    # expired (closed) PIT
+    es = await _get_es_client()
+    pit_id, _ = _decode_cursor(results.cursor)
+    await es.close_point_in_time(id=pit_id)
+    settings = GeneralSearchSettings.model_validate(
+        {"pgn": {"pgs": 3, "cur": results.cursor}}
+    )
+    with pytest.raises(TekstHTTPException):
+        await _run_search(
+            query={"match_all": {}},
+            highlight={"fields": {"*": {}}},
+            settings_general=settings,
+        )
+
+
 @pytest.mark.anyio
 async def test_quick(
     test_client: AsyncClient,
@@ -946,3 +1151,59 @@ async def test_export_search_results(
     assert_status(202, resp)
     assert "id" in resp.json()
     assert await wait_for_task_success(resp.json()["id"])
+
+    # export in all formats, compressed and uncompressed, check exported data
+    for fmt in ("json", "ndjson", "csv"):
+        for compress in (False, True):
+            resp = await test_client.post(
+                "/search/export",
+                params={"format": fmt, "gzip": compress},
+                json={"type": "quick", "q": "*"},
+            )
+            assert_status(202, resp)
+            assert await wait_for_task_success(resp.json()["id"])
+            resp = await test_client.get(
+                "/platform/tasks/download",
+                params={"pickupKey": resp.json()["pickupKey"]},
+            )
+            assert_status(200, resp)
+            data = (
+                gzip.decompress(resp.content) if compress else resp.content
+            ).decode()
+            if fmt == "json":
+                assert len(json.loads(data)) == 8
+            elif fmt == "ndjson":
+                assert len([json.loads(line) for line in data.splitlines()]) == 8
+            else:
+                assert len(list(csv.reader(io.StringIO(data)))) == 9
+
+
+@pytest.mark.anyio
+async def test_set_index_utd(insert_test_data):
+    text_id = PydanticObjectId((await insert_test_data("texts"))["texts"][0])
+    text = await TextDocument.get(text_id)
+    assert text
+    processed = IndexJournalEntryDocument(text_id=text_id)
+    await processed.insert()
+    # text changed while indexing
+    await TextDocument.find_one(TextDocument.id == text_id).update(
+        Set({TextDocument.title: "Changed while indexing"})
+    )
+    # contents changed while indexing
+    await change_tracker.text_index_ood(text_id)
+
+    # index is not marked as up-to-date, but the processed entry is deleted
+    await _set_index_utd(text, [processed])
+    text_in_db = await TextDocument.get(text_id)
+    assert text_in_db
+    assert not text_in_db.index_utd
+    assert text_in_db.title == "Changed while indexing"
+    journal = await IndexJournalEntryDocument.find_all().to_list()
+    assert len(journal) == 1
+
+    # index is marked as up-to-date after processing the remaining change
+    await _set_index_utd(text, journal)
+    text_in_db = await TextDocument.get(text_id)
+    assert text_in_db
+    assert text_in_db.index_utd
+    assert text_in_db.title == "Changed while indexing"
@@ -1,10 +1,14 @@
 import asyncio
 
+from datetime import UTC, datetime, timedelta
 from uuid import uuid4
 
 import pytest
 
+from beanie import PydanticObjectId
 from httpx import AsyncClient
+from tekst import tasks
+from tekst.utils import ensure
 
 
 @pytest.mark.anyio
@@ -251,3 +255,107 @@ async def test_tasks_locking(
     assert "id" in resp2.json()
     assert await wait_for_task_success(resp1.json()["id"])
     assert not await wait_for_task_success(resp2.json()["id"])
+
+
+_flaky_task_calls: dict[str, int] = {}
+
+
+async def _flaky_task(key: str, fail_times: int) -> dict[str, int]:
+    _flaky_task_calls[key] = _flaky_task_calls.get(key, 0) + 1
+    if _flaky_task_calls[key] <= fail_times:
+        raise RuntimeError("Temporary failure")
+    return {"calls": _flaky_task_calls[key]}
+
+
+@pytest.mark.anyio
+async def test_tasks_retry(
+    config,
+    test_client: AsyncClient,
+    monkeypatch,
+    wait_for_task_success,
+):
+    monkeypatch.setattr(config.tasks, "retry_backoff_s", 0)
+    monkeypatch.setattr(config.tasks, "max_attempts", 2)
+
+    # task failing once is retried and succeeds
+    task_doc = await tasks.create_task(
+        _flaky_task,
+        tasks.TaskType.EMAIL_OUTBOX,
+        task_kwargs={"key": "once", "fail_times": 1},
+    )
+    assert task_doc.status == "waiting"
+    assert await wait_for_task_success(str(task_doc.id))
+    task_doc = await tasks.TaskDocument.get(PydanticObjectId(task_doc.id))
+    assert task_doc
+    assert task_doc.attempts == 2
+    assert task_doc.result == {"calls": 2}
+
+    # task failing more often than allowed finally fails
+    task_doc = await tasks.create_task(
+        _flaky_task,
+        tasks.TaskType.EMAIL_OUTBOX,
+        task_kwargs={"key": "always", "fail_times": 3},
+    )
+    assert not await wait_for_task_success(str(task_doc.id))
+    task_doc = await tasks.TaskDocument.get(PydanticObjectId(task_doc.id))
+    assert task_doc
+    assert task_doc.status == "failed"
+    assert task_doc.attempts == 2
+    assert task_doc.error == "internalServerError"
+
+    # task of a type that isn't retryable is only attempted once
+    task_doc = await tasks.create_task(
+        _flaky_task,
+        tasks.TaskType.BROADCAST_ADMIN_NTFC,
+        task_kwargs={"key": "not_retryable", "fail_times": 1},
+    )
+    assert not await wait_for_task_success(str(task_doc.id))
+    task_doc = await tasks.TaskDocument.get(PydanticObjectId(task_doc.id))
+    assert task_doc
+    assert task_doc.status == "failed"
+    assert task_doc.attempts == 1
+
+
+@pytest.mark.anyio
+async def test_tasks_cleanup(
+    config,
+    test_client: AsyncClient,
+    monkeypatch,
+):
+    now = datetime.now(UTC)
+    # abandoned task that may not be attempted again
+    abandoned = await tasks.TaskDocument(
+        task_type=tasks.TaskType.RESOURCE_IMPORT,
+        pickup_key=str(uuid4()),
+        status="running",
+        start_time=now - timedelta(minutes=10),
+        func="foo:bar",
+        attempts=1,
+        lease_until=now - timedelta(minutes=1),
+    ).create()
+    # finished task that produced an artifact
+    artifact_path = config.temp_files_dir / str(uuid4())
+    artifact_path.write_text("foo")
+    finished = await tasks.TaskDocument(
+        task_type=tasks.TaskType.SEARCH_EXPORT,
+        pickup_key=str(uuid4()),
+        status="done",
+        start_time=now - timedelta(minutes=10),
+        end_time=now - timedelta(minutes=1),
+        result={"artifact": artifact_path.name},
+    ).create()
+    # abandoned tasks can't be claimed again
+    assert not await tasks._claim_task(abandoned.id)
+
+    await tasks.cleanup_tasks()
+    abandoned = await tasks.TaskDocument.get(ensure(abandoned.id))
+    assert abandoned
+    assert abandoned.status == "failed"
+    assert abandoned.error == "internalServerError"
+    assert await tasks.TaskDocument.get(ensure(finished.id))
+
+    # artifacts are deleted after the configured time
+    monkeypatch.setattr(config.misc, "del_exports_after_minutes", 0)
+    await tasks.cleanup_tasks()
+    assert not await tasks.TaskDocument.get(ensure(finished.id))
+    assert not artifact_path.exists()
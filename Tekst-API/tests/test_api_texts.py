@@ -89,7 +89,7 @@ async def test_update_text(
     login,
     wrong_id,
 ):
-    await insert_test_data("texts")
+    await insert_test_data("texts", "locations")
 
     # get text from db
     resp = await test_client.get("/texts")
@@ -125,6 +125,19 @@ async def test_update_text(
     )
     assert_status(200, resp)
 
+    # update location delimiter, check full location labels
+    resp = await test_client.patch(
+        f"/texts/{text['id']}",
+        json={"locDelim": " > "},
+    )
+    assert_status(200, resp)
+    resp = await test_client.get(
+        "/locations",
+        params={"textId": text["id"], "lvl": 1, "fullLabels": True},
+    )
+    assert_status(200, resp)
+    assert all(" > " in loc["full"] for loc in resp.json())
+
     # update invalid text
     text_update = {"title": "Yet another text"}
     resp = await test_client.patch(
@@ -384,6 +397,61 @@ async def test_fail_delete_level(
     assert_status(400, resp)
 
 
+@pytest.mark.anyio
+async def test_delete_text_and_level_aggregations(
+    test_client: AsyncClient,
+    insert_test_data,
+    assert_status,
+    login,
+    database,
+):
+    inserted_ids = await insert_test_data("texts", "locations", "resources")
+    await login(is_superuser=True)
+    resource_ids = [PydanticObjectId(res_id) for res_id in inserted_ids["resources"]]
+
+    # create aggregations data for all resources
+    for resource_id in resource_ids:
+        await database.value_counts.insert_one(
+            {"resource_id": resource_id, "key": "foo", "value": "bar", "occurrences": 1}
+        )
+        await database.precomputed.insert_many(
+            [
+                {"ref_id": resource_id, "precomputed_type": precomputed_type}
+                for precomputed_type in ("aggregations", "value_counts")
+            ]
+        )
+
+    async def _aggregations_resource_ids() -> set[PydanticObjectId]:
+        return {
+            *await database.value_counts.distinct("resource_id"),
+            *await database.precomputed.distinct(
+                "ref_id",
+                {"precomputed_type": {"$in": ["aggregations", "value_counts"]}},
+            ),
+        }
+
+    async def _text_resource_ids(text_id: str) -> set[PydanticObjectId]:
+        return set(
+            await database.resources.distinct(
+                "_id", {"text_id": PydanticObjectId(text_id)}
+            )
+        )
+
+    # delete the level all resources of the first text are on
+    text_id = inserted_ids["texts"][0]
+    other_text_id = inserted_ids["texts"][1]
+    other_text_resource_ids = await _text_resource_ids(other_text_id)
+    resp = await test_client.delete(f"/texts/{text_id}/level/1")
+    assert_status(200, resp)
+    assert not await _text_resource_ids(text_id)
+    assert await _aggregations_resource_ids() == other_text_resource_ids
+
+    # delete the other text
+    resp = await test_client.delete(f"/texts/{other_text_id}")
+    assert_status(204, resp)
+    assert not await _aggregations_resource_ids()
+
+
 @pytest.mark.anyio
 async def test_import_text_structure(
     test_client: AsyncClient,
@@ -698,3 +698,28 @@ async def test_0_53_2b0(
     assert users
     for u in users:
         assert "removedFromOwners" in u["user_notification_triggers"]
+
+
+@pytest.mark.anyio
+async def test_0_53_7b0(
+    database,
+    get_test_data,
+):
+    test_data = get_test_data("migrations/0_53_7b0.json")
+    for coll_name in test_data:
+        await database[coll_name].insert_many(test_data[coll_name])
+
+    # run migration
+    await _migration_fn("0_53_7b0")(database)
+
+    # assert the data has been fixed by the migration
+    locations = await database.locations.find({}).sort("level", 1).to_list()
+    assert locations[0]["ancestors"] == []
+    assert locations[0]["full_label"] == "One"
+    assert locations[2]["ancestors"] == [locations[0]["_id"], locations[1]["_id"]]
+    assert locations[2]["full_label"] == "One; Two; Three"
+    tasks = {t["task_type"]: t for t in await database.tasks.find({}).to_list()}
+    assert tasks["resource_import"]["status"] == "failed"
+    assert tasks["resource_import"]["end_time"]
+    assert tasks["broadcast_admin_ntfc"]["status"] == "done"
+    assert tasks["precompute_data"]["status"] == "waiting"
@@ -1,3 +1,5 @@
+import asyncio
+
 from datetime import UTC, datetime
 from typing import Any
 
@@ -6,7 +8,9 @@ import pytest
 from beanie import PydanticObjectId
 from pydantic import ValidationError
 from pydantic_extra_types.color import Color
+from tekst import text_structure
 from tekst.models.content import ContentBase
+from tekst.models.location import LocationDocument
 from tekst.models.resource import ResourceBase
 from tekst.models.resource_configs import ItemGroup, ItemIntegrationConfig, ItemProps
 from tekst.models.text import (
@@ -128,6 +132,98 @@ async def test_text_get_full_loc_labels_invalid_level(insert_test_data):
         await text_doc.full_location_labels(42)
 
 
+@pytest.mark.anyio
+async def test_location_paths(database, insert_test_data):
+    await insert_test_data("texts", "locations")
+    # remove materialized location paths, then restore them
+    await database.locations.update_many(
+        {},
+        {"$unset": {"ancestors": "", "full_label": ""}},
+    )
+    location = await LocationDocument.find_one(
+        LocationDocument.level == 1,
+        LocationDocument.position == 3,
+    )
+    assert location
+    # path can be determined without materialized paths, too
+    path = await location.get_path()
+    assert [loc.id for loc in path] == [location.parent_id, location.id]
+    await text_structure.init_location_paths()
+    location = await LocationDocument.find_one(
+        LocationDocument.level == 1,
+        LocationDocument.position == 3,
+    )
+    assert location
+    assert location.full_label == "Two; Two"
+    path = await location.get_path()
+    assert len(path) == 2
+    assert path[0].id == location.parent_id
+    assert path[0].full_label == "Two"
+
+
+@pytest.mark.anyio
+async def test_text_structure_index(database, insert_test_data, wrong_id, monkeypatch):
+    text_id = PydanticObjectId(
+        (await insert_test_data("texts", "locations"))["texts"][0]
+    )
+    wrong_id = PydanticObjectId(wrong_id)
+    index = await text_structure.get_index(text_id)
+    assert len(index) == 6
+    # (cached) index is reloaded after structure changes
+    assert await text_structure.get_index(text_id) is index
+    await text_structure.structure_changed(text_id)
+    index = await text_structure.get_index(text_id)
+    assert await text_structure.get_index(text_id) is index
+    # concurrent requests for the same data share a single computation
+    calls = []
+
+    async def factory():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return "foo"
+
+    assert (
+        await asyncio.gather(
+            *[text_structure.memoized(text_id, "foo", factory) for _ in range(3)]
+        )
+        == ["foo"] * 3
+    )
+    assert len(calls) == 1
+    assert await text_structure.memoized(text_id, "foo", factory) == "foo"
+    assert len(calls) == 1
+    # structure changes by other workers are picked up after the check interval
+    version = await text_structure.get_version(text_id)
+    await database.counters.update_one(
+        {"_id": text_structure._version_counter_id(text_id)},
+        {"$inc": {"value": 1}},
+    )
+    assert await text_structure.get_version(text_id) == version
+    monkeypatch.setattr(text_structure, "_VERSION_CHECK_INTERVAL_S", 0)
+    assert await text_structure.get_version(text_id) == version + 1
+    # look up locations
+    first_id = index.location_id(0, 0)
+    last_id = index.location_id(0, 1)
+    assert first_id and last_id
+    assert index.location_id(0, 2) is None
+    assert index.location_id(2, 0) is None
+    assert index.first_and_last_ids(0) == (first_id, last_id)
+    assert index.first_and_last_ids(2) is None
+    # adjacent locations wrap around at the first and last location of a level
+    assert index.adjacent_ids(first_id) == (last_id, last_id)
+    assert index.adjacent_ids(wrong_id) == (None, None)
+    # paths and children
+    child_ids = index.child_ids(last_id, 1)
+    assert len(child_ids) == 2
+    assert index.path_ids(child_ids[0]) == [last_id, child_ids[0]]
+    assert index.path_ids(wrong_id) == []
+    assert index.child_ids(None, 0) == [first_id, last_id]
+    assert index.child_ids(last_id, 0) == []
+    assert index.child_ids(wrong_id, 1) == []
+    # full labels
+    full_labels = index.full_labels(1, "; ")
+    assert full_labels[str(child_ids[0])] == "Two; One"
+
+
 def test_text_valid_default_level():
     with pytest.raises(ValidationError):
         TextCreate(
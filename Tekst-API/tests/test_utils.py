@@ -1,6 +1,28 @@
+import asyncio
+import io
+import json
+import pickle
+
+from datetime import UTC, datetime, timedelta
+
+import httpx
 import pytest
 
-from tekst import html
+from beanie import PydanticObjectId
+from tekst import (
+    change_tracker,
+    counters,
+    errors,
+    executor,
+    export_cache,
+    html,
+    notifications,
+)
+from tekst.json_stream import iter_json_array_items
+from tekst.models.email_outbox import EmailOutboxDocument
+from tekst.models.index_journal import IndexJournalEntryDocument
+from tekst.models.resource import ResourceBaseDocument
+from tekst.models.text import TextDocument
 from tekst.types import _cleanup_spaces_multiline, _cleanup_spaces_oneline
 from tekst.utils import ensure
 
@@ -61,3 +83,281 @@ def test_ensure():
     assert isinstance(ensure(v), dict)
     with pytest.raises(ValueError):
         ensure(v, strict=True)
+
+
+def test_iter_json_array_items():
+    data = {
+        "foo": 1,
+        "contents": [{"num": i, "text": "ä" * i} for i in range(20)] + [1234567, None],
+        "bar": [1, {"baz": 2.5}],
+    }
+    data_str = json.dumps(data, indent=2)
+    # use several chunk sizes to make sure values spanning chunks are parsed correctly
+    for chunk_size in (1, 3, 64, 65536):
+        other_props = {}
+        items = list(
+            iter_json_array_items(
+                io.StringIO(data_str),
+                "contents",
+                other_props,
+                chunk_size=chunk_size,
+            )
+        )
+        assert items == data["contents"]
+        assert other_props == {"foo": 1, "bar": [1, {"baz": 2.5}]}
+    # empty object and empty array
+    assert list(iter_json_array_items(io.StringIO("{}"), "contents")) == []
+    assert (
+        list(iter_json_array_items(io.StringIO('{"contents": []}'), "contents")) == []
+    )
+    # invalid JSON
+    for invalid in ("", "[1]", "{foo: 1}", '{"contents": [1,]}', '{"a": 1', "{1: 2}"):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array_items(io.StringIO(invalid), "contents", chunk_size=2))
+    # value at key is not an array
+    with pytest.raises(TypeError):
+        list(iter_json_array_items(io.StringIO('{"contents": {}}'), "contents"))
+
+
+@pytest.mark.anyio
+async def test_run_cpu_bound(config, monkeypatch):
+    # run in thread (process pool disabled in tests config)
+    assert await executor.run_cpu_bound(sum, [1, 2, 3]) == 6
+    # run in process pool
+    monkeypatch.setattr(config.tasks, "process_pool_size", 1)
+    try:
+        assert await executor.run_cpu_bound(sum, [1, 2, 3]) == 6
+        assert await executor.run_cpu_bound(max, 1, 2) == 2
+    finally:
+        executor.shutdown()
+
+
+def test_pickle_tekst_http_exception():
+    exc = pickle.loads(pickle.dumps(errors.E_422_UPLOAD_INVALID_DATA))
+    assert isinstance(exc, errors.TekstHTTPException)
+    assert exc.status_code == 422
+    assert exc.detail == errors.E_422_UPLOAD_INVALID_DATA.detail
+
+
+def test_export_cache(config, monkeypatch):
+    key = export_cache.make_key(foo="bar")
+    file_path = config.temp_files_dir / "export_cache_test"
+    target_path = config.temp_files_dir / "export_cache_test_target"
+    file_path.write_text("foo")
+    try:
+        # cache file, get it from cache
+        export_cache.put(key, file_path)
+        assert export_cache.get(key, target_path)
+        assert target_path.read_text() == "foo"
+        # cached files are evicted if the cache exceeds its size quota
+        monkeypatch.setattr(config.misc, "export_cache_max_mb", 0)
+        export_cache.put(export_cache.make_key(foo="baz"), file_path)
+        target_path.unlink()
+        assert not export_cache.get(key, target_path)
+    finally:
+        file_path.unlink(missing_ok=True)
+        target_path.unlink(missing_ok=True)
+
+
+@pytest.mark.anyio
+async def test_change_tracker(config, monkeypatch, insert_test_data):
+    inserted_ids = await insert_test_data("texts", "locations", "resources")
+    text_ids = [PydanticObjectId(text_id) for text_id in inserted_ids["texts"]]
+    loc_ids = [PydanticObjectId(loc_id) for loc_id in inserted_ids["locations"]]
+    resource_id = PydanticObjectId(inserted_ids["resources"][0])
+    changed_at = datetime.now(UTC) + timedelta(days=1)
+    monkeypatch.setattr(config.misc, "changes_flush_delay_ms", 100)
+    # record changes, which are coalesced and not written immediately
+    await change_tracker.resource_contents_changed(resource_id, changed_at)
+    await change_tracker.resource_contents_changed(
+        resource_id, changed_at - timedelta(hours=1)
+    )
+    await change_tracker.text_index_ood(text_ids[0], loc_ids[:1])
+    await change_tracker.text_index_ood(text_ids[0], loc_ids[1:2])
+    await change_tracker.text_index_ood(text_ids[1])
+    await change_tracker.text_index_ood(text_ids[1], loc_ids[2:3])
+    await change_tracker.counter_incr("foo")
+    await change_tracker.counter_incr("foo", 2)
+    assert not await IndexJournalEntryDocument.find_all().to_list()
+    assert await counters.counter_get("foo") == 0
+    resource = await ResourceBaseDocument.get(resource_id, with_children=True)
+    assert resource
+    assert change_tracker.contents_changed_at(resource) == changed_at
+    # wait for the pending changes to be written
+    await asyncio.sleep(0.3)
+    resource = await ResourceBaseDocument.get(resource_id, with_children=True)
+    assert resource
+    assert abs(resource.contents_changed_at - changed_at) < timedelta(seconds=1)
+    for text_id in text_ids:
+        text = await TextDocument.get(text_id)
+        assert text
+        assert not text.index_utd
+    journal = {
+        entry.text_id: entry
+        for entry in await IndexJournalEntryDocument.find_all().to_list()
+    }
+    assert set(ensure(journal[text_ids[0]].location_ids)) == set(loc_ids[:2])
+    assert journal[text_ids[1]].location_ids is None
+    assert await counters.counter_get("foo") == 3
+
+
+@pytest.mark.anyio
+async def test_email_outbox(config, monkeypatch, database):
+    now = datetime.now(UTC)
+    await EmailOutboxDocument.insert_many(
+        [
+            EmailOutboxDocument(to=f"foo{i}@bar.de", subject="Foo", txt="Foo", html="")
+            for i in range(3)
+        ]
+    )
+    # email claimed by another sender
+    await EmailOutboxDocument(
+        to="claimed@bar.de",
+        subject="Foo",
+        txt="Foo",
+        html="",
+        claim_id="foo",
+        sending_until=now + timedelta(minutes=5),
+    ).insert()
+    # expired email
+    await EmailOutboxDocument(
+        to="expired@bar.de",
+        subject="Foo",
+        txt="Foo",
+        html="",
+        created_at=now - timedelta(hours=config.email.outbox_max_age_hours + 1),
+    ).insert()
+
+    # SMTP connection failing after sending the first email
+    def _failing_smtp_send(emails, results):
+        results.append(True)
+        raise ConnectionError("Connection lost")
+
+    monkeypatch.setattr(notifications, "_smtp_send", _failing_smtp_send)
+    with pytest.raises(ConnectionError):
+        await notifications._send_outbox_emails()
+    emails = await EmailOutboxDocument.find_all().to_list()
+    assert len(emails) == 4
+    assert len([email for email in emails if email.sending_until is None]) == 3
+
+    # SMTP server rejecting the second email
+    def _smtp_send(emails, results):
+        results.extend([i != 1 for i in range(len(emails))])
+
+    monkeypatch.setattr(notifications, "_smtp_send", _smtp_send)
+    assert await notifications._send_outbox_emails() == {"sent": 1, "rejected": 1}
+    emails = await EmailOutboxDocument.find_all().to_list()
+    assert {email.to for email in emails} == {"claimed@bar.de", "expired@bar.de"}
+
+
+@pytest.mark.anyio
+async def test_email_outbox_smtp(config, monkeypatch, database):
+    async def _queue_emails(count: int) -> None:
+        await EmailOutboxDocument.insert_many(
+            [
+                EmailOutboxDocument(
+                    to=f"foo{i}@bar.de", subject="Foo", txt="Foo", html=""
+                )
+                for i in range(count)
+            ]
+        )
+
+    # record the sizes of the batches sent via the SMTP server
+    batch_sizes = []
+    smtp_send = notifications._smtp_send
+
+    def _smtp_send(emails, results):
+        batch_sizes.append(len(emails))
+        smtp_send(emails, results)
+
+    monkeypatch.setattr(notifications, "_smtp_send", _smtp_send)
+    monkeypatch.setattr(config.email, "smtp_batch_size", 2)
+    monkeypatch.setattr(config.email, "smtp_rate_limit", 20)
+
+    # the local SMTP server for testing provides an API for inspecting received emails
+    # and for making it reject emails, see https://mailpit.axllent.org/docs/api-v1/
+    async with httpx.AsyncClient(base_url="http://127.0.0.1:8025/api/v1") as mailpit:
+        await mailpit.delete("/messages")
+
+        # emails are sent in batches
+        await _queue_emails(3)
+        assert await notifications._send_outbox_emails() == {"sent": 3, "rejected": 0}
+        assert batch_sizes == [2, 1]
+        assert (await mailpit.get("/messages")).json()["total"] == 3
+        assert not await EmailOutboxDocument.find_all().count()
+
+        # emails rejected by the SMTP server are removed from the outbox
+        # (sent via an unencrypted connection with authentication this time)
+        monkeypatch.setattr(config.email, "smtp_starttls", False)
+        monkeypatch.setattr(config.email, "smtp_user", "foo")
+        monkeypatch.setattr(config.email, "smtp_password", "bar")
+        await _queue_emails(2)
+        await mailpit.put(
+            "/chaos",
+            json={"Recipient": {"ErrorCode": 550, "Probability": 100}},
+        )
+        try:
+            assert await notifications._send_outbox_emails() == {
+                "sent": 0,
+                "rejected": 2,
+            }
+        finally:
+            await mailpit.put(
+                "/chaos",
+                json={"Recipient": {"ErrorCode": 451, "Probability": 0}},
+            )
+        assert (await mailpit.get("/messages")).json()["total"] == 3
+        assert not await EmailOutboxDocument.find_all().count()
+
+    # unsent emails are released if the SMTP server can't be reached
+    monkeypatch.setattr(config.email, "smtp_port", 1)
+    await _queue_emails(2)
+    with pytest.raises(OSError):
+        await notifications._send_outbox_emails()
+    emails = await EmailOutboxDocument.find_all().to_list()
+    assert len(emails) == 2
+    assert all(not email.claim_id and not email.sending_until for email in emails)
+
+
+@pytest.mark.anyio
+async def test_change_tracker_failed_flush(config, monkeypatch, insert_test_data):
+    inserted_ids = await insert_test_data("texts", "resources")
+    text_id = PydanticObjectId(inserted_ids["texts"][0])
+    resource_id = PydanticObjectId(inserted_ids["resources"][0])
+    changed_at = datetime.now(UTC) + timedelta(days=1)
+    monkeypatch.setattr(config.misc, "changes_flush_delay_ms", 5000)
+    await change_tracker.resource_contents_changed(resource_id, changed_at)
+    await change_tracker.text_index_ood(text_id)
+    await change_tracker.counter_incr("foo", 2)
+
+    # fail to write the counter changes
+    async def _failing_counter_incr(*args, **kwargs):
+        raise ConnectionError("Connection lost")
+
+    counter_incr = counters.counter_incr
+    monkeypatch.setattr(counters, "counter_incr", _failing_counter_incr)
+    with pytest.raises(ConnectionError):
+        await change_tracker.flush()
+    assert not await IndexJournalEntryDocument.find_all().to_list()
+    monkeypatch.setattr(counters, "counter_incr", counter_incr)
+
+    # fail to write the index journal entry
+    async def _failing_record(*args, **kwargs):
+        raise ConnectionError("Connection lost")
+
+    monkeypatch.setattr(IndexJournalEntryDocument, "record", _failing_record)
+    with pytest.raises(ConnectionError):
+        await change_tracker.flush()
+    resource = await ResourceBaseDocument.get(resource_id, with_children=True)
+    assert resource
+    assert abs(resource.contents_changed_at - changed_at) < timedelta(seconds=1)
+    assert not await IndexJournalEntryDocument.find_all().to_list()
+
+    # the change that wasn't written is still pending
+    monkeypatch.undo()
+    await change_tracker.flush()
+    journal = await IndexJournalEntryDocument.find_all().to_list()
+    assert len(journal) == 1
+    assert journal[0].text_id == text_id
+    assert journal[0].location_ids is None
+    assert await counters.counter_get("foo") == 2
@@ -4432,6 +4432,11 @@ export interface components {
        * @default 10
        */
       pgs?: number;
+      /**
+       * Cur
+       * @description Cursor for cursor-based pagination (overrides the page number): An empty string starts a new cursor-based search, the following pages are requested using the cursor returned with the results
+       */
+      cur?: string | null;
     };
     /** ParentCoverage */
     ParentCoverage: {
@@ -5882,6 +5887,8 @@ export interface components {
       /** @default [] */
       contentCss: components['schemas']['ContentCssProperties'];
     };
+    /** @enum {string} */
+    SearchExportFormat: 'json' | 'ndjson' | 'csv';
     /** SearchHit */
     SearchHit: {
       id: components['schemas']['PydanticObjectId'];
@@ -5934,6 +5941,11 @@ export interface components {
       totalHitsRelation: 'eq' | 'gte';
       /** Maxscore */
       maxScore: number | null;
+      /**
+       * Cursor
+       * @description Cursor to request the next page of results with (only for cursor-based pagination, null if there are no more results)
+       */
+      cursor: string | null;
     };
     /** @enum {string} */
     SortingPreset: 'relevance' | 'text_level_position' | 'text_level_relevance';
@@ -5987,6 +5999,10 @@ export interface components {
       resetPasswords: number;
       /** Deletedusers */
       deletedUsers: number;
+      /** Searchcachehits */
+      searchCacheHits: number;
+      /** Searchcachemisses */
+      searchCacheMisses: number;
     };
     /** TaskRead */
     TaskRead: {
@@ -6059,6 +6075,7 @@ export interface components {
       | 'search_export'
       | 'broadcast_user_ntfc'
       | 'broadcast_admin_ntfc'
+      | 'email_outbox'
       | 'precompute_data'
       | 'structure_update'
       | 'platform_cleanup';
@@ -10258,6 +10275,8 @@ export interface operations {
         from?: components['schemas']['PydanticObjectId'] | null;
         /** @description ID of the location to end the export's location range at */
         to?: components['schemas']['PydanticObjectId'] | null;
+        /** @description Whether to compress the export file using gzip */
+        gzip?: boolean;
       };
       header?: never;
       path: {
@@ -10425,6 +10444,7 @@ export interface operations {
     parameters: {
       query?: {
         force?: boolean;
+        incremental?: boolean;
       };
       header?: never;
       path?: never;
@@ -10510,7 +10530,12 @@ export interface operations {
   };
   exportSearchResults: {
     parameters: {
-      query?: never;
+      query?: {
+        /** @description Export format */
+        format?: components['schemas']['SearchExportFormat'];
+        /** @description Whether to compress the export file using gzip */
+        gzip?: boolean;
+      };
       header?: never;
       path?: never;
       cookie?: never;